@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Building
+from .models import Building, Job
 
 
 @admin.register(Building)
@@ -112,7 +112,17 @@ class BuildingAdmin(admin.ModelAdmin):
                 )
             },
         ),
-
+        (
+            "Klimastandort & PV-Simulation",
+            {
+                "fields": (
+                    "climate_location",
+                    "pv_mode",
+                    "electricity_demand",
+                    "battery_capacity",
+                )
+            },
+        ),
         (
             "Berechnungsergebnisse",
             {
@@ -154,3 +164,10 @@ class BuildingAdmin(admin.ModelAdmin):
         return f"{obj.result_Q_h:.0f}"
 
     result_Q_h_display.short_description = "Q_h [kWh/a]"
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "progress_done", "progress_total", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("progress_done", "progress_total", "started_at", "heartbeat_at", "finished_at", "message")
@@ -0,0 +1,297 @@
+import asyncio
+import contextvars
+import json
+import math
+import re
+from functools import lru_cache
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models
+
+from .calc import INPUT_FIELDS, OPTIONAL_FIELDS, RESULT_KEYS, calc_heating_demand_batch, optional_arrays, rows_to_arrays
+from .climate import climate_store
+from .hourly import HOURLY_INPUT_FIELDS, POSITIVE_FIELDS as HOURLY_POSITIVE_FIELDS, calc_heating_demand_hourly
+from .metrics import observe_calc
+from .models import Building
+from .timing import timed
+
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Rechenverfahren der API (?engine=...): Eingabefelder, Batch-Funktion,
+# Gebäude je gestreamtem Block (stündlich deutlich teurer je Gebäude) und
+# Felder, die größer als 0 sein müssen
+ENGINES = {
+    "annual": (INPUT_FIELDS, calc_heating_demand_batch, 2000, ()),
+    "hourly": (HOURLY_INPUT_FIELDS, calc_heating_demand_hourly, 200, HOURLY_POSITIVE_FIELDS),
+}
+
+
+class InputError(Exception):
+    """
+    Anfrage ist als Ganzes nicht lesbar (z. B. kein gültiges JSON).
+    """
+
+
+def iter_request_records(request):
+    """
+    Liefert die Eingabedatensätze einer Anfrage als (Index, Datensatz).
+
+    NDJSON (eine JSON-Zeile je Gebäude) wird zeilenweise aus dem Request-Body
+    gelesen, der Speicherbedarf hängt also nicht von der Anzahl ab. Ein
+    JSON-Array muss dagegen vollständig geparst werden. Nicht lesbare
+    NDJSON-Zeilen werden als InputError-Objekt statt als dict geliefert.
+    """
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        return _iter_ndjson(request)
+
+    try:
+        body = request.read()
+        data = _load_json(body.decode(json.detect_encoding(body)))
+    except ValueError as exc:
+        raise InputError(f"Ungültiges JSON: {exc}")
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise InputError("Erwartet wird ein JSON-Array von Objekten oder NDJSON.")
+    return enumerate(data)
+
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+def _load_json(text):
+    """
+    json.loads, aber Arrays Element für Element: ein einziger loads-Aufruf
+    hält bei großen Bodies das GIL sekundenlang und blockiert damit auch den
+    Event-Loop, wenn im Thread-Pool geparst wird (async API).
+    """
+    pos = _whitespace.match(text).end()
+    if not text.startswith("[", pos):
+        return json.loads(text)
+
+    items = []
+    pos = _whitespace.match(text, pos + 1).end()
+    if text.startswith("]", pos):
+        pos += 1
+    else:
+        while True:
+            item, pos = _decoder.raw_decode(text, pos)
+            items.append(item)
+            pos = _whitespace.match(text, pos).end()
+            if text.startswith(",", pos):
+                pos = _whitespace.match(text, pos + 1).end()
+            elif text.startswith("]", pos):
+                pos += 1
+                break
+            else:
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+    if _whitespace.match(text, pos).end() != len(text):
+        raise json.JSONDecodeError("Extra data", text, pos)
+    return items
+
+
+def _iter_ndjson(lines):
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield index, json.loads(line)
+        except ValueError as exc:
+            yield index, InputError(f"Ungültiges JSON: {exc}")
+        index += 1
+
+
+@lru_cache(maxsize=None)
+def _input_model_fields(names):
+    fields = []
+    for name in names:
+        field = Building._meta.get_field(name)
+        # für JSON-Zahlen, die der Feldtyp ohne Umwandlung annimmt, entfällt field.clean()
+        if isinstance(field, models.IntegerField):
+            fast_types = (int,)
+        elif isinstance(field, models.FloatField):
+            fast_types = (int, float)
+        else:
+            fast_types = ()
+        default = field.get_default() if field.has_default() else None
+        # Wertebereich (z. B. MinValueValidator(0)) auch ohne field.clean() prüfen
+        limits = tuple(v for v in field.validators if isinstance(v, (MinValueValidator, MaxValueValidator)))
+        fields.append((name, field, default, fast_types, limits))
+    return fields
+
+
+def clean_input(record, fields=INPUT_FIELDS, positive=()):
+    """
+    Prüft einen Datensatz mit den Felddefinitionen des Modells (Typ,
+    Pflichtfeld, Standardwert, Wertebereich); Felder in positive müssen
+    zudem größer als 0 sein. Rückgabe: (Werte in der Reihenfolge von fields, Fehler je Feld).
+    """
+    if isinstance(record, InputError):
+        return None, {"__all__": [str(record)]}
+    if not isinstance(record, dict):
+        return None, {"__all__": ["Erwartet wird ein JSON-Objekt."]}
+
+    values, errors = [], {}
+    for name, field, default, fast_types, limits in _input_model_fields(tuple(fields)):
+        value = record.get(name)
+        if value is None:
+            value = default
+        if fast_types:
+            # field.clean() machte aus true eine 1 und schnitte 3.5 zu 3 ab
+            if type(value) is bool:
+                errors[name] = ["Erwartet wird eine Zahl, kein Wahrheitswert."]
+                continue
+            if fast_types == (int,) and type(value) is float:
+                if not value.is_integer():
+                    errors[name] = ["Muss eine ganze Zahl sein."]
+                    continue
+                value = int(value)
+        if type(value) not in fast_types:
+            try:
+                value = field.clean(value, None)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+                continue
+        # json.loads nimmt NaN und Infinity an, rechnen lässt sich damit nicht
+        if type(value) is float and not math.isfinite(value):
+            errors[name] = ["Muss eine endliche Zahl sein."]
+            continue
+        if name in positive and value <= 0:
+            errors[name] = ["Muss größer als 0 sein."]
+            continue
+        try:
+            for validator in limits:
+                validator(value)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+            continue
+        values.append(value)
+    return values, errors
+
+
+def _dumps(value):
+    # NaN und Infinity wären kein gültiges JSON
+    return json.dumps(value, ensure_ascii=False, allow_nan=False)
+
+
+def _result_line(index, record, result=None, errors=None):
+    line = {"index": index}
+    if isinstance(record, dict) and "id" in record:
+        line["id"] = record["id"]
+    if errors:
+        line["errors"] = errors
+    else:
+        line["result"] = result
+    try:
+        return _dumps(line) + "\n"
+    except ValueError:
+        pass
+    # eine nicht endliche "id" entfällt, ein nicht endliches Ergebnis wird
+    # als Fehler gemeldet
+    try:
+        _dumps(line.get("id"))
+    except ValueError:
+        del line["id"]
+    if "result" in line:
+        try:
+            _dumps(line["result"])
+        except ValueError:
+            del line["result"]
+            line["errors"] = {"__all__": ["Berechnung ergibt keinen endlichen Wert."]}
+    return _dumps(line) + "\n"
+
+
+def iter_ndjson_results(records, chunk_size=None, engine="annual"):
+    """
+    Berechnet die Datensätze blockweise mit dem Verfahren engine (siehe
+    ENGINES) und liefert je Eingabe eine NDJSON-Zeile, sobald ihr Block
+    fertig ist. Übergebene "id"-Werte werden zur Zuordnung zurückgegeben.
+    """
+    chunk_size = chunk_size or ENGINES[engine][2]
+    chunk = []
+    for item in records:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield "".join(_calc_chunk(chunk, engine))
+            chunk = []
+    if chunk:
+        yield "".join(_calc_chunk(chunk, engine))
+
+
+async def run_in_executor(func, *args):
+    """
+    Führt func(*args) im Thread-Pool des Event-Loops aus, damit CPU-lastige
+    Arbeit in async Views andere Requests nicht blockiert. Der aktuelle
+    Kontext (z. B. die Profiling-Messung) geht mit in den Thread.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, contextvars.copy_context().run, func, *args)
+
+
+async def aiter_ndjson_results(records, chunk_size=None, engine="annual"):
+    """
+    Wie iter_ndjson_results, für async Views: Einlesen und Berechnen eines
+    Blocks laufen im Thread-Pool, der Event-Loop wartet nur auf das Ergebnis.
+    """
+    records = iter(records)
+    chunk_size = chunk_size or ENGINES[engine][2]
+
+    def next_block():
+        chunk = list(islice(records, chunk_size))
+        return "".join(_calc_chunk(chunk, engine)) if chunk else None
+
+    while True:
+        block = await run_in_executor(next_block)
+        if block is None:
+            return
+        yield block
+
+
+def _check_locations(cleaned):
+    """
+    Meldet Klimastandorte, zu denen keine Wetterdaten importiert sind, als
+    Fehler des Datensatzes (Standorte einmal je Block gelesen).
+    """
+    position = -len(OPTIONAL_FIELDS) + OPTIONAL_FIELDS.index("climate_location")
+    known = None
+    for _, _, values, errors in cleaned:
+        if errors or not values[position]:
+            continue
+        if known is None:
+            known = climate_store.locations()
+        if values[position] not in known:
+            errors["climate_location"] = [f"Unbekannter Klimastandort {values[position]!r}."]
+
+
+def _calc_chunk(chunk, engine="annual"):
+    fields, calc, _, positive = ENGINES[engine]
+    cleaned = [
+        (index, record, *clean_input(record, fields + OPTIONAL_FIELDS, positive)) for index, record in chunk
+    ]
+    _check_locations(cleaned)
+    valid = [values for _, _, values, errors in cleaned if not errors]
+
+    columns = []
+    if valid:
+        split = len(fields)
+        arrays = rows_to_arrays([values[:split] for values in valid], fields)
+        arrays.update(optional_arrays([values[split:] for values in valid]))
+        with timed("calc"), observe_calc("batch" if engine == "annual" else engine, len(valid)):
+            result = calc(arrays)
+        columns = [result[key].tolist() for key in RESULT_KEYS]
+
+    row = 0
+    for index, record, values, errors in cleaned:
+        if errors:
+            yield _result_line(index, record, errors=errors)
+        else:
+            yield _result_line(
+                index, record, result={key: column[row] for key, column in zip(RESULT_KEYS, columns)}
+            )
+            row += 1
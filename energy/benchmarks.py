@@ -0,0 +1,218 @@
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .calc import INPUT_FIELDS, calc_heating_demand, calc_heating_demand_batch, rows_to_arrays
+from .models import Building
+from .pagination import encode_cursor
+from .recalc import recalculate
+from .synthetic import generate
+
+
+# Registrierte Messfälle: Name -> Funktion(size), die den Aufbau erledigt und
+# die eigentlich zu messende Funktion (ohne Argumente) zurückgibt
+CASES = {}
+
+
+def case(name):
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+
+def _consume(response):
+    assert response.status_code == 200, response.status_code
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+@case("calc_scalar")
+def _calc_scalar(size):
+    buildings = list(Building.objects.all())
+
+    def run():
+        for building in buildings:
+            calc_heating_demand(building)
+    return run
+
+
+@case("calc_batch")
+def _calc_batch(size):
+    rows = list(Building.objects.values_list(*INPUT_FIELDS))
+
+    def run():
+        calc_heating_demand_batch(rows_to_arrays(rows))
+    return run
+
+
+@case("recalculate")
+def _recalculate(size):
+    def run():
+        recalculate()
+    return run
+
+
+@case("building_list")
+def _building_list(size):
+    client = Client()
+    url = reverse("building_list")
+
+    def run():
+        _consume(client.get(url))
+    return run
+
+
+@case("building_list_deep")
+def _building_list_deep(size):
+    # eine der letzten Seiten, sortiert nach Q_h (mit OFFSET wäre das die teuerste)
+    client = Client()
+    value, pk = (
+        Building.objects.order_by("result_Q_h", "pk")
+        .values_list("result_Q_h", "pk")[max(size - 60, 0)]
+    )
+    url = reverse("building_list") + "?order=q_h&after=" + encode_cursor(value, pk)
+
+    def run():
+        _consume(client.get(url))
+    return run
+
+
+def _export_case(url_name):
+    def setup(size):
+        client = Client()
+        url = reverse(url_name)
+
+        def run():
+            _consume(client.get(url))
+        return run
+    return setup
+
+
+case("export_csv")(_export_case("building_export_csv"))
+case("export_xlsx")(_export_case("building_export_xlsx"))
+case("export_pdf")(_export_case("building_export_pdf"))
+
+
+def populate(size, seed=1):
+    """
+    Füllt die (Test-)Datenbank mit synthetischen, berechneten Gebäuden auf
+    genau size Stück auf; vorhandene Gebäude bleiben erhalten.
+    """
+    current = Building.objects.count()
+    if current < size:
+        generate(size - current, seed=seed, start=current)
+
+
+def measure(run, repeat=5):
+    """
+    Wall time (Median aus repeat Läufen, dazu der Bestwert), danach ein
+    weiterer Lauf mit tracemalloc und Query-Zählung. Beides zusammen würde
+    die Zeitmessung verfälschen, daher getrennt. Verglichen wird der Median:
+    ein einzelner zufällig schneller Lauf verschiebt ihn nicht.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time": statistics.median(times),
+        "time_min": min(times),
+        "peak_memory": peak,
+        "queries": len(queries.captured_queries),
+    }
+
+
+def run_benchmarks(sizes, cases=None, repeat=5, progress=None):
+    """
+    Misst alle (bzw. die gewählten) Fälle für jede Gebäudeanzahl in sizes.
+    Läuft gegen die aktuelle Datenbankverbindung – vom Aufrufer auf eine
+    Testdatenbank umzustellen. Rückgabe: {"fall@größe": Messwerte}.
+    """
+    results = {}
+    for size in sorted(sizes):
+        populate(size)
+        for name in cases or CASES:
+            run = CASES[name](size)
+            key = f"{name}@{size}"
+            results[key] = measure(run, repeat=repeat)
+            if progress is not None:
+                progress(key, results[key])
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(results, baseline, tolerance=0.25, min_time=0.05, min_memory=1024 * 1024):
+    """
+    Vergleicht mit einer gespeicherten Baseline. Zeit (Median) und
+    Spitzenspeicher dürfen um tolerance (relativ) wachsen, mindestens aber
+    um min_time bzw. min_memory: Fälle im Millisekundenbereich schwanken
+    schon durch GC, Caches und Taktfrequenz um mehr als 25 %. Die Anzahl
+    der Queries darf nicht steigen.
+
+    Rückgabe: Liste lesbarer Meldungen, leer = keine Regression.
+    """
+    regressions = []
+    for key, current in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if current["time"] > max(old["time"] * (1 + tolerance), old["time"] + min_time):
+            regressions.append(
+                f"{key}: Zeit {old['time'] * 1000:.1f} ms -> {current['time'] * 1000:.1f} ms"
+            )
+        if current["peak_memory"] > max(
+            old["peak_memory"] * (1 + tolerance), old["peak_memory"] + min_memory
+        ):
+            regressions.append(
+                f"{key}: Speicher {old['peak_memory'] / 2**20:.1f} MiB -> "
+                f"{current['peak_memory'] / 2**20:.1f} MiB"
+            )
+        if current["queries"] > old["queries"]:
+            regressions.append(f"{key}: Queries {old['queries']} -> {current['queries']}")
+    return regressions
+
+
+def load_baseline(path):
+    """
+    Liefert (Messwerte, Umgebung) einer mit save_baseline geschriebenen Datei.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["results"], data.get("environment")
+
+
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
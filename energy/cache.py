@@ -0,0 +1,140 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .calc import CALC_VERSION, calc_heating_demand, input_fingerprint, input_values, optional_values
+from .metrics import CallbackMetric, observe_calc
+from .models import Building
+from .timing import timed
+
+logger = logging.getLogger(__name__)
+
+
+class CalcCache:
+    """
+    Zweistufiger Ergebnis-Cache für calc_heating_demand.
+
+    Schlüssel ist ein kanonischer Hash der Eingabefelder (samt Klimastandort
+    und PV-Simulation) zusammen mit CALC_VERSION, ein Versionssprung macht
+    damit alle Einträge ungültig.
+    Stufe 1 ist ein begrenzter LRU-Speicher im Prozess, Stufe 2 optional ein
+    gemeinsamer Django-Cache (z. B. Redis oder Memcached), damit mehrere
+    Worker voneinander profitieren.
+    """
+
+    def __init__(self, maxsize=4096, alias=None, timeout=None):
+        self.maxsize = maxsize
+        self.alias = alias
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def key(self, values, optional):
+        return f"energy:calc:v{CALC_VERSION}:{input_fingerprint(values, optional)}"
+
+    def _shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        shared = self._shared()
+        if shared is not None:
+            result = shared.get(key)
+            if result is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._store_local(key, result)
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, result):
+        self._store_local(key, result)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(key, result, self.timeout)
+
+    def _store_local(self, key, result):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def calc(self, building: Building) -> dict:
+        """
+        Wie calc_heating_demand, aber mit Zwischenspeicher.
+        Liefert immer eine Kopie, damit Aufrufer den Cache nicht verändern.
+        """
+        key = self.key(input_values(building), optional_values(building))
+        result = self.get(key)
+        if result is None:
+            with timed("calc"), observe_calc("scalar"):
+                result = calc_heating_demand(building)
+            self.set(key, result)
+            logger.debug("calc cache miss %s", key)
+        else:
+            logger.debug("calc cache hit %s", key)
+        return dict(result)
+
+    def info(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "version": CALC_VERSION,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """
+        Leert den Prozess-Cache und setzt die Zähler zurück. Einträge im
+        gemeinsamen Cache laufen über timeout bzw. CALC_VERSION aus.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+
+def _build_cache():
+    config = getattr(settings, "ENERGY_CALC_CACHE", {})
+    return CalcCache(
+        maxsize=config.get("MAXSIZE", 4096),
+        alias=config.get("ALIAS"),
+        timeout=config.get("TIMEOUT"),
+    )
+
+
+calc_cache = _build_cache()
+
+for _name, _key, _help in (
+    ("energy_calc_cache_hits_total", "hits", "Treffer im Prozess-Cache."),
+    ("energy_calc_cache_shared_hits_total", "shared_hits", "Treffer im gemeinsamen Cache."),
+    ("energy_calc_cache_misses_total", "misses", "Berechnungen ohne Cache-Treffer."),
+):
+    CallbackMetric(_name, _help, lambda key=_key: getattr(calc_cache, key), kind="counter")
+CallbackMetric("energy_calc_cache_size", "Einträge im Prozess-Cache.", lambda: len(calc_cache._entries))
+
+
+def cached_calc_heating_demand(building: Building) -> dict:
+    return calc_cache.calc(building)
@@ -1,4 +1,164 @@
+import hashlib
+
+import numpy as np
+
 from .models import Building
+from .pv import self_consumption, self_consumption_by_location
+from .solar import DEFAULT_SOL_K, sol_k, sol_k_columns
+
+
+# Version der Rechenformeln. Bei jeder Änderung an calc_heating_demand /
+# calc_heating_demand_batch hochzählen, damit zwischengespeicherte Ergebnisse
+# ihre Gültigkeit verlieren und gespeicherte Gebäude als veraltet gelten
+# ("manage.py recalculate_buildings --stale").
+CALC_VERSION = 1
+
+# Eingabefelder des Modells, die in die Berechnung eingehen (Spaltenreihenfolge
+# für die Batch-Berechnung)
+INPUT_FIELDS = (
+    "length_ns",
+    "width_ow",
+    "storeys",
+    "room_height",
+    "u_wall",
+    "u_roof",
+    "u_floor",
+    "u_window",
+    "window_share_n",
+    "window_share_e",
+    "window_share_s",
+    "window_share_w",
+    "g_n",
+    "g_e",
+    "g_s",
+    "g_w",
+    "persons",
+    "air_change_rate",
+    "degree_days",
+    "pv_roof_share",
+    "pv_specific_yield",
+    "pv_self_consumption_share",
+)
+
+# Felder, die nur in bestimmten Fällen in die Berechnung eingehen: der
+# Klimastandort (Einstrahlung, energy.solar) und die stündliche PV-Rechnung
+# (energy.pv). Sie stehen nicht in INPUT_FIELDS, damit Gebäude ohne diese
+# Angaben ihre Eingabe-Hashes behalten.
+OPTIONAL_FIELDS = ("climate_location", "pv_mode", "electricity_demand", "battery_capacity")
+DEFAULT_OPTIONAL = ("", Building.PV_MODE_SHARE, 0.0, 0.0)
+
+# optionale Spalten für calc_heating_demand_batch: Einstrahlung je Fassade
+# [kWh/m²·a] aus dem Klimastandort (energy.solar); fehlen sie, gelten DEFAULT_SOL_K
+SOLAR_FIELDS = ("sol_k_n", "sol_k_e", "sol_k_s", "sol_k_w")
+
+# optionale Spalten für die stündliche PV-Rechnung (pv_hourly 1/0) samt
+# "climate_location" (Standorte als Strings) für das Erzeugungsprofil;
+# fehlen sie, gilt überall der feste Eigenverbrauchsanteil
+PV_FIELDS = ("pv_hourly", "electricity_demand", "battery_capacity")
+
+# Ergebnisgrößen in der Reihenfolge des Rückgabe-Dicts
+RESULT_KEYS = (
+    "floor_area",
+    "roof_area",
+    "opaque_wall_area",
+    "window_area",
+    "H_T",
+    "H_V",
+    "Q_T",
+    "Q_V",
+    "Q_I",
+    "Q_S",
+    "Q_h",
+    "Q_S_n",
+    "Q_S_e",
+    "Q_S_s",
+    "Q_S_w",
+    "Q_PV_total",
+    "Q_PV_on",
+    "Q_PV_off",
+)
+
+# zugehörige Ergebnisfelder im Modell (result_Q_T, result_H_T, ...)
+RESULT_FIELDS = tuple(f"result_{key}" for key in RESULT_KEYS)
+
+# Geometrie und H_T/H_V berechnet die Datenbank selbst (GeneratedField in
+# models.py); beim Zurückschreiben bleiben nur die übrigen Ergebnisse
+WRITABLE_RESULT_KEYS = tuple(
+    key for key in RESULT_KEYS if not Building._meta.get_field(f"result_{key}").generated
+)
+
+
+def input_values(building: Building) -> tuple:
+    """
+    Eingabewerte eines Gebäudes in der Reihenfolge von INPUT_FIELDS.
+    """
+    return tuple(getattr(building, name) for name in INPUT_FIELDS)
+
+
+def optional_values(building: Building) -> tuple:
+    """
+    Werte eines Gebäudes in der Reihenfolge von OPTIONAL_FIELDS.
+    """
+    return tuple(getattr(building, name) for name in OPTIONAL_FIELDS)
+
+
+def optional_arrays(rows) -> dict:
+    """
+    Zusätzliche Spalten für calc_heating_demand_batch (SOLAR_FIELDS,
+    PV_FIELDS, "climate_location") aus Zeilen in der Reihenfolge von
+    OPTIONAL_FIELDS.
+    """
+    locations, modes, demand, capacity = zip(*rows) if rows else ((), (), (), ())
+    columns = sol_k_columns(locations)
+    arrays = {name: columns[:, i] for i, name in enumerate(SOLAR_FIELDS)}
+    arrays["climate_location"] = np.asarray(locations, dtype=str)
+    arrays["pv_hourly"] = np.array([mode == Building.PV_MODE_HOURLY for mode in modes], dtype=np.float64)
+    arrays["electricity_demand"] = np.asarray(demand, dtype=np.float64)
+    arrays["battery_capacity"] = np.asarray(capacity, dtype=np.float64)
+    return arrays
+
+
+def input_fingerprint(values, optional=DEFAULT_OPTIONAL) -> str:
+    """
+    Kanonischer Hash über die Eingabewerte (Reihenfolge wie INPUT_FIELDS)
+    und die wirksamen optionalen Angaben (Reihenfolge wie OPTIONAL_FIELDS):
+    die Einstrahlung je Fassade am Klimastandort und die Parameter der
+    stündlichen PV-Rechnung. Ganzzahlige und Gleitkomma-Werte mit gleichem
+    Zahlenwert ergeben denselben Hash (3 == 3.0); ohne Klimastandort und
+    mit festem Eigenverbrauchsanteil bleibt der Hash wie vor Einführung
+    dieser Angaben.
+    """
+    location, pv_mode, demand, capacity = optional
+    values = tuple(values)
+    solar = sol_k(location)
+    if solar != DEFAULT_SOL_K:
+        values += solar
+    canonical = ";".join(repr(float(v)) for v in values)
+    if pv_mode == Building.PV_MODE_HOURLY:
+        canonical += f";pv:{location}:{float(demand)!r}:{float(capacity)!r}"
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def apply_result(building: Building, result: dict) -> None:
+    """
+    Schreibt ein Ergebnis-Dict von calc_heating_demand in die result_*-Felder
+    und vermerkt Eingabe-Hash und Formelversion.
+    """
+    for key, field in zip(RESULT_KEYS, RESULT_FIELDS):
+        setattr(building, field, result[key])
+    building.input_fingerprint = input_fingerprint(input_values(building), optional_values(building))
+    building.calc_version = CALC_VERSION
+
+
+def is_current(building: Building) -> bool:
+    """
+    True, wenn die gespeicherten Ergebnisse mit der aktuellen Formelversion
+    aus genau den aktuellen Eingaben berechnet wurden.
+    """
+    return (
+        building.calc_version == CALC_VERSION
+        and building.input_fingerprint == input_fingerprint(input_values(building), optional_values(building))
+    )
 
 
 def calc_heating_demand(building: Building) -> dict:
@@ -72,12 +232,9 @@ def calc_heating_demand(building: Building) -> dict:
         / 1000.0
     )  # kWh/a
 
-    # Solare Gewinne – sehr einfache Orientierungswerte [kWh/m²*a]
-    # Diese Zahlen sind Näherungen, nicht normgerecht.
-    sol_k_n = 150.0
-    sol_k_e = 300.0
-    sol_k_s = 500.0
-    sol_k_w = 300.0
+    # Solare Gewinne – Einstrahlung je Fassade in der Heizzeit [kWh/m²*a]
+    # am Klimastandort, ohne Standort feste Orientierungswerte
+    sol_k_n, sol_k_e, sol_k_s, sol_k_w = sol_k(building.climate_location)
 
     Q_S_n = win_n * building.g_n * sol_k_n
     Q_S_e = win_e * building.g_e * sol_k_e
@@ -99,9 +256,16 @@ def calc_heating_demand(building: Building) -> dict:
     # Gesamt-PV-Ertrag [kWh/a]
     Q_PV_total = pv_area * building.pv_specific_yield
 
-    # Eigenverbrauch und Überschuss
-    pv_self_frac = building.pv_self_consumption_share / 100.0
-    Q_PV_on = Q_PV_total * pv_self_frac      # im Gebäude genutzt
+    # Eigenverbrauch und Überschuss: fester Anteil oder stündlich aus
+    # Erzeugungs- und Lastprofil (energy.pv)
+    if building.pv_mode == Building.PV_MODE_HOURLY:
+        Q_PV_on = float(self_consumption(
+            [Q_PV_total], [building.electricity_demand], [building.battery_capacity],
+            building.climate_location,
+        )[0])
+    else:
+        pv_self_frac = building.pv_self_consumption_share / 100.0
+        Q_PV_on = Q_PV_total * pv_self_frac  # im Gebäude genutzt
     Q_PV_off = Q_PV_total - Q_PV_on          # Überschuss
 
 
@@ -124,6 +288,135 @@ def calc_heating_demand(building: Building) -> dict:
         "Q_S_s": Q_S_s,
         "Q_S_w": Q_S_w,
 
+        "Q_PV_total": Q_PV_total,
+        "Q_PV_on": Q_PV_on,
+        "Q_PV_off": Q_PV_off,
+    }
+
+
+def rows_to_arrays(rows, fields=INPUT_FIELDS) -> dict:
+    """
+    Wandelt Zeilen (Tupel in der Reihenfolge von fields, z. B. aus
+    values_list) in ein Dict von NumPy-Spalten um.
+    """
+    matrix = np.asarray(rows, dtype=np.float64).reshape(-1, len(fields))
+    return {name: matrix[:, i] for i, name in enumerate(fields)}
+
+
+def calc_heating_demand_batch(arrays: dict) -> dict:
+    """
+    Vektorisierte Variante von calc_heating_demand für viele Gebäude.
+
+    Erwartet ein Dict mit je einem NumPy-Array pro Feld aus INPUT_FIELDS
+    (alle gleich lang), optional auch aus SOLAR_FIELDS und PV_FIELDS (siehe
+    optional_arrays), und liefert ein Dict mit je einem Array pro Schlüssel
+    aus RESULT_KEYS. Die Rechenschritte stehen in derselben Reihenfolge wie in
+    der Einzelberechnung, damit die Ergebnisse bitgenau übereinstimmen.
+    """
+    a = {name: np.asarray(arrays[name], dtype=np.float64) for name in INPUT_FIELDS}
+
+    # Grundgrößen
+    length = a["length_ns"]
+    width = a["width_ow"]
+    storeys = a["storeys"]
+    h_room = a["room_height"]
+
+    h_building = storeys * h_room
+
+    floor_area = length * width
+    roof_area = floor_area
+    floor_area_ceiling = floor_area
+
+    # Fassadenflächen
+    facade_n = length * h_building
+    facade_s = length * h_building
+    facade_e = width * h_building
+    facade_w = width * h_building
+
+    # Fensterflächen je Orientierung
+    win_n = facade_n * (a["window_share_n"] / 100.0)
+    win_s = facade_s * (a["window_share_s"] / 100.0)
+    win_e = facade_e * (a["window_share_e"] / 100.0)
+    win_w = facade_w * (a["window_share_w"] / 100.0)
+
+    window_area = win_n + win_e + win_s + win_w
+
+    # opake Wandflächen
+    opaque_wall_area = (
+        (facade_n - win_n) + (facade_s - win_s) + (facade_e - win_e) + (facade_w - win_w)
+    )
+
+    # Transmission und Lüftung
+    H_T = (
+        a["u_wall"] * opaque_wall_area
+        + a["u_roof"] * roof_area
+        + a["u_floor"] * floor_area_ceiling
+        + a["u_window"] * window_area
+    )
+
+    V = floor_area * h_room * storeys
+    H_V = 0.34 * a["air_change_rate"] * V
+
+    HDD = a["degree_days"]
+    heating_hours = HDD * 24
+
+    Q_T = H_T * heating_hours / 1000.0
+    Q_V = H_V * heating_hours / 1000.0
+
+    # Innere Gewinne
+    occupancy_hours = HDD * 8.0 / 1.0
+    Q_I = a["persons"] * 80.0 * occupancy_hours / 1000.0
+
+    # Solare Gewinne
+    if SOLAR_FIELDS[0] in arrays:
+        sol_k_n, sol_k_e, sol_k_s, sol_k_w = (np.asarray(arrays[name], dtype=np.float64) for name in SOLAR_FIELDS)
+    else:
+        sol_k_n, sol_k_e, sol_k_s, sol_k_w = DEFAULT_SOL_K
+
+    Q_S_n = win_n * a["g_n"] * sol_k_n
+    Q_S_e = win_e * a["g_e"] * sol_k_e
+    Q_S_s = win_s * a["g_s"] * sol_k_s
+    Q_S_w = win_w * a["g_w"] * sol_k_w
+
+    Q_S = Q_S_n + Q_S_e + Q_S_s + Q_S_w
+
+    # Heizwärmebedarf, negative Werte wie in der Einzelberechnung auf 0 setzen
+    Q_h = Q_V + Q_T - Q_I - Q_S
+    Q_h = np.where(Q_h < 0, 0.0, Q_h)
+
+    # PV-Bilanz
+    pv_area = roof_area * (a["pv_roof_share"] / 100.0)
+    Q_PV_total = pv_area * a["pv_specific_yield"]
+    Q_PV_on = Q_PV_total * (a["pv_self_consumption_share"] / 100.0)
+    if PV_FIELDS[0] in arrays:
+        hourly = np.asarray(arrays["pv_hourly"], dtype=bool)
+        if hourly.any():
+            locations = arrays.get("climate_location", np.full(len(hourly), ""))
+            Q_PV_on[hourly] = self_consumption_by_location(
+                Q_PV_total[hourly],
+                np.asarray(arrays["electricity_demand"], dtype=np.float64)[hourly],
+                np.asarray(arrays["battery_capacity"], dtype=np.float64)[hourly],
+                np.asarray(locations, dtype=str)[hourly],
+            )
+    Q_PV_off = Q_PV_total - Q_PV_on
+
+    return {
+        "floor_area": floor_area,
+        "roof_area": roof_area,
+        "opaque_wall_area": opaque_wall_area,
+        "window_area": window_area,
+
+        "H_T": H_T,
+        "H_V": H_V,
+        "Q_T": Q_T,
+        "Q_V": Q_V,
+        "Q_I": Q_I,
+        "Q_S": Q_S,
+        "Q_h": Q_h,
+
+        "Q_S_n": Q_S_n,
+        "Q_S_e": Q_S_e,
+        "Q_S_s": Q_S_s,
         "Q_S_w": Q_S_w,
 
         "Q_PV_total": Q_PV_total,
@@ -0,0 +1,326 @@
+import csv
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+
+# Stündliche Wetterdaten je Standort (Testreferenzjahr, EPW-Format), einmal
+# in ein Verzeichnis je Standort umgewandelt: eine .npy-Datei je Spalte
+# (float32, 8760 Werte) plus meta.json. Gelesen wird per Memory-Map, die
+# Daten werden also erst beim Zugriff und nur seitenweise geladen.
+
+HOURS = 8760
+
+# Spalten des Speichers: Name -> (Spalte in der EPW-Datendatei, Fehlwert-Kennung)
+EPW_COLUMNS = {
+    "temp_air": (6, 99.9),      # Lufttemperatur [°C]
+    "ghi": (13, 9999),          # Globalstrahlung horizontal [Wh/m²]
+    "dni": (14, 9999),          # Direktnormalstrahlung [Wh/m²]
+    "dhi": (15, 9999),          # Diffusstrahlung horizontal [Wh/m²]
+    "wind_speed": (21, 999),    # Windgeschwindigkeit [m/s]
+}
+
+EPW_HEADER_LINES = 8
+
+logger = logging.getLogger(__name__)
+_reported_missing = set()
+
+
+class ClimateError(ValueError):
+    """
+    Wetterdatei nicht lesbar oder Standort nicht vorhanden.
+    """
+
+
+def report_missing(location_id, exc):
+    """
+    Protokolliert einmal je Prozess, dass für einen gespeicherten
+    Klimastandort keine Wetterdaten (mehr) vorhanden sind; die Aufrufer
+    rechnen dann mit den Standardwerten weiter.
+    """
+    if location_id not in _reported_missing:
+        _reported_missing.add(location_id)
+        logger.warning("Klimastandort %r nicht verfügbar (%s), Standardwerte verwendet.", location_id, exc)
+
+
+def location_slug(text):
+    """
+    Standort-ID aus einem beliebigen Namen: Kleinbuchstaben, Ziffern, "-".
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+    if not slug:
+        raise ClimateError(f"Keine gültige Standort-ID: {text!r}")
+    return slug
+
+
+def _fill_missing(values):
+    """
+    Ersetzt NaN linear aus den Nachbarstunden (Jahr als Zyklus).
+    """
+    missing = np.isnan(values)
+    if missing.all():
+        raise ClimateError("Spalte enthält keine gültigen Werte.")
+    if missing.any():
+        hours = np.arange(len(values))
+        values[missing] = np.interp(hours[missing], hours[~missing], values[~missing], period=len(values))
+    return values
+
+
+def read_epw(fileobj):
+    """
+    Liest eine EPW-Datei (Textdatei) und liefert (meta, Spalten) mit
+    Spalten als float64-Arrays zu 8760 Stunden. Der 29. Februar eines
+    Schaltjahres wird verworfen, Fehlwerte werden interpoliert.
+    """
+    lines = fileobj.read().splitlines()
+    if len(lines) <= EPW_HEADER_LINES or not lines[0].startswith("LOCATION"):
+        raise ClimateError("Keine EPW-Datei (erste Zeile muss mit LOCATION beginnen).")
+
+    location = next(csv.reader([lines[0]]))
+    try:
+        meta = {
+            "name": location[1],
+            "region": location[2],
+            "country": location[3],
+            "source": location[4],
+            "wmo": location[5],
+            "latitude": float(location[6]),
+            "longitude": float(location[7]),
+            "timezone": float(location[8]),
+            "elevation": float(location[9]),
+        }
+    except (IndexError, ValueError):
+        raise ClimateError("LOCATION-Zeile unvollständig.")
+
+    rows = [row for row in csv.reader(lines[EPW_HEADER_LINES:]) if row]
+    rows = [row for row in rows if not (row[1] == "2" and row[2] == "29")]
+    if len(rows) != HOURS:
+        raise ClimateError(f"{len(rows)} Datenzeilen statt {HOURS}.")
+
+    columns = {}
+    for name, (index, missing) in EPW_COLUMNS.items():
+        try:
+            values = np.array([float(row[index]) for row in rows])
+        except (IndexError, ValueError):
+            raise ClimateError(f"Spalte {name} (Feld {index + 1}) nicht lesbar.")
+        values[values >= missing] = np.nan
+        columns[name] = _fill_missing(values)
+    return meta, columns
+
+
+class ClimateDataset:
+    """
+    Wetterdaten eines Standorts. Spalten sind schreibgeschützte
+    Memory-Maps (np.memmap) und werden erst beim ersten Zugriff geöffnet.
+    """
+
+    def __init__(self, location_id, path, stamp=None):
+        self.location_id = location_id
+        self.path = path
+        self.stamp = stamp
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._columns = {}
+
+    def __getitem__(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            if name not in self.meta["columns"]:
+                raise KeyError(name)
+            column = self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        return column
+
+    def daily_mean_temperature(self):
+        return np.asarray(self["temp_air"], dtype=np.float64).reshape(-1, 24).mean(axis=1)
+
+    def close(self):
+        # Memory-Maps schließen, sobald keine Views mehr darauf verweisen
+        self._columns.clear()
+
+
+class ClimateStore:
+    """
+    Zugriff auf die umgewandelten Wetterdaten unter root, ein Unterverzeichnis
+    je Standort-ID. Geöffnete Datensätze liegen in einem LRU mit höchstens
+    max_open Einträgen, abgeleitete Werte (Gradtage, Einstrahlungstabellen)
+    in einem eigenen LRU mit höchstens max_derived Einträgen.
+
+    Beide Caches sind an den Stand der meta.json (Inode, mtime) gebunden,
+    den jeder Import neu schreibt; so sehen auch andere Prozesse (Worker,
+    Job-Runner) einen Neuimport ohne Neustart.
+    """
+
+    def __init__(self, root, max_open=16, max_derived=256):
+        self.root = str(root)
+        self.max_open = max_open
+        self.max_derived = max_derived
+        self._open = OrderedDict()
+        self._derived = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, location_id):
+        return os.path.join(self.root, location_slug(location_id))
+
+    def _stamp(self, location_id):
+        try:
+            stat = os.stat(os.path.join(self._path(location_id), "meta.json"))
+        except FileNotFoundError:
+            raise ClimateError(f"Standort {location_id!r} nicht vorhanden.") from None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def locations(self):
+        """
+        Vorhandene Standorte als {ID: meta}, nach ID sortiert.
+        """
+        result = {}
+        if not os.path.isdir(self.root):
+            return result
+        for name in sorted(os.listdir(self.root)):
+            meta_path = os.path.join(self.root, name, "meta.json")
+            if not name.startswith(".") and os.path.exists(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    result[name] = json.load(f)
+        return result
+
+    def exists(self, location_id):
+        try:
+            return os.path.exists(os.path.join(self._path(location_id), "meta.json"))
+        except ClimateError:
+            return False
+
+    def open(self, location_id):
+        location_id = location_slug(location_id)
+        stamp = self._stamp(location_id)
+        with self._lock:
+            dataset = self._open.get(location_id)
+            if dataset is not None and dataset.stamp == stamp:
+                self._open.move_to_end(location_id)
+                return dataset
+
+        dataset = ClimateDataset(location_id, self._path(location_id), stamp)
+
+        with self._lock:
+            current = self._open.get(location_id)
+            if current is not None and current.stamp == stamp:
+                # parallel geöffnet: den zuerst eingetragenen behalten
+                dataset = current
+            else:
+                # Neuimport (auch durch einen anderen Prozess): alten Stand schließen
+                self._open[location_id] = dataset
+                if current is not None:
+                    current.close()
+            self._open.move_to_end(location_id)
+            while len(self._open) > self.max_open:
+                _, evicted = self._open.popitem(last=False)
+                evicted.close()
+        return dataset
+
+    def derived(self, location_id, key, func):
+        """
+        Aus den Wetterdaten abgeleiteter Wert, func(dataset) wird je
+        (Standort, Importstand, key) nur einmal aufgerufen. Die Werte
+        bleiben auch nach dem Schließen des Datensatzes erhalten, bis sie
+        aus dem LRU fallen oder der Standort neu importiert wird.
+        """
+        location_id = location_slug(location_id)
+        cache_key = (location_id, self._stamp(location_id), key)
+        with self._lock:
+            value = self._derived.get(cache_key)
+            if value is not None:
+                self._derived.move_to_end(cache_key)
+                return value
+
+        dataset = self.open(location_id)
+        value = func(dataset)
+        with self._lock:
+            # mit dem Stand des tatsächlich gelesenen Datensatzes ablegen
+            self._derived[(location_id, dataset.stamp, key)] = value
+            while len(self._derived) > self.max_derived:
+                self._derived.popitem(last=False)
+        return value
+
+    def degree_days(self, location_id, base=20.0, heating_limit=15.0):
+        """
+        Gradtage [K·d] eines Standorts: Summe (base - Tagesmittel) über alle
+        Tage mit Tagesmittel unter heating_limit (Gradtagzahl G20/15 nach
+        VDI 4710; heating_limit=None zählt alle Tage unter base).
+        """
+        limit = base if heating_limit is None else heating_limit
+
+        def compute(dataset):
+            daily = dataset.daily_mean_temperature()
+            return float(np.sum(np.where(daily < limit, base - daily, 0.0)))
+
+        return self.derived(location_id, ("degree_days", float(base), float(limit)), compute)
+
+    def write(self, location_id, meta, columns):
+        """
+        Legt einen Standort an bzw. ersetzt ihn. Geschrieben wird in ein
+        temporäres Verzeichnis, das erst am Ende umbenannt wird, damit
+        Leser nie einen halb geschriebenen Standort sehen.
+        """
+        location_id = location_slug(location_id)
+        os.makedirs(self.root, exist_ok=True)
+        target = self._path(location_id)
+        tmp = os.path.join(self.root, f".{location_id}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        for name, values in columns.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(values, dtype=np.float32))
+        meta = {**meta, "id": location_id, "hours": HOURS, "columns": sorted(columns)}
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+
+        self.forget(location_id)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(tmp, target)
+        return location_id
+
+    def forget(self, location_id):
+        """
+        Verwirft geöffnete Daten und abgeleitete Werte eines Standorts (nach Neuimport).
+        """
+        location_id = location_slug(location_id)
+        with self._lock:
+            dataset = self._open.pop(location_id, None)
+            for key in [key for key in self._derived if key[0] == location_id]:
+                del self._derived[key]
+        if dataset is not None:
+            dataset.close()
+
+
+def import_epw(path, location_id=None, store=None):
+    """
+    Wandelt eine EPW-Datei in den Speicher um. Ohne location_id wird die
+    WMO-Stationsnummer verwendet, sonst der Dateiname.
+    Rückgabe: (Standort-ID, meta).
+    """
+    store = store or climate_store
+    with open(path, encoding="utf-8", errors="replace") as f:
+        meta, columns = read_epw(f)
+    if location_id is None:
+        location_id = meta["wmo"] if meta["wmo"].strip() else os.path.splitext(os.path.basename(path))[0]
+    meta["file"] = os.path.basename(path)
+    location_id = store.write(location_id, meta, columns)
+    return location_id, meta
+
+
+def _build_store():
+    config = getattr(settings, "ENERGY_CLIMATE", {})
+    return ClimateStore(
+        root=config.get("ROOT", os.path.join(settings.BASE_DIR, "climate_data")),
+        max_open=config.get("MAX_OPEN", 16),
+        max_derived=config.get("MAX_DERIVED", 256),
+    )
+
+
+climate_store = _build_store()
@@ -0,0 +1,315 @@
+import csv
+import time
+from io import StringIO
+from itertools import islice
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from .calc import INPUT_FIELDS, OPTIONAL_FIELDS
+from .metrics import record_export
+from .models import Building
+from .uncertainty import PERCENTILES, UNCERTAINTY_KEYS, percentiles
+
+
+# Spalten der Gebäudeliste-Exporte (values_list-Projektion statt ganzer Modelle)
+EXPORT_FIELDS = (
+    "id",
+    "name",
+    "result_floor_area",
+    "result_Q_h",
+    "result_Q_T",
+    "result_Q_V",
+    "result_Q_I",
+    "result_Q_S",
+    "result_Q_PV_total",
+    "result_Q_PV_on",
+    "result_Q_PV_off",
+)
+
+CSV_HEADER = [
+    "ID",
+    "Name",
+    "Grundfläche [m²]",
+    "Q_h [kWh/a]",
+    "Q_T [kWh/a]",
+    "Q_V [kWh/a]",
+    "Q_I [kWh/a]",
+    "Q_S [kWh/a]",
+    "PV gesamt [kWh/a]",
+    "PV Eigenverbrauch [kWh/a]",
+    "PV Überschuss [kWh/a]",
+]
+
+XLSX_HEADER = [
+    "ID",
+    "Name",
+    "Grundfläche [m²]",
+    "Q_h [kWh/a]",
+    "Q_T [kWh/a]",
+    "Q_V [kWh/a]",
+    "Q_I [kWh/a]",
+    "Q_S [kWh/a]",
+    "PV gesamt [kWh/a]",
+    "PV Eigenverb [kWh/a]",
+    "PV Überschuss [kWh/a]",
+]
+
+PDF_HEADER = ["ID", "Name", "Grundfl. [m²]", "Q_h [kWh/a]", "PV on [kWh/a]", "PV off [kWh/a]"]
+
+# Zusatzspalten des Exports mit Unsicherheitsanalyse (je Schlüssel aus UNCERTAINTY_KEYS)
+UNCERTAINTY_HEADER = [
+    f"{label} P{p} [kWh/a]"
+    for label in ("Q_h", "PV Eigenverbrauch", "PV Überschuss")
+    for p in PERCENTILES
+]
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+# Spalten des PDF-Exports
+PDF_FIELDS = ("id", "name", "result_floor_area", "result_Q_h", "result_Q_PV_on", "result_Q_PV_off")
+
+
+def iter_export_rows(queryset=None, fields=EXPORT_FIELDS, chunk_size=2000):
+    """
+    Liefert die Exportspalten aller Gebäude als Tupel, nach ID sortiert und
+    über einen Server-seitigen Iterator gelesen.
+    """
+    if queryset is None:
+        queryset = Building.objects.all()
+    return (
+        queryset.order_by("id")
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_uncertainty_rows(queryset=None, samples=None, seed=None, chunk_size=2000):
+    """
+    Wie iter_export_rows (EXPORT_FIELDS), jede Zeile ergänzt um die Perzentile
+    der Unsicherheitsanalyse (Spalten wie UNCERTAINTY_HEADER). Gerechnet wird
+    je Block von chunk_size Gebäuden.
+    """
+    n = len(EXPORT_FIELDS)
+    rows = iter_export_rows(queryset, fields=EXPORT_FIELDS + INPUT_FIELDS + OPTIONAL_FIELDS, chunk_size=chunk_size)
+    while True:
+        block = list(islice(rows, chunk_size))
+        if not block:
+            return
+        stats = percentiles(
+            [row[n:n + len(INPUT_FIELDS)] for row in block],
+            [row[n + len(INPUT_FIELDS):] for row in block],
+            samples,
+            seed,
+        )
+        extra = np.column_stack([stats[key] for key in UNCERTAINTY_KEYS]).round(1).tolist()
+        for row, values in zip(block, extra):
+            yield (*row[:n], *values)
+
+
+def iter_csv(rows, rows_per_chunk=1000, header=CSV_HEADER):
+    """
+    Erzeugt den CSV-Export (Trennzeichen ";") als Folge von Text-Blöcken
+    mit jeweils höchstens rows_per_chunk Zeilen.
+
+    Für die Kennzahlen zählt nur die Zeit im Generator, nicht die Wartezeit
+    beim Empfänger zwischen den Blöcken.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    busy = 0.0
+    size = 0
+    resumed = time.perf_counter()
+
+    def flush():
+        nonlocal busy, size
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        size += len(chunk.encode("utf-8"))
+        busy += time.perf_counter() - resumed
+        return chunk
+
+    writer.writerow(header)
+    yield flush()
+    resumed = time.perf_counter()
+
+    count = 0
+    for row in rows:
+        # wie bisher: fehlende Werte (und 0) als leere Zelle
+        writer.writerow([row[0], row[1], *(value or "" for value in row[2:])])
+        count += 1
+        if count >= rows_per_chunk:
+            yield flush()
+            resumed = time.perf_counter()
+            count = 0
+
+    if count:
+        yield flush()
+    record_export("csv", busy, size)
+
+
+def write_xlsx(fileobj, rows, header=XLSX_HEADER):
+    """
+    Schreibt den Excel-Export in fileobj. Die Arbeitsmappe läuft im
+    write-only-Modus: Zeilen werden direkt in die Datei geschrieben statt als
+    Zellobjekte im Speicher gehalten.
+    """
+    start, offset = time.perf_counter(), fileobj.tell()
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Gebäude")
+
+    # Kopfzeile fett
+    bold_font = Font(bold=True)
+    cells = []
+    for title in header:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = bold_font
+        cells.append(cell)
+    ws.append(cells)
+
+    # Datenzeilen
+    try:
+        for row in rows:
+            ws.append([row[0], row[1], *(value or "" for value in row[2:])])
+    except BaseException:
+        # Abbruch (z. B. Hintergrundjob): Zwischendatei des Blatts ordentlich schließen
+        ws.close()
+        raise
+
+    wb.save(fileobj)
+    record_export("xlsx", time.perf_counter() - start, fileobj.tell() - offset)
+
+
+# --- PDF-Tabelle: Layout einmal vorberechnet, Zeichnen direkt auf dem Canvas ---
+
+PDF_MARGIN_LEFT = 20 * mm
+PDF_MARGIN_RIGHT = 20 * mm
+PDF_MARGIN_TOP = 25 * mm
+PDF_MARGIN_BOTTOM = 20 * mm
+
+# Spaltenbreiten: ID, Name, 4 Zahlenspalten = 170 mm Satzspiegel
+PDF_COL_WIDTHS = [14 * mm, 44 * mm, 27 * mm, 27 * mm, 29 * mm, 29 * mm]
+PDF_CELL_PADDING = 6
+
+PDF_HEADER_FONT = ("Helvetica-Bold", 10)
+PDF_BODY_FONT = ("Helvetica", 9)
+PDF_HEADER_HEIGHT = 10 * 1.2 + 2 * 6   # Schriftgröße * Zeilenabstand + Padding oben/unten
+PDF_ROW_HEIGHT = 9 * 1.2 + 2 * 4
+
+PDF_HEADER_BG = colors.HexColor("#e9ecef")
+PDF_ROW_BGS = [colors.white, colors.HexColor("#f8f9fa")]
+
+
+def _fmt(val, decimals=1):
+    if val is None:
+        return "-"
+    return f"{val:.{decimals}f}"
+
+
+def _fit(text, width, font_name, font_size):
+    """
+    Kürzt text mit "…", bis er in die angegebene Breite passt.
+    """
+    if stringWidth(text, font_name, font_size) <= width:
+        return text
+    while text and stringWidth(text + "…", font_name, font_size) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def write_pdf(fileobj, rows, count):
+    """
+    Schreibt den PDF-Export (A4, Tabelle mit wiederholter Kopfzeile) in fileobj.
+
+    Statt einer platypus-Table, deren Umbruch bei vielen Zeilen überlinear
+    teuer wird, stehen Spaltenpositionen und Zeilenhöhen vorab fest und jede
+    Seite wird direkt auf den Canvas gezeichnet. Rechenzeit wächst linear mit
+    der Zeilenzahl; fertige Seiten werden nur noch komprimiert gehalten.
+    """
+    start, offset = time.perf_counter(), fileobj.tell()
+    page_width, page_height = A4
+    c = canvas.Canvas(fileobj, pagesize=A4, pageCompression=1)
+    c.setTitle("Gebäude-Export – Energiebilanz")
+
+    # Spaltenkanten
+    x_edges = [PDF_MARGIN_LEFT]
+    for w in PDF_COL_WIDTHS:
+        x_edges.append(x_edges[-1] + w)
+    table_left, table_right = x_edges[0], x_edges[-1]
+    y_bottom_limit = PDF_MARGIN_BOTTOM
+
+    header_font, header_size = PDF_HEADER_FONT
+    body_font, body_size = PDF_BODY_FONT
+    name_width = PDF_COL_WIDTHS[1] - 2 * PDF_CELL_PADDING
+
+    def draw_title():
+        y = page_height - PDF_MARGIN_TOP - 18
+        c.setFont("Helvetica-Bold", 18)
+        c.drawCentredString(page_width / 2, y, "Gebäude-Export – Energiebilanz")
+        y -= 22 + 6 + 8
+        c.setFont("Helvetica", 10)
+        c.drawString(table_left, y, f"Anzahl Gebäude: {count}")
+        return y - 12 - 6
+
+    def draw_header(top):
+        bottom = top - PDF_HEADER_HEIGHT
+        c.setFillColor(PDF_HEADER_BG)
+        c.rect(table_left, bottom, table_right - table_left, PDF_HEADER_HEIGHT, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        c.setFont(header_font, header_size)
+        baseline = bottom + 6 + 0.2 * header_size
+        for x, title in zip(x_edges, PDF_HEADER):
+            c.drawString(x + PDF_CELL_PADDING, baseline, title)
+        return bottom
+
+    def finish_page(table_top, table_bottom, row_lines):
+        # Gitterlinien einer Seite in einem Durchgang
+        c.setStrokeColor(colors.grey)
+        c.setLineWidth(0.25)
+        for y in row_lines:
+            c.line(table_left, y, table_right, y)
+        for x in x_edges:
+            c.line(x, table_top, x, table_bottom)
+        c.showPage()
+
+    table_top = draw_title()
+    y = draw_header(table_top)
+    row_lines = [table_top, y]
+    row_index = 0
+
+    for row in rows:
+        if y - PDF_ROW_HEIGHT < y_bottom_limit:
+            finish_page(table_top, y, row_lines)
+            table_top = page_height - PDF_MARGIN_TOP
+            y = draw_header(table_top)
+            row_lines = [table_top, y]
+
+        bottom = y - PDF_ROW_HEIGHT
+        c.setFillColor(PDF_ROW_BGS[row_index % 2])
+        c.rect(table_left, bottom, table_right - table_left, PDF_ROW_HEIGHT, stroke=0, fill=1)
+
+        c.setFillColor(colors.black)
+        c.setFont(body_font, body_size)
+        baseline = bottom + 4 + 0.2 * body_size
+        pk, name, floor_area, q_h, pv_on, pv_off = row
+        c.drawRightString(x_edges[1] - PDF_CELL_PADDING, baseline, str(pk))
+        c.drawString(x_edges[1] + PDF_CELL_PADDING, baseline, _fit(name, name_width, body_font, body_size))
+        for i, value in enumerate((floor_area, q_h, pv_on, pv_off), start=3):
+            c.drawRightString(x_edges[i] - PDF_CELL_PADDING, baseline, _fmt(value, 1))
+
+        y = bottom
+        row_lines.append(y)
+        row_index += 1
+
+    finish_page(table_top, y, row_lines)
+    c.save()
+    record_export("pdf", time.perf_counter() - start, fileobj.tell() - offset)
@@ -1,8 +1,28 @@
 from django import forms
+
+from .calc import INPUT_FIELDS
+from .climate import climate_store
 from .models import Building
+from .retrofit import OBJECTIVES
+from .sweep import MAX_AXES, SweepError, parse_values
+
+
+def climate_location_choices():
+    # bei jedem Formular neu gelesen, damit frisch importierte Standorte erscheinen
+    return [("", "– ohne Standort (Standardwerte) –")] + [
+        (location_id, f"{meta['name']} ({location_id})")
+        for location_id, meta in climate_store.locations().items()
+    ]
 
 
 class BuildingForm(forms.ModelForm):
+    climate_location = forms.ChoiceField(
+        label=Building._meta.get_field("climate_location").verbose_name,
+        choices=climate_location_choices,
+        required=False,
+        help_text="Einstrahlung je Fassade aus den Wetterdaten (manage.py import_weather).",
+    )
+
     class Meta:
         model = Building
         fields = [
@@ -27,8 +47,78 @@ class BuildingForm(forms.ModelForm):
             "persons",
             "air_change_rate",
             "degree_days",
+            "climate_location",
             "setpoint_temp",
             "pv_roof_share",
             "pv_specific_yield",
             "pv_self_consumption_share",
+            "pv_mode",
+            "electricity_demand",
+            "battery_capacity",
         ]
+
+
+class BuildingImportForm(forms.Form):
+    file = forms.FileField(
+        label="Datei (CSV oder XLSX)",
+        help_text="Erste Zeile = Spaltenköpfe (Feldnamen oder Beschriftungen aus dem Eingabeformular).",
+    )
+    batch_size = forms.IntegerField(
+        label="Zeilen pro Transaktion",
+        initial=1000,
+        min_value=1,
+        max_value=50000,
+    )
+
+
+SWEEP_FIELD_CHOICES = [(name, Building._meta.get_field(name).verbose_name) for name in INPUT_FIELDS]
+
+
+class SweepForm(forms.Form):
+    """
+    Achsen einer Parameterstudie: je Achse ein Eingabefeld und seine Werte.
+    Achse 1 bildet die x-Achse des Diagramms, Achse 2 die Kurvenschar,
+    über Achse 3 wird gemittelt.
+    """
+
+    field_1 = forms.ChoiceField(label="Achse 1 (x-Achse)", choices=SWEEP_FIELD_CHOICES)
+    values_1 = forms.CharField(
+        label="Werte",
+        help_text="Bereich Start:Ende:Schrittweite (z. B. 0.1:0.5:0.05) oder Liste (0.2; 0.3; 0.45).",
+    )
+    field_2 = forms.ChoiceField(
+        label="Achse 2 (Kurvenschar)", choices=[("", "–")] + SWEEP_FIELD_CHOICES, required=False
+    )
+    values_2 = forms.CharField(label="Werte", required=False)
+    field_3 = forms.ChoiceField(
+        label="Achse 3 (gemittelt)", choices=[("", "–")] + SWEEP_FIELD_CHOICES, required=False
+    )
+    values_3 = forms.CharField(label="Werte", required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        axes = []
+        for i in range(1, MAX_AXES + 1):
+            name, text = cleaned.get(f"field_{i}"), cleaned.get(f"values_{i}")
+            if not name:
+                continue
+            try:
+                axes.append((name, parse_values(text)))
+            except SweepError as exc:
+                self.add_error(f"values_{i}", str(exc))
+        cleaned["axes"] = axes
+        return cleaned
+
+
+class RetrofitForm(forms.Form):
+    """
+    Zielgröße und optionaler Zielwert der Sanierungsoptimierung.
+    """
+
+    objective = forms.ChoiceField(label="Zielgröße", choices=list(OBJECTIVES.items()), initial="Q_h")
+    target = forms.FloatField(
+        label="Zielwert [kWh/m²a]",
+        min_value=0,
+        required=False,
+        help_text="Gesucht wird die günstigste Kombination, die diesen Wert je m² Bezugsfläche (Grundfläche × Geschosse) erreicht.",
+    )
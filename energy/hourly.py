@@ -0,0 +1,313 @@
+import numpy as np
+
+from .calc import INPUT_FIELDS, calc_heating_demand_batch
+
+
+# Stündliche Berechnung nach dem vereinfachten Stundenverfahren der
+# EN ISO 13790 (5R1C: Luft-, Oberflächen- und Massenknoten, ideale Heizung
+# auf die Solltemperatur, keine Kühlung). Gerechnet wird ein Jahr mit 8760
+# Stunden, vektorisiert über Stunden und Gebäude; nur die Zustandsgröße
+# (Temperatur der Speichermasse) läuft Stunde für Stunde weiter.
+
+HOURS = 8760
+
+# Eingaben zusätzlich zu INPUT_FIELDS
+HOURLY_INPUT_FIELDS = (*INPUT_FIELDS, "setpoint_temp")
+
+# Geometrie, die größer als 0 sein muss (Nutzfläche und Wärmekapazität
+# stehen im Nenner des Modells)
+POSITIVE_FIELDS = ("length_ns", "width_ow", "storeys", "room_height")
+
+# Kennwerte nach EN ISO 13790 (Bauweise "mittel")
+H_MS = 9.1            # W/(m²K), Speichermasse <-> Oberfläche
+H_IS = 3.45           # W/(m²K), Oberfläche <-> Luft
+AREA_RATIO_T = 4.5    # Innenoberfläche / Nutzfläche
+AREA_RATIO_M = 2.5    # wirksame Massefläche / Nutzfläche
+C_M = 165000.0        # J/(m²K) Wärmekapazität je m² Nutzfläche
+
+# synthetisches Klima: Jahres- und Tagesgang der Außentemperatur [K]
+ANNUAL_AMPLITUDE = 9.0
+DAILY_AMPLITUDE = 4.0
+LATITUDE = 48.0       # ° Nord, für Sonnenstand und Tageslänge
+
+# belegte Stunden (8 h am Tag wie im Jahresverfahren); die Jahressumme der
+# inneren Gewinne übernimmt das Stundenverfahren aus dem Jahresverfahren
+OCCUPIED_HOURS = (6, 7, 17, 18, 19, 20, 21, 22)
+
+# Einschwingen: die letzten Tage des Jahres vorweg rechnen (Jahr als Zyklus)
+WARMUP_HOURS = 30 * 24
+
+
+def _hours():
+    hour = np.arange(HOURS, dtype=np.float64)
+    return hour, hour % 24, hour // 24
+
+
+def temperature_shape():
+    """
+    Form der Außentemperatur über das Jahr (Mittelwert 0): kältester Tag
+    Mitte Januar, Tagesminimum gegen 4 Uhr.
+    """
+    hour, hour_of_day, day = _hours()
+    annual = -ANNUAL_AMPLITUDE * np.cos(2 * np.pi * (day - 15) / 365)
+    daily = -DAILY_AMPLITUDE * np.cos(2 * np.pi * (hour_of_day - 4) / 24)
+    return annual + daily
+
+
+def solar_shapes():
+    """
+    Stündliche Anteile der Jahresstrahlung je Orientierung (n, e, s, w),
+    jede Spalte summiert sich zu 1. Sonnenhöhe aus geografischer Breite,
+    Deklination und Stundenwinkel; Ost/West bekommen Vor-/Nachmittag,
+    Süd die Mittagsstunden, alle Seiten einen diffusen Grundanteil.
+    """
+    hour, hour_of_day, day = _hours()
+    lat = np.radians(LATITUDE)
+    declination = np.radians(23.45) * np.sin(2 * np.pi * (284 + day + 1) / 365)
+    omega = np.radians(15.0 * (hour_of_day + 0.5 - 12))
+    elevation = np.maximum(
+        0.0, np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(omega)
+    )
+    diffuse = 0.3
+    shapes = np.stack([
+        elevation * diffuse,
+        elevation * (diffuse + np.maximum(0.0, -np.sin(omega))),
+        elevation * (diffuse + np.maximum(0.0, np.cos(omega))),
+        elevation * (diffuse + np.maximum(0.0, np.sin(omega))),
+    ], axis=1)
+    return shapes / shapes.sum(axis=0)
+
+
+def occupancy_schedule():
+    _, hour_of_day, _ = _hours()
+    return np.isin(hour_of_day, OCCUPIED_HOURS).astype(np.float64)
+
+
+def calibrate_offset(degree_days, setpoint, shape=None, iterations=60):
+    """
+    Mittlere Außentemperatur je Gebäude, bei der das synthetische Klima
+    (Mittelwert + shape) genau die angegebenen Gradtage bezogen auf die
+    Solltemperatur ergibt: Summe max(0, Soll - Außen) / 24 = degree_days.
+
+    Bisektion über alle Gebäude gleichzeitig; die Gradtage für einen
+    Abstand x = Soll - Mittelwert folgen aus der sortierten Form und ihren
+    Teilsummen ohne erneuten Durchlauf über alle Stunden.
+    """
+    if shape is None:
+        shape = temperature_shape()
+    s = np.sort(shape)
+    prefix = np.concatenate([[0.0], np.cumsum(s)])
+    target = np.asarray(degree_days, dtype=np.float64)
+
+    def degree_days_at(x):
+        k = np.searchsorted(s, x)
+        return (k * x - prefix[k]) / 24.0
+
+    low = np.full(target.shape, s[0])
+    high = s[-1] + np.maximum(target, 0.0) * 24.0 / len(s)
+    for _ in range(iterations):
+        mid = 0.5 * (low + high)
+        too_low = degree_days_at(mid) < target
+        low = np.where(too_low, mid, low)
+        high = np.where(too_low, high, mid)
+    return np.asarray(setpoint, dtype=np.float64) - 0.5 * (low + high)
+
+
+def _nodes(theta_m_prev, phi_hc, theta_e, phi_ia, phi_st, phi_m, p):
+    """
+    Ein Zeitschritt des 5R1C-Modells (EN ISO 13790, Anhang C), Zuluft mit
+    Außentemperatur. Rückgabe: (Lufttemperatur, Massetemperatur am Ende
+    des Schritts). Linear in allen Eingaben.
+    """
+    phi_m_tot = (
+        phi_m
+        + p["H_tr_em"] * theta_e
+        + p["H_tr_3"] * (
+            phi_st + p["H_tr_w"] * theta_e + p["H_tr_1"] * ((phi_ia + phi_hc) / p["H_ve"] + theta_e)
+        ) / p["H_tr_2"]
+    )
+    theta_m_t = (theta_m_prev * (p["C"] - 0.5 * p["H_sum"]) + phi_m_tot) / (p["C"] + 0.5 * p["H_sum"])
+    theta_m = 0.5 * (theta_m_t + theta_m_prev)
+    theta_s = (
+        p["H_tr_ms"] * theta_m + phi_st + p["H_tr_w"] * theta_e
+        + p["H_tr_1"] * (theta_e + (phi_ia + phi_hc) / p["H_ve"])
+    ) / (p["H_tr_ms"] + p["H_tr_w"] + p["H_tr_1"])
+    theta_air = (p["H_tr_is"] * theta_s + p["H_ve"] * theta_e + phi_ia + phi_hc) / (p["H_tr_is"] + p["H_ve"])
+    return theta_air, theta_m_t
+
+
+class _Climate:
+    """
+    Zeitreihen, die für alle Gebäude gleich sind, und ihre Teilsummen
+    entlang der aufsteigend sortierten Außentemperatur-Form: damit lassen
+    sich Summen über "alle Stunden kälter als x" je Gebäude mit einer
+    Binärsuche bilden statt über eine Stunden-x-Gebäude-Maske.
+    """
+
+    def __init__(self):
+        self.shape = temperature_shape()
+        self.solar = solar_shapes()
+        self.occupancy = occupancy_schedule()
+        # Basisfunktionen der stündlichen Anregung: konstant, Temperaturform,
+        # Belegung, Strahlung n/e/s/w
+        self.basis = np.column_stack([np.ones(HOURS), self.shape, self.occupancy, self.solar])
+
+        order = np.argsort(self.shape)
+        self.sorted_shape = self.shape[order]
+
+        def prefix(values):
+            return np.concatenate([np.zeros((1, *values.shape[1:])), np.cumsum(values[order], axis=0)])
+
+        self.prefix_shape = prefix(self.shape)
+        self.prefix_occupancy = prefix(self.occupancy)
+        self.prefix_solar = prefix(self.solar)
+
+    def colder_than(self, x):
+        """
+        Für Abstände x (je Gebäude, Soll - mittlere Außentemperatur):
+        (Gradstunden, belegte Stunden, Strahlungsanteile n/e/s/w) über die
+        Stunden mit Außentemperatur unter Soll.
+        """
+        k = np.searchsorted(self.sorted_shape, x)
+        degree_hours = k * x - self.prefix_shape[k]
+        return degree_hours, self.prefix_occupancy[k], self.prefix_solar[k].T
+
+
+def _simulate_block(a, static, setpoint, climate):
+    """
+    Simuliert einen Block von Gebäuden. a: Eingabespalten, static: Ergebnis
+    der Jahresberechnung für dieselben Gebäude (Flächen, H_T, H_V,
+    Strahlungsgewinne je Orientierung). Rückgabe: Dict mit Jahressummen.
+    """
+    n = len(setpoint)
+    tiny = 1e-6
+
+    A_f = static["floor_area"] * a["storeys"]
+    A_t = AREA_RATIO_T * A_f
+    A_m = AREA_RATIO_M * A_f
+    H_tr_w = a["u_window"] * static["window_area"]
+    H_tr_ms = H_MS * A_m
+    H_op = np.maximum(static["H_T"] - H_tr_w, tiny)
+    H_tr_is = H_IS * A_t
+    H_ve = np.maximum(static["H_V"], tiny)
+    H_tr_em = 1.0 / np.maximum(1.0 / H_op - 1.0 / H_tr_ms, tiny)
+    H_tr_1 = 1.0 / (1.0 / H_ve + 1.0 / H_tr_is)
+    H_tr_2 = H_tr_1 + H_tr_w
+    H_tr_3 = 1.0 / (1.0 / H_tr_2 + 1.0 / H_tr_ms)
+    p = {
+        "H_tr_w": H_tr_w, "H_tr_ms": H_tr_ms, "H_tr_is": H_tr_is, "H_ve": H_ve,
+        "H_tr_em": H_tr_em, "H_tr_1": H_tr_1, "H_tr_2": H_tr_2, "H_tr_3": H_tr_3,
+        "H_sum": H_tr_3 + H_tr_em, "C": C_M * A_f / 3600.0,
+    }
+
+    # Aufteilung der Gewinne auf die Knoten: Luft erhält die Hälfte der
+    # inneren Gewinne, der Rest und die Strahlung gehen an Masse und Oberfläche
+    f_m = A_m / A_t
+    f_st = 1.0 - A_m / A_t - H_tr_w / (9.1 * A_t)
+
+    # Das Modell ist linear: Antwort von Luft- und Massetemperatur auf je
+    # eine Einheit Außentemperatur, innere Gewinne, Strahlung, vorherige
+    # Massetemperatur und Heizleistung (Vektoren je Gebäude)
+    zero, one = np.zeros(n), np.ones(n)
+    air_e, mass_e = _nodes(zero, zero, one, zero, zero, zero, p)
+    air_i, mass_i = _nodes(zero, zero, zero, 0.5 * one, 0.5 * f_st, 0.5 * f_m, p)
+    air_s, mass_s = _nodes(zero, zero, zero, zero, f_st, f_m, p)
+    delta, alpha = _nodes(one, zero, zero, zero, zero, zero, p)
+    b, gamma = _nodes(zero, one, zero, zero, zero, zero, p)
+
+    # stündliche Anregung = Basisfunktionen (Stunden x 7) @ Koeffizienten je
+    # Gebäude; Außentemperatur = offset + Form, innere Gewinne = Leistung *
+    # Belegung, Strahlung = Jahressumme * Stundenanteil
+    offset = calibrate_offset(a["degree_days"], setpoint, climate.shape)
+    degree_hours, occupied, solar_share = climate.colder_than(setpoint - offset)
+    # Q_I des Jahresverfahrens gleichmäßig auf die belegten Stunden unter
+    # Soll verteilt: die Bilanzanteile Q_I stimmen damit in beiden Verfahren
+    # überein (ohne solche Stunden keine inneren Gewinne)
+    internal = np.divide(
+        static["Q_I"] * 1000.0, occupied, out=np.zeros(n), where=occupied > 0
+    )
+    annual_solar = np.stack([static[f"Q_S_{o}"] for o in "nesw"])   # kWh/a
+
+    def coefficients(on_e, on_i, on_s):
+        return np.vstack([on_e * offset, on_e, on_i * internal, on_s * annual_solar * 1000.0])
+
+    # Heizleistung je Stunde: phi = max(0, (Soll - Luft ohne Heizung) / b)
+    inv_b = 1.0 / b
+    air_free = climate.basis @ coefficients(air_e, air_i, air_s)
+    heat = (setpoint - air_free) * inv_b
+    del air_free
+    mass_free = climate.basis @ coefficients(mass_e, mass_i, mass_s)
+    heat_from_mass = delta * inv_b
+
+    theta_m = setpoint.copy()
+    q_h = np.zeros(n)
+    phi = np.empty(n)
+    for step in range(-WARMUP_HOURS, HOURS):
+        t = step % HOURS
+        np.multiply(heat_from_mass, theta_m, out=phi)
+        np.subtract(heat[t], phi, out=phi)
+        np.maximum(phi, 0.0, out=phi)
+        theta_m *= alpha
+        theta_m += mass_free[t]
+        theta_m += gamma * phi
+        if step >= 0:
+            q_h += phi
+
+    # Bilanzanteile über die Stunden mit Außentemperatur unter Soll
+    result = {
+        "Q_T": static["H_T"] * degree_hours / 1000.0,
+        "Q_V": static["H_V"] * degree_hours / 1000.0,
+        "Q_I": internal * occupied / 1000.0,
+        "Q_h": q_h / 1000.0,
+    }
+    for i, o in enumerate("nesw"):
+        result[f"Q_S_{o}"] = annual_solar[i] * solar_share[i]
+    result["Q_S"] = result["Q_S_n"] + result["Q_S_e"] + result["Q_S_s"] + result["Q_S_w"]
+    return result
+
+
+def calc_heating_demand_hourly(arrays: dict, block_size=1024) -> dict:
+    """
+    Stündliche Variante von calc_heating_demand_batch mit denselben
+    Ergebnisschlüsseln (RESULT_KEYS). Erwartet die Spalten aus
+    HOURLY_INPUT_FIELDS, also zusätzlich die Solltemperatur, und wie dieses
+    die optionalen Spalten aus optional_arrays.
+
+    Das Außenklima ist synthetisch (Jahres- und Tagesgang), je Gebäude so
+    verschoben, dass es dessen Gradtage ergibt; die Strahlung je
+    Orientierung verteilt die Jahreswerte des Jahresverfahrens auf die
+    Stunden, die inneren Gewinne die Jahressumme Q_I auf die belegten
+    Stunden unter Soll. Q_T, Q_V, Q_I und Q_S sind Summen über die Stunden
+    mit Außentemperatur unter Soll (Q_T, Q_V und Q_I damit gleich dem
+    Jahresverfahren, Q_S nur der Anteil dieser Stunden); Q_h ist die
+    simulierte Heizwärme und weicht wegen Speicherwirkung und nur teilweise
+    nutzbarer Gewinne von Q_T + Q_V - Q_I - Q_S ab. Geometrie und PV wie im
+    Jahresverfahren.
+
+    ValueError, wenn eine Größe aus POSITIVE_FIELDS nicht größer als 0 ist.
+
+    Gebäude werden in Blöcken zu block_size gerechnet; je Block liegen zwei
+    Zeitreihen mit 8760 * block_size Werten im Speicher.
+    """
+    a = {name: np.asarray(arrays[name], dtype=np.float64) for name in HOURLY_INPUT_FIELDS}
+    for name in POSITIVE_FIELDS:
+        if not (a[name] > 0).all():
+            raise ValueError(f"{name} muss größer als 0 sein.")
+    # optionale Spalten (Klimastandort, stündliche PV) wie im Jahresverfahren
+    static = calc_heating_demand_batch({**arrays, **a})
+
+    climate = _Climate()
+    result = dict(static)
+    n = len(a["setpoint_temp"])
+    blocks = []
+    for start in range(0, n, block_size):
+        part = slice(start, start + block_size)
+        blocks.append(_simulate_block(
+            {name: column[part] for name, column in a.items()},
+            {name: column[part] for name, column in static.items()},
+            a["setpoint_temp"][part],
+            climate,
+        ))
+    for key in blocks[0] if blocks else ():
+        result[key] = np.concatenate([block[key] for block in blocks])
+    return result
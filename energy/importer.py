@@ -0,0 +1,215 @@
+import csv
+import io
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from openpyxl import load_workbook
+
+from .calc import (
+    CALC_VERSION,
+    RESULT_FIELDS,
+    RESULT_KEYS,
+    calc_heating_demand_batch,
+    input_fingerprint,
+    input_values,
+    optional_arrays,
+    optional_values,
+    rows_to_arrays,
+)
+from .forms import BuildingForm
+from .models import Building
+from .stats import record_created
+
+
+IMPORT_FIELDS = BuildingForm.Meta.fields
+
+# Formularfelder von BuildingForm einmalig; ein eigenes Formular je Zeile würde
+# alle Felder kopieren und den Import um ein Vielfaches verlangsamen.
+FORM_FIELDS = BuildingForm.base_fields
+
+
+def _header_map():
+    """
+    Erlaubte Spaltenköpfe -> Feldname. Akzeptiert werden der Feldname selbst
+    und die Feldbeschriftung aus dem Modell (z. B. "Länge Nord/Süd [m]").
+    """
+    mapping = {}
+    for name in IMPORT_FIELDS:
+        field = Building._meta.get_field(name)
+        mapping[name.lower()] = name
+        mapping[str(field.verbose_name).strip().lower()] = name
+    return mapping
+
+
+def _normalize_value(name, value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        value = value.strip()
+        # deutsches Dezimalkomma ("2,5") in Zahlenfeldern zulassen
+        if name not in ("name", "climate_location", "pv_mode") and "," in value and "." not in value:
+            value = value.replace(",", ".")
+    return value
+
+
+def _records(header, rows, first_row_number):
+    mapping = _header_map()
+    columns = [mapping.get(str(h).strip().lower()) if h is not None else None for h in header]
+
+    for row_number, row in enumerate(rows, start=first_row_number):
+        if not any(value not in (None, "") for value in row):
+            continue  # Leerzeilen überspringen
+        record = {}
+        for name, value in zip(columns, row):
+            if name is not None:
+                record[name] = _normalize_value(name, value)
+        yield row_number, record
+
+
+def iter_csv_records(fileobj):
+    """
+    Liest eine CSV-Datei (Trennzeichen ";" oder ",", erste Zeile = Kopfzeile)
+    zeilenweise und liefert (Zeilennummer, {Feldname: Wert}).
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=";,").delimiter
+    except csv.Error:
+        delimiter = ";"
+    reader = csv.reader(text, delimiter=delimiter)
+    header = next(reader, [])
+    yield from _records(header, reader, first_row_number=2)
+
+
+def iter_xlsx_records(fileobj):
+    """
+    Liest das erste Tabellenblatt einer XLSX-Datei im read-only-Modus
+    zeilenweise und liefert (Zeilennummer, {Feldname: Wert}).
+    """
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        yield from _records(header, rows, first_row_number=2)
+    finally:
+        wb.close()
+
+
+def iter_records(fileobj, filename):
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        return iter_xlsx_records(fileobj)
+    return iter_csv_records(fileobj)
+
+
+class ImportReport:
+    """
+    Ergebnis eines Imports: Anzahl angelegter Gebäude, Fehler je Zeile und Durchsatz.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.rows = 0
+        self.errors = []  # (Zeilennummer, {Feld: [Meldungen]})
+        self.elapsed = 0.0
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def write_errors_csv(self, fileobj):
+        writer = csv.writer(fileobj, delimiter=";")
+        writer.writerow(["Zeile", "Feld", "Fehler"])
+        for row_number, errors in self.errors:
+            for field, messages in errors.items():
+                writer.writerow([row_number, field, " ".join(messages)])
+
+
+def _with_defaults(record):
+    # fehlende Spalten mit den Modell-Standardwerten füllen (wie im leeren Formular)
+    data = dict(record)
+    for name in IMPORT_FIELDS:
+        if data.get(name, "") == "":
+            field = Building._meta.get_field(name)
+            if field.has_default():
+                data[name] = field.get_default()
+    return data
+
+
+def clean_record(record):
+    """
+    Prüft einen Datensatz mit den Feldregeln von BuildingForm.
+    Rückgabe: (bereinigte Werte, Fehler je Feld).
+    """
+    data = _with_defaults(record)
+    cleaned, errors = {}, {}
+    for name in IMPORT_FIELDS:
+        try:
+            cleaned[name] = FORM_FIELDS[name].clean(data.get(name))
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    return cleaned, errors
+
+
+def _save_batch(batch, report):
+    buildings = []
+    for row_number, record in batch:
+        cleaned, errors = clean_record(record)
+        if errors:
+            report.errors.append((row_number, errors))
+        else:
+            buildings.append(Building(**cleaned))
+
+    if buildings:
+        rows = [input_values(b) for b in buildings]
+        optional = [optional_values(b) for b in buildings]
+        result = calc_heating_demand_batch({**rows_to_arrays(rows), **optional_arrays(optional)})
+        columns = [result[key].tolist() for key in RESULT_KEYS]
+        for i, building in enumerate(buildings):
+            for field, column in zip(RESULT_FIELDS, columns):
+                setattr(building, field, column[i])
+            building.input_fingerprint = input_fingerprint(rows[i], optional[i])
+            building.calc_version = CALC_VERSION
+
+        with transaction.atomic():
+            Building.objects.bulk_create(buildings)
+            record_created(buildings)
+
+    report.created += len(buildings)
+    report.rows += len(batch)
+
+
+def import_buildings(records, batch_size=1000, progress=None) -> ImportReport:
+    """
+    Legt Gebäude aus (Zeilennummer, {Feld: Wert})-Datensätzen an.
+
+    Jede Zeile wird mit den Feldregeln von BuildingForm geprüft, gültige Zeilen
+    eines Blocks werden gemeinsam berechnet und per bulk_create in einer
+    Transaktion gespeichert. Ungültige Zeilen landen im Fehlerbericht, der
+    Import läuft weiter. progress(report) wird nach jedem Block aufgerufen.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            _save_batch(batch, report)
+            batch = []
+            report.elapsed = time.perf_counter() - start
+            if progress is not None:
+                progress(report)
+    if batch:
+        _save_batch(batch, report)
+
+    report.elapsed = time.perf_counter() - start
+    if progress is not None:
+        progress(report)
+    return report
@@ -0,0 +1,265 @@
+import tempfile
+import time
+import traceback
+from datetime import timedelta
+
+from django.core.files import File
+from django.utils import timezone
+
+from .exports import (
+    CSV_HEADER,
+    PDF_FIELDS,
+    UNCERTAINTY_HEADER,
+    XLSX_HEADER,
+    iter_csv,
+    iter_export_rows,
+    iter_uncertainty_rows,
+    write_pdf,
+    write_xlsx,
+)
+from .models import Building, Job
+from .recalc import recalculate
+
+
+# Mindestabstand zwischen zwei Fortschritts-Updates in der Datenbank [s]
+PROGRESS_INTERVAL = 0.5
+
+# laufende Jobs ohne Lebenszeichen gelten nach dieser Zeit als verwaist
+STALE_AFTER = timedelta(minutes=10)
+
+
+class JobCancelled(Exception):
+    """
+    Der Abbruch des laufenden Jobs wurde angefordert.
+    """
+
+
+def submit(kind, **params):
+    """
+    Stellt einen Job in die Warteschlange und gibt ihn zurück.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unbekannte Job-Art: {kind}")
+    return Job.objects.create(kind=kind, params=params)
+
+
+def cancel(job):
+    """
+    Wartende Jobs werden sofort abgebrochen, laufende beim nächsten
+    Fortschritts-Update im Worker.
+    """
+    aborted = Job.objects.filter(pk=job.pk, status=Job.STATUS_QUEUED).update(
+        status=Job.STATUS_CANCELLED,
+        message="Vor dem Start abgebrochen.",
+        finished_at=timezone.now(),
+    )
+    if not aborted:
+        Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING).update(cancel_requested=True)
+
+
+def claim_next():
+    """
+    Holt den ältesten wartenden Job und markiert ihn als laufend.
+
+    Der Statuswechsel ist ein bedingtes UPDATE (nur solange noch "queued"),
+    mehrere Worker können daher parallel laufen, ohne einen Job doppelt zu
+    übernehmen – auch unter SQLite, das kein SELECT ... FOR UPDATE kennt.
+    """
+    while True:
+        pk = (
+            Job.objects.filter(status=Job.STATUS_QUEUED)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if pk is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+
+
+def release(job):
+    """
+    Stellt einen vom Worker übernommenen, aber nicht beendeten Job zurück
+    in die Warteschlange (z. B. beim Beenden des Workers).
+    """
+    Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING).update(
+        status=Job.STATUS_QUEUED,
+        progress_done=0,
+        started_at=None,
+        heartbeat_at=None,
+    )
+
+
+class Progress:
+    """
+    Fortschrittsmeldung eines laufenden Jobs. Schreibt höchstens alle
+    PROGRESS_INTERVAL Sekunden in die Datenbank (zugleich Lebenszeichen) und
+    löst JobCancelled aus, sobald ein Abbruch angefordert wurde.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.done = 0
+        self._last_update = 0.0
+
+    def set_total(self, total):
+        Job.objects.filter(pk=self.job.pk).update(progress_total=total)
+
+    def __call__(self, done, force=False):
+        self.done = done
+        now = time.monotonic()
+        if not force and now - self._last_update < PROGRESS_INTERVAL:
+            return
+        self._last_update = now
+
+        jobs = Job.objects.filter(pk=self.job.pk)
+        jobs.update(progress_done=done, heartbeat_at=timezone.now())
+        if jobs.filter(cancel_requested=True).exists():
+            raise JobCancelled()
+
+    def track(self, rows, every=500):
+        """
+        Reicht rows durch und meldet dabei die Anzahl gelesener Zeilen.
+        """
+        count = 0
+        for row in rows:
+            yield row
+            count += 1
+            if count % every == 0:
+                self(count)
+        self(count, force=True)
+
+
+def _store_result(job, fileobj, filename):
+    fileobj.seek(0)
+    job.result_file.save(f"job_{job.pk}_{filename}", File(fileobj), save=False)
+    job.result_name = filename
+    job.save(update_fields=["result_file", "result_name"])
+
+
+def _export_rows(job):
+    """
+    Exportzeilen eines CSV-/Excel-Jobs und ob sie die Perzentile der
+    Unsicherheitsanalyse enthalten (Parameter "uncertainty" = Stichprobenzahl).
+    """
+    samples = job.params.get("uncertainty")
+    if samples:
+        return iter_uncertainty_rows(samples=samples), True
+    return iter_export_rows(), False
+
+
+def _run_export_csv(job, progress):
+    progress.set_total(Building.objects.count())
+    rows, uncertainty = _export_rows(job)
+    header = CSV_HEADER + UNCERTAINTY_HEADER if uncertainty else CSV_HEADER
+    with tempfile.TemporaryFile() as output:
+        for chunk in iter_csv(progress.track(rows), header=header):
+            output.write(chunk.encode("utf-8"))
+        _store_result(job, output, "buildings_export.csv")
+    return f"{progress.done} Gebäude exportiert."
+
+
+def _run_export_xlsx(job, progress):
+    progress.set_total(Building.objects.count())
+    rows, uncertainty = _export_rows(job)
+    header = XLSX_HEADER + UNCERTAINTY_HEADER if uncertainty else XLSX_HEADER
+    with tempfile.TemporaryFile() as output:
+        write_xlsx(output, progress.track(rows), header=header)
+        _store_result(job, output, "buildings_export.xlsx")
+    return f"{progress.done} Gebäude exportiert."
+
+
+def _run_export_pdf(job, progress):
+    count = Building.objects.count()
+    progress.set_total(count)
+    with tempfile.TemporaryFile() as output:
+        write_pdf(output, progress.track(iter_export_rows(fields=PDF_FIELDS)), count=count)
+        _store_result(job, output, "buildings_export.pdf")
+    return f"{progress.done} Gebäude exportiert."
+
+
+def _run_recalculate(job, progress):
+    stale_only = job.params.get("stale", False)
+    if not stale_only:
+        # bei stale=True steht erst am Ende fest, wie viele Gebäude veraltet sind
+        progress.set_total(Building.objects.count())
+    done = recalculate(
+        chunk_size=job.params.get("chunk_size", 2000),
+        progress=lambda done, elapsed: progress(done),
+        stale_only=stale_only,
+    )
+    progress(done, force=True)
+    if stale_only:
+        return f"{done} veraltete Gebäude neu berechnet."
+    return f"{done} Gebäude neu berechnet."
+
+
+JOB_HANDLERS = {
+    Job.KIND_EXPORT_CSV: _run_export_csv,
+    Job.KIND_EXPORT_XLSX: _run_export_xlsx,
+    Job.KIND_EXPORT_PDF: _run_export_pdf,
+    Job.KIND_RECALCULATE: _run_recalculate,
+}
+
+
+def run_job(job):
+    """
+    Führt einen (bereits übernommenen) Job aus und hält das Ergebnis fest.
+    Fehler werden im Job gespeichert statt weitergereicht.
+    """
+    progress = Progress(job)
+    try:
+        message = JOB_HANDLERS[job.kind](job, progress)
+        status = Job.STATUS_DONE
+    except JobCancelled:
+        status, message = Job.STATUS_CANCELLED, "Abgebrochen."
+    except Exception:
+        status, message = Job.STATUS_FAILED, traceback.format_exc()
+
+    Job.objects.filter(pk=job.pk).update(
+        status=status,
+        message=message,
+        progress_done=progress.done,
+        finished_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    return job
+
+
+def fail_stale():
+    """
+    Markiert laufende Jobs ohne Lebenszeichen (Worker abgestürzt) als fehlgeschlagen.
+    """
+    now = timezone.now()
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        heartbeat_at__lt=now - STALE_AFTER,
+    ).update(
+        status=Job.STATUS_FAILED,
+        message="Kein Lebenszeichen mehr vom Worker.",
+        finished_at=now,
+    )
+
+
+def purge_finished(days):
+    """
+    Löscht abgeschlossene Jobs, die älter als days Tage sind, samt Ergebnisdatei.
+    """
+    jobs = Job.objects.filter(
+        status__in=Job.FINISHED_STATUSES,
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    )
+    count = 0
+    for job in jobs.iterator():
+        if job.result_file:
+            job.result_file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
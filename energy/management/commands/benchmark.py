@@ -0,0 +1,115 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from energy.benchmarks import CASES, compare, environment, load_baseline, run_benchmarks, save_baseline
+
+
+class Command(BaseCommand):
+    help = (
+        "Misst Rechenkern, Gebäudeliste und Exporte mit 1k/10k/100k Gebäuden in einer "
+        "eigenen Testdatenbank (Zeit, Spitzenspeicher, Queries) und vergleicht mit einer Baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000,100000",
+            help="Gebäudeanzahlen, durch Komma getrennt (Standard: 1000,10000,100000).",
+        )
+        parser.add_argument(
+            "--cases",
+            help=f"Nur diese Fälle messen, durch Komma getrennt ({', '.join(CASES)}).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Zeitmessungen je Fall; verglichen wird der Median.",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=os.path.join(settings.BASE_DIR, "benchmark_baseline.json"),
+            help=(
+                "Pfad der Baseline-Datei (JSON). Sie ist rechnerabhängig und wird nicht "
+                "mitgeliefert: einmal auf dem Vergleichsrechner mit --save-baseline anlegen."
+            ),
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Ergebnisse als neue Baseline speichern statt zu vergleichen.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Erlaubte relative Verschlechterung von Zeit und Speicher (Standard: 0.25 = 25 %%).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError("--sizes erwartet ganze Zahlen, z. B. 1000,10000.")
+        if any(size < 1 for size in sizes):
+            raise CommandError("--sizes: jede Anzahl muss mindestens 1 sein.")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat muss mindestens 1 sein.")
+
+        cases = None
+        if options["cases"]:
+            cases = [name.strip() for name in options["cases"].split(",")]
+            unknown = [name for name in cases if name not in CASES]
+            if unknown:
+                raise CommandError(f"Unbekannte Fälle: {', '.join(unknown)}")
+
+        baseline = None
+        if not options["save_baseline"]:
+            if os.path.exists(options["baseline"]):
+                baseline, baseline_environment = load_baseline(options["baseline"])
+                if baseline_environment != environment():
+                    self.stdout.write(self.style.WARNING(
+                        "Baseline stammt aus einer anderen Umgebung "
+                        f"({baseline_environment}) – Zeiten nur bedingt vergleichbar."
+                    ))
+            else:
+                self.stdout.write(
+                    f"Keine Baseline unter {options['baseline']} – nur Messung "
+                    "(mit --save-baseline anlegen)."
+                )
+
+        def progress(key, result):
+            self.stdout.write(
+                f"  {key:<28} {result['time'] * 1000:>10.1f} ms "
+                f"(min {result['time_min'] * 1000:.1f}) "
+                f"{result['peak_memory'] / 2**20:>9.1f} MiB {result['queries']:>6} Queries"
+            )
+
+        # eigene Testdatenbank, die echten Daten bleiben unberührt
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # ohne Request-Profiling, sonst misst es sich mit
+            with override_settings(ENERGY_PROFILING={"SAMPLE_RATE": 0}):
+                results = run_benchmarks(sizes, cases=cases, repeat=options["repeat"], progress=progress)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["save_baseline"]:
+            save_baseline(options["baseline"], results)
+            self.stdout.write(self.style.SUCCESS(f"Baseline gespeichert: {options['baseline']}"))
+            return
+
+        if baseline is None:
+            return
+        regressions = compare(results, baseline, tolerance=options["tolerance"])
+        if regressions:
+            raise CommandError(
+                "Verschlechterung gegenüber der Baseline:\n  " + "\n  ".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("Keine Verschlechterung gegenüber der Baseline."))
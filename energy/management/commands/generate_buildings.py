@@ -0,0 +1,109 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from energy.models import Building
+from energy.synthetic import DEFAULT_DISTRIBUTIONS, DistributionError, check_distributions, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Erzeugt N plausible, bereits berechnete Gebäude aus einstellbaren Verteilungen "
+        "(für Last- und Performancetests)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("count", type=int, nargs="?", help="Anzahl zu erzeugender Gebäude.")
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=1,
+            help="Startwert des Zufallsgenerators; gleicher Wert = gleiche Gebäude.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Gebäude pro Block und Transaktion.",
+        )
+        parser.add_argument(
+            "--distributions",
+            metavar="PFAD",
+            help=(
+                "JSON-Datei, die einzelne Verteilungen überschreibt, z. B. "
+                '{"degree_days": {"dist": "normal", "mean": 3800, "sd": 300, "low": 2500, "high": 5000}}.'
+            ),
+        )
+        parser.add_argument(
+            "--show-distributions",
+            action="store_true",
+            help="Standardverteilungen als JSON ausgeben und beenden.",
+        )
+        parser.add_argument(
+            "--prefix",
+            default="Gebäude",
+            help="Namensvorsatz, die Gebäude heißen \"<Vorsatz> <Nummer>\".",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Vorher alle vorhandenen Gebäude löschen.",
+        )
+
+    def handle(self, *args, **options):
+        if options["show_distributions"]:
+            self.stdout.write(json.dumps(DEFAULT_DISTRIBUTIONS, indent=2, ensure_ascii=False))
+            return
+
+        count = options["count"]
+        if count is None:
+            raise CommandError("Bitte die Anzahl der Gebäude angeben.")
+        if count < 1:
+            raise CommandError("Die Anzahl muss mindestens 1 sein.")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size muss mindestens 1 sein.")
+
+        distributions = None
+        if options["distributions"]:
+            try:
+                with open(options["distributions"], encoding="utf-8") as f:
+                    distributions = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Verteilungen können nicht gelesen werden: {exc}")
+            try:
+                check_distributions(distributions)
+            except DistributionError as exc:
+                raise CommandError(str(exc))
+            unknown = set(distributions) - set(DEFAULT_DISTRIBUTIONS)
+            if unknown:
+                raise CommandError(f"Unbekannte Felder: {', '.join(sorted(unknown))}")
+
+        if options["replace"]:
+            deleted, _ = Building.objects.all().delete()
+            self.stdout.write(f"{deleted} vorhandene Gebäude gelöscht.")
+
+        self.stdout.write(f"Erzeuge {count} Gebäude (Seed {options['seed']}) ...")
+
+        def progress(created, elapsed):
+            rate = created / elapsed if elapsed > 0 else 0.0
+            self.stdout.write(f"  {created}/{count} ({created / count:.0%}) – {rate:,.0f} Zeilen/s")
+
+        start = time.perf_counter()
+        try:
+            created = generate(
+                count,
+                seed=options["seed"],
+                distributions=distributions,
+                chunk_size=options["chunk_size"],
+                prefix=options["prefix"],
+                progress=progress,
+            )
+        except DistributionError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - start
+
+        rate = created / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} Gebäude in {elapsed:.1f} s angelegt ({rate:,.0f} Zeilen/s)."
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from energy.importer import import_buildings, iter_records
+
+
+class Command(BaseCommand):
+    help = "Importiert Gebäude aus einer CSV- oder XLSX-Datei und berechnet sie blockweise."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Pfad zur CSV- oder XLSX-Datei.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Anzahl Zeilen pro Block und Transaktion.",
+        )
+        parser.add_argument(
+            "--errors",
+            metavar="PFAD",
+            help="Fehlerbericht (Zeile;Feld;Fehler) als CSV in diese Datei schreiben.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size muss mindestens 1 sein.")
+
+        def progress(report):
+            self.stdout.write(
+                f"  {report.rows} Zeilen, {report.created} angelegt, {report.failed} fehlerhaft "
+                f"– {report.rows_per_second:,.0f} Zeilen/s"
+            )
+
+        try:
+            fileobj = open(options["path"], "rb")
+        except OSError as exc:
+            raise CommandError(f"Datei kann nicht geöffnet werden: {exc}")
+
+        with fileobj:
+            report = import_buildings(
+                iter_records(fileobj, options["path"]),
+                batch_size=options["batch_size"],
+                progress=progress,
+            )
+
+        if options["errors"]:
+            with open(options["errors"], "w", encoding="utf-8", newline="") as f:
+                report.write_errors_csv(f)
+        else:
+            for row_number, errors in report.errors[:20]:
+                details = "; ".join(f"{field}: {' '.join(msgs)}" for field, msgs in errors.items())
+                self.stderr.write(f"  Zeile {row_number}: {details}")
+            if report.failed > 20:
+                self.stderr.write(f"  ... {report.failed - 20} weitere (mit --errors vollständig speichern)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.created} Gebäude angelegt, {report.failed} Zeilen fehlerhaft, "
+            f"{report.elapsed:.1f} s ({report.rows_per_second:,.0f} Zeilen/s)."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from energy.climate import ClimateError, climate_store, import_epw
+
+
+class Command(BaseCommand):
+    help = "Wandelt EPW-Wetterdateien in den Wetterdatenspeicher (ENERGY_CLIMATE) um."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Pfade zu EPW-Dateien.")
+        parser.add_argument(
+            "--id",
+            dest="location_id",
+            help="Standort-ID (nur bei einer Datei; Standard: WMO-Stationsnummer).",
+        )
+
+    def handle(self, *args, **options):
+        if options["location_id"] and len(options["paths"]) > 1:
+            raise CommandError("--id ist nur bei einer einzelnen Datei möglich.")
+
+        for path in options["paths"]:
+            try:
+                location_id, meta = import_epw(path, options["location_id"])
+            except OSError as exc:
+                raise CommandError(f"Datei kann nicht geöffnet werden: {exc}")
+            except ClimateError as exc:
+                raise CommandError(f"{path}: {exc}")
+            self.stdout.write(
+                f"  {location_id}: {meta['name']} ({meta['latitude']:.2f}°, {meta['longitude']:.2f}°), "
+                f"G20/15 = {climate_store.degree_days(location_id):,.0f} Kd"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(options['paths'])} Standort(e) unter {climate_store.root} gespeichert."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from energy.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Baut die Portfolio-Statistik für das Dashboard vollständig aus der Gebäudetabelle neu auf."
+
+    def handle(self, *args, **options):
+        stats = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Portfolio-Statistik neu aufgebaut: {stats.building_count} Gebäude, "
+            f"Q_h gesamt {stats.sum_Q_h:,.0f} kWh/a."
+        ))
@@ -0,0 +1,90 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from energy.models import Building
+from energy.recalc import recalculate
+
+
+class Command(BaseCommand):
+    help = "Berechnet die Ergebnisse aller gespeicherten Gebäude neu (blockweise, optional parallel)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Anzahl Gebäude pro Block (Lesen, Rechnen und Zurückschreiben).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=(
+                "Anzahl Worker-Prozesse für die Berechnung (1 = ohne Prozess-Pool, "
+                f"auf diesem Rechner bis {os.cpu_count() or 1} sinnvoll)."
+            ),
+        )
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help=(
+                "Nur Gebäude mit veralteten Ergebnissen neu berechnen "
+                "(andere Formelversion oder seit der Berechnung geänderte Eingaben)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        workers = options["workers"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size muss mindestens 1 sein.")
+        if workers < 1:
+            raise CommandError("--workers muss mindestens 1 sein.")
+
+        queryset = Building.objects.all()
+        total = queryset.count()
+        if total == 0:
+            self.stdout.write("Keine Gebäude vorhanden.")
+            return
+
+        stale_only = options["stale"]
+        if stale_only:
+            self.stdout.write(
+                f"Prüfe {total} Gebäude und berechne veraltete neu "
+                f"(Blockgröße {chunk_size}, {workers} Worker) ..."
+            )
+        else:
+            self.stdout.write(
+                f"Berechne {total} Gebäude neu (Blockgröße {chunk_size}, {workers} Worker) ..."
+            )
+
+        def progress(done, elapsed):
+            rate = done / elapsed if elapsed > 0 else 0.0
+            if stale_only:
+                self.stdout.write(f"  {done} neu berechnet – {rate:,.0f} Zeilen/s")
+            else:
+                self.stdout.write(
+                    f"  {done}/{total} ({done / total:.0%}) – {rate:,.0f} Zeilen/s"
+                )
+
+        start = time.perf_counter()
+        done = recalculate(
+            queryset,
+            chunk_size=chunk_size,
+            workers=workers,
+            progress=progress,
+            stale_only=stale_only,
+        )
+        elapsed = time.perf_counter() - start
+
+        rate = done / elapsed if elapsed > 0 else 0.0
+        if stale_only:
+            self.stdout.write(self.style.SUCCESS(
+                f"{done} von {total} Gebäuden waren veraltet und wurden in {elapsed:.1f} s neu berechnet."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{done} Gebäude in {elapsed:.1f} s neu berechnet ({rate:,.0f} Zeilen/s)."
+            ))
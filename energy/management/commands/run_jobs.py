@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from energy.jobs import claim_next, fail_stale, purge_finished, release, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker für Hintergrundjobs (Exporte, Neuberechnung): arbeitet die "
+        "Warteschlange in der Datenbank ab. Mehrere Worker können parallel laufen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Nur wartende Jobs abarbeiten und dann beenden.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Wartezeit in Sekunden, wenn die Warteschlange leer ist.",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Abgeschlossene Jobs samt Ergebnisdatei nach so vielen Tagen löschen.",
+        )
+
+    def handle(self, *args, **options):
+        if options["poll_interval"] <= 0:
+            raise CommandError("--poll-interval muss größer als 0 sein.")
+        if options["keep_days"] < 1:
+            raise CommandError("--keep-days muss mindestens 1 sein.")
+
+        # Aufräumen beim Start und danach etwa stündlich
+        housekeeping_interval = 3600.0
+        next_housekeeping = 0.0
+        job = None
+
+        try:
+            while True:
+                if time.monotonic() >= next_housekeeping:
+                    stale = fail_stale()
+                    purged = purge_finished(options["keep_days"])
+                    if stale or purged:
+                        self.stdout.write(f"{stale} verwaiste Jobs beendet, {purged} alte Jobs gelöscht.")
+                    next_housekeeping = time.monotonic() + housekeeping_interval
+
+                job = claim_next()
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                self.stdout.write(f"Starte {job} ...")
+                start = time.perf_counter()
+                job = run_job(job)
+                elapsed = time.perf_counter() - start
+
+                line = f"{job} nach {elapsed:.1f} s"
+                if job.status == job.STATUS_DONE:
+                    self.stdout.write(self.style.SUCCESS(f"{line}: {job.message}"))
+                elif job.status == job.STATUS_FAILED:
+                    self.stderr.write(f"{line}:\n{job.message}")
+                else:
+                    self.stdout.write(self.style.WARNING(line))
+                job = None
+        except KeyboardInterrupt:
+            if job is not None:
+                # angefangenen Job für den nächsten Worker wieder freigeben
+                release(job)
+                self.stdout.write(f"{job} zurück in die Warteschlange gestellt.")
+            self.stdout.write("Worker beendet.")
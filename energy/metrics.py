@@ -0,0 +1,207 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Kennzahlen im Prozess, abrufbar im Prometheus-Textformat unter /metrics/.
+# Jeder Prozess (z. B. jeder gunicorn-Worker) zählt für sich; Prometheus
+# summiert über die Instanzen.
+
+REGISTRY = {}
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Basis der Kennzahlen: Name, Hilfetext und feste Label-Namen. Werte
+    werden je Label-Kombination unter einer Sperre geführt, damit parallele
+    Requests (Threads unter WSGI/ASGI) keine Zählungen verlieren.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        if name in REGISTRY:
+            raise ValueError(f"Kennzahl {name!r} ist bereits registriert.")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: Labels {sorted(labels)} statt {list(self.labelnames)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _labels(self, key):
+        return list(zip(self.labelnames, key))
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    Monoton steigender Zähler.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, self._labels(key), value) for key, value in items]
+
+
+class Histogram(Metric):
+    """
+    Verteilung von Messwerten in festen Klassen (Obergrenzen buckets) plus
+    Summe und Anzahl. Gespeichert werden die Anzahlen je Klasse, kumuliert
+    wird erst beim Abruf.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()
+            )
+        samples = []
+        for key, (counts, total, count) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append((f"{self.name}_bucket", labels + [("le", _format_value(bound))], cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """
+    Wert, der erst beim Abruf gelesen wird (z. B. Zähler, die ein anderes
+    Objekt ohnehin führt). func() liefert eine Zahl.
+    """
+
+    def __init__(self, name, documentation, func, kind="gauge"):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self.func = func
+
+    def samples(self):
+        return [(self.name, [], self.func())]
+
+
+def render():
+    """
+    Alle registrierten Kennzahlen im Prometheus-Textformat.
+    """
+    return "\n".join(metric.render() for metric in REGISTRY.values()) + "\n"
+
+
+# --- Kennzahlen der App ---
+
+CALC_DURATION = Histogram(
+    "energy_calc_duration_seconds",
+    "Laufzeit von calc_heating_demand (scalar) bzw. calc_heating_demand_batch (batch, sweep, uncertainty, retrofit, hourly).",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+    labelnames=("mode",),
+)
+
+BUILDINGS_PROCESSED = Counter(
+    "energy_buildings_processed_total",
+    "Berechnete Gebäude.",
+    labelnames=("mode",),
+)
+
+EXPORT_DURATION = Histogram(
+    "energy_export_duration_seconds",
+    "Erzeugungsdauer der Exporte je Format.",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    labelnames=("format",),
+)
+
+EXPORT_SIZE = Histogram(
+    "energy_export_size_bytes",
+    "Größe der Exporte je Format.",
+    buckets=tuple(1024 * 4 ** i for i in range(11)),   # 1 KiB bis 1 GiB
+    labelnames=("format",),
+)
+
+REQUEST_DURATION = Histogram(
+    "energy_request_duration_seconds",
+    "Antwortzeit je URL-Name (bei gestreamten Antworten bis zum Beginn der Übertragung).",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    labelnames=("view",),
+)
+
+
+def record_calc(mode, count, seconds):
+    CALC_DURATION.observe(seconds, mode=mode)
+    BUILDINGS_PROCESSED.inc(count, mode=mode)
+
+
+@contextmanager
+def observe_calc(mode, count=1):
+    """
+    Misst den with-Block als Berechnung von count Gebäuden.
+    """
+    start = time.perf_counter()
+    yield
+    record_calc(mode, count, time.perf_counter() - start)
+
+
+def record_export(export_format, seconds, size):
+    EXPORT_DURATION.observe(seconds, format=export_format)
+    EXPORT_SIZE.observe(size, format=export_format)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy', '0004_building_pv_roof_share_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(fields=['name', 'id'], name='building_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(fields=['result_floor_area', 'id'], name='building_area_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(fields=['result_Q_h', 'id'], name='building_q_h_id_idx'),
+        ),
+    ]
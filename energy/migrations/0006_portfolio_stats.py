@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy', '0005_building_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('building_count', models.PositiveIntegerField(default=0)),
+                ('calculated_count', models.PositiveIntegerField(default=0)),
+                ('sum_Q_h', models.FloatField(default=0)),
+                ('sum_reference_area', models.FloatField(default=0)),
+                ('sum_Q_PV_total', models.FloatField(default=0)),
+                ('sum_Q_PV_on', models.FloatField(default=0)),
+                ('sum_Q_PV_off', models.FloatField(default=0)),
+                ('class_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy', '0007_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='calc_version',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='input_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(fields=['calc_version'], name='building_calc_version_idx'),
+        ),
+    ]
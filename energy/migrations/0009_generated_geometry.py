@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:10
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy', '0008_building_calc_provenance'),
+    ]
+
+    # Ein bestehendes Feld lässt sich nicht in ein GeneratedField umwandeln:
+    # die Ergebnisspalten werden entfernt und als von der Datenbank berechnete
+    # (gespeicherte) Spalten neu angelegt, die Werte füllt SQLite selbst.
+    operations = [
+        migrations.RemoveIndex(
+            model_name='building',
+            name='building_area_id_idx',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='result_H_T',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='result_H_V',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='result_floor_area',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='result_roof_area',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='result_opaque_wall_area',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='result_window_area',
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='result_H_T',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('u_wall'), '*', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_n'), '/', models.Value(100.0)))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_s'), '/', models.Value(100.0))))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_e'), '/', models.Value(100.0))))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_w'), '/', models.Value(100.0)))))), '+', django.db.models.expressions.CombinedExpression(models.F('u_roof'), '*', django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', models.F('width_ow')))), '+', django.db.models.expressions.CombinedExpression(models.F('u_floor'), '*', django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', models.F('width_ow')))), '+', django.db.models.expressions.CombinedExpression(models.F('u_window'), '*', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_n'), '/', models.Value(100.0))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_e'), '/', models.Value(100.0)))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_s'), '/', models.Value(100.0)))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_w'), '/', models.Value(100.0)))))), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='result_H_V',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.Value(0.34), '*', models.F('air_change_rate')), '*', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', models.F('width_ow')), '*', models.F('room_height')), '*', models.F('storeys'))), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='result_floor_area',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', models.F('width_ow')), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='result_roof_area',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', models.F('width_ow')), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='result_opaque_wall_area',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_n'), '/', models.Value(100.0)))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_s'), '/', models.Value(100.0))))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_e'), '/', models.Value(100.0))))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_w'), '/', models.Value(100.0))))), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='result_window_area',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_n'), '/', models.Value(100.0))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_e'), '/', models.Value(100.0)))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length_ns'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_s'), '/', models.Value(100.0)))), '+', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('width_ow'), '*', django.db.models.expressions.CombinedExpression(models.F('storeys'), '*', models.F('room_height'))), '*', django.db.models.expressions.CombinedExpression(models.F('window_share_w'), '/', models.Value(100.0)))), output_field=models.FloatField()),
+        ),
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(fields=['result_floor_area', 'id'], name='building_area_id_idx'),
+        ),
+    ]
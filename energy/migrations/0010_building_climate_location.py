@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy', '0009_generated_geometry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='climate_location',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Klimastandort'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy', '0010_building_climate_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='battery_capacity',
+            field=models.FloatField(default=0, verbose_name='Batteriekapazität [kWh]'),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='electricity_demand',
+            field=models.FloatField(default=20000, verbose_name='Strombedarf [kWh/a]'),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='pv_mode',
+            field=models.CharField(choices=[('share', 'Fester Eigenverbrauchsanteil'), ('hourly', 'Stündliche Simulation (Last- und Erzeugungsprofil)')], default='share', max_length=10, verbose_name='PV-Eigenverbrauch'),
+        ),
+    ]
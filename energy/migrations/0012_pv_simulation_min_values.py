@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:24
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy', '0011_building_pv_simulation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='building',
+            name='battery_capacity',
+            field=models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Batteriekapazität [kWh]'),
+        ),
+        migrations.AlterField(
+            model_name='building',
+            name='electricity_demand',
+            field=models.FloatField(default=20000, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Strombedarf [kWh/a]'),
+        ),
+    ]
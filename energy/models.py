@@ -1,7 +1,86 @@
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.db.models import F, Value
+
+
+class BuildingQuerySet(models.QuerySet):
+    def delete(self):
+        # Portfolio-Statistik vor dem Löschen per Aggregat nachführen; ohne
+        # post_delete-Signal bleibt Djangos schnelles Massenlöschen erhalten
+        from .stats import record_queryset_delete
+
+        with transaction.atomic():
+            record_queryset_delete(self)
+            return super().delete()
+
+    def calc_outdated(self):
+        """
+        Gebäude, deren Ergebnisse nicht mit der aktuellen Formelversion
+        berechnet wurden (reine SQL-Abfrage). Geänderte Eingaben bei gleicher
+        Version erkennt erst der Hash-Vergleich in recalculate(stale_only=True).
+        """
+        from .calc import CALC_VERSION
+
+        # exclude() schließt bei nullable Feldern NULL (nie berechnet) mit ein
+        return self.exclude(calc_version=CALC_VERSION)
+
+
+# --- Geometrie und H_T/H_V als Datenbank-Ausdrücke (GeneratedField) ---
+# Jeder Ausdruck baut nur auf Eingabespalten auf und folgt Schritt für Schritt
+# der Rechenreihenfolge in energy.calc.calc_heating_demand. Gleitkomma-
+# Arithmetik ist nicht assoziativ: nur so liefert die Datenbank bitgleich
+# dieselben Werte wie Python.
+
+def _facade(side):
+    # Fassadenfläche = Seitenlänge * (Geschosse * Raumhöhe)
+    return F(side) * (F("storeys") * F("room_height"))
+
+
+def _window(side, share):
+    # Fensterfläche = Fassade * (Anteil / 100)
+    return _facade(side) * (F(share) / Value(100.0))
+
+
+def _opaque(side, share):
+    return _facade(side) - _window(side, share)
+
+
+_FLOOR_AREA = F("length_ns") * F("width_ow")
+_ROOF_AREA = _FLOOR_AREA
+
+_WINDOW_AREA = (
+    _window("length_ns", "window_share_n")
+    + _window("width_ow", "window_share_e")
+    + _window("length_ns", "window_share_s")
+    + _window("width_ow", "window_share_w")
+)
+
+_OPAQUE_WALL_AREA = (
+    _opaque("length_ns", "window_share_n")
+    + _opaque("length_ns", "window_share_s")
+    + _opaque("width_ow", "window_share_e")
+    + _opaque("width_ow", "window_share_w")
+)
+
+_H_T = (
+    F("u_wall") * _OPAQUE_WALL_AREA
+    + F("u_roof") * _ROOF_AREA
+    + F("u_floor") * _FLOOR_AREA
+    + F("u_window") * _WINDOW_AREA
+)
+
+# H_V = 0.34 * n * V mit V = Grundfläche * Raumhöhe * Geschosse
+_H_V = (Value(0.34) * F("air_change_rate")) * ((_FLOOR_AREA * F("room_height")) * F("storeys"))
 
 
 class Building(models.Model):
+    PV_MODE_SHARE = "share"
+    PV_MODE_HOURLY = "hourly"
+    PV_MODE_CHOICES = [
+        (PV_MODE_SHARE, "Fester Eigenverbrauchsanteil"),
+        (PV_MODE_HOURLY, "Stündliche Simulation (Last- und Erzeugungsprofil)"),
+    ]
+
     name = models.CharField(max_length=100)
 
     # Geometrie
@@ -41,6 +120,11 @@ class Building(models.Model):
     degree_days = models.FloatField(
         "Heizgradtage HDD [K*d]", default=3000
     )
+    # Standort-ID im Wetterdatenspeicher (energy.climate); bestimmt die
+    # Einstrahlung je Fassade, leer = feste Orientierungswerte
+    climate_location = models.CharField(
+        "Klimastandort", max_length=64, blank=True, default=""
+    )
 
     # PV-Eingabedaten
     pv_roof_share = models.FloatField(
@@ -52,6 +136,16 @@ class Building(models.Model):
     pv_self_consumption_share = models.FloatField(
         "PV-Eigenverbrauchsanteil [%]", default=70
     )
+    # stündliche Simulation (energy.pv) statt des festen Anteils
+    pv_mode = models.CharField(
+        "PV-Eigenverbrauch", max_length=10, choices=PV_MODE_CHOICES, default=PV_MODE_SHARE
+    )
+    electricity_demand = models.FloatField(
+        "Strombedarf [kWh/a]", default=20000, validators=[MinValueValidator(0)]
+    )
+    battery_capacity = models.FloatField(
+        "Batteriekapazität [kWh]", default=0, validators=[MinValueValidator(0)]
+    )
 
     # Komfort
     setpoint_temp = models.FloatField("Solltemperatur [°C]")
@@ -63,13 +157,28 @@ class Building(models.Model):
     result_Q_S = models.FloatField(null=True, blank=True)
     result_Q_h = models.FloatField(null=True, blank=True)
 
-    result_H_T = models.FloatField(null=True, blank=True)
-    result_H_V = models.FloatField(null=True, blank=True)
+    # Geometrie und Verlustkoeffizienten rechnet die Datenbank selbst
+    # (gespeicherte Spalten, siehe unten); sie stimmen damit auch nach
+    # QuerySet.update oder SQL-Änderungen der Eingaben
+    result_H_T = models.GeneratedField(
+        expression=_H_T, output_field=models.FloatField(), db_persist=True
+    )
+    result_H_V = models.GeneratedField(
+        expression=_H_V, output_field=models.FloatField(), db_persist=True
+    )
 
-    result_floor_area = models.FloatField(null=True, blank=True)
-    result_roof_area = models.FloatField(null=True, blank=True)
-    result_opaque_wall_area = models.FloatField(null=True, blank=True)
-    result_window_area = models.FloatField(null=True, blank=True)
+    result_floor_area = models.GeneratedField(
+        expression=_FLOOR_AREA, output_field=models.FloatField(), db_persist=True
+    )
+    result_roof_area = models.GeneratedField(
+        expression=_ROOF_AREA, output_field=models.FloatField(), db_persist=True
+    )
+    result_opaque_wall_area = models.GeneratedField(
+        expression=_OPAQUE_WALL_AREA, output_field=models.FloatField(), db_persist=True
+    )
+    result_window_area = models.GeneratedField(
+        expression=_WINDOW_AREA, output_field=models.FloatField(), db_persist=True
+    )
 
     result_Q_S_n = models.FloatField(null=True, blank=True)
     result_Q_S_e = models.FloatField(null=True, blank=True)
@@ -80,6 +189,171 @@ class Building(models.Model):
     result_Q_PV_on = models.FloatField(null=True, blank=True)
     result_Q_PV_off = models.FloatField(null=True, blank=True)
 
+    # Herkunft der Ergebnisse: Hash der Eingaben und Formelversion (energy.calc),
+    # mit denen sie berechnet wurden; leer = noch nie bzw. unbekannt berechnet
+    input_fingerprint = models.CharField(max_length=40, blank=True, editable=False)
+    calc_version = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        # Sortierschlüssel der Gebäudeliste, jeweils mit id für die Keyset-Paginierung
+        indexes = [
+            models.Index(fields=["name", "id"], name="building_name_id_idx"),
+            models.Index(fields=["result_floor_area", "id"], name="building_area_id_idx"),
+            models.Index(fields=["result_Q_h", "id"], name="building_q_h_id_idx"),
+            models.Index(fields=["calc_version"], name="building_calc_version_idx"),
+        ]
+
+    objects = BuildingQuerySet.as_manager()
 
     def __str__(self):
         return self.name
+
+    def _stats_row(self):
+        # Werte aus der Datenbank, samt den Eingaben der Grundfläche
+        return type(self).objects.filter(pk=self.pk).values(*STATS_FIELDS, *FLOOR_AREA_FIELDS).first()
+
+    def _saved_stats(self, old, update_fields):
+        """
+        STATS_FIELDS nach save(), ohne erneute Abfrage. Nach einem INSERT
+        liefert die Datenbank die GeneratedFields zurück; nach einem UPDATE
+        sind sie am Objekt noch die alten, die Grundfläche wird dann wie in
+        _FLOOR_AREA gerechnet (bitgleich). Bei update_fields gelten für die
+        übrigen Felder die bisherigen Werte aus der Datenbank.
+        """
+        if old is None:
+            return {name: getattr(self, name) for name in STATS_FIELDS}
+        saved = None if update_fields is None else set(update_fields)
+        values = {
+            name: getattr(self, name) if saved is None or name in saved else old[name]
+            for name in (*STATS_FIELDS, *FLOOR_AREA_FIELDS)
+            if name != "result_floor_area"
+        }
+        length_ns, width_ow = (float(values.pop(name)) for name in FLOOR_AREA_FIELDS)
+        values["result_floor_area"] = length_ns * width_ow
+        return values
+
+    def save(self, *args, **kwargs):
+        from .stats import record_change
+
+        with transaction.atomic():
+            old = self._stats_row() if self.pk is not None else None
+            super().save(*args, **kwargs)
+            record_change(old, self._saved_stats(old, kwargs.get("update_fields")))
+
+    def delete(self, *args, **kwargs):
+        from .stats import record_change
+
+        with transaction.atomic():
+            old = self._stats_row()
+            result = super().delete(*args, **kwargs)
+            record_change(old, None)
+        return result
+
+
+# Felder, aus denen sich der Beitrag eines Gebäudes zur Portfolio-Statistik ergibt
+STATS_FIELDS = (
+    "storeys",
+    "result_floor_area",
+    "result_Q_h",
+    "result_Q_PV_total",
+    "result_Q_PV_on",
+    "result_Q_PV_off",
+)
+
+# Eingaben von result_floor_area (_FLOOR_AREA)
+FLOOR_AREA_FIELDS = ("length_ns", "width_ow")
+
+
+class PortfolioStats(models.Model):
+    """
+    Laufend nachgeführte Kennzahlen über alle Gebäude (eine Zeile, pk=1).
+    Wird bei jedem Speichern/Löschen eines Gebäudes inkrementell angepasst
+    und kann mit "manage.py rebuild_portfolio_stats" neu aufgebaut werden.
+    """
+
+    building_count = models.PositiveIntegerField(default=0)
+    calculated_count = models.PositiveIntegerField(default=0)  # Gebäude mit Q_h
+
+    sum_Q_h = models.FloatField(default=0)
+    sum_reference_area = models.FloatField(default=0)  # Grundfläche * Geschosse, nur berechnete
+    sum_Q_PV_total = models.FloatField(default=0)
+    sum_Q_PV_on = models.FloatField(default=0)
+    sum_Q_PV_off = models.FloatField(default=0)
+
+    # Anzahl Gebäude je Klasse des flächenbezogenen Heizwärmebedarfs
+    class_counts = models.JSONField(default=dict)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Portfolio-Statistik ({self.building_count} Gebäude)"
+
+
+class Job(models.Model):
+    """
+    Hintergrundauftrag (Export, Neuberechnung), abgearbeitet von
+    "manage.py run_jobs". Die Tabelle ist zugleich die Warteschlange.
+    """
+
+    KIND_EXPORT_CSV = "export_csv"
+    KIND_EXPORT_XLSX = "export_xlsx"
+    KIND_EXPORT_PDF = "export_pdf"
+    KIND_RECALCULATE = "recalculate"
+    KIND_CHOICES = [
+        (KIND_EXPORT_CSV, "Export CSV"),
+        (KIND_EXPORT_XLSX, "Export Excel"),
+        (KIND_EXPORT_PDF, "Export PDF"),
+        (KIND_RECALCULATE, "Neuberechnung"),
+    ]
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "wartet"),
+        (STATUS_RUNNING, "läuft"),
+        (STATUS_DONE, "fertig"),
+        (STATUS_FAILED, "fehlgeschlagen"),
+        (STATUS_CANCELLED, "abgebrochen"),
+    ]
+    FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    params = models.JSONField(default=dict, blank=True)
+
+    # Fortschritt: bearbeitete / erwartete Datensätze
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True)
+    cancel_requested = models.BooleanField(default=False)
+
+    result_file = models.FileField(upload_to="jobs/", blank=True)
+    result_name = models.CharField(max_length=100, blank=True)  # Dateiname beim Download
+    message = models.TextField(blank=True)  # Ergebnis- oder Fehlermeldung
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="job_status_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    @property
+    def progress_percent(self):
+        if self.status == self.STATUS_DONE:
+            return 100
+        if not self.progress_total:
+            return 0
+        return min(100, int(100 * self.progress_done / self.progress_total))
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+
+from django.db.models import F, Q
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Liefert (Wert, pk) oder None, wenn der Cursor ungültig ist.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(pk, int) or not isinstance(value, (str, int, float, type(None))):
+        return None
+    return value, pk
+
+
+def _ordering(field, descending):
+    if field == "pk":
+        return ["-pk"] if descending else ["pk"]
+    # NULL-Werte stehen aufsteigend vorne und absteigend hinten, damit die
+    # Umkehrung einer Sortierung immer wieder eine der beiden Varianten ist
+    if descending:
+        return [F(field).desc(nulls_last=True), "-pk"]
+    return [F(field).asc(nulls_first=True), "pk"]
+
+
+def _segments(field, descending, position):
+    """
+    Bedingungen für "liegt in der Sortierung (field, pk) hinter position",
+    aufgeteilt in Abschnitte in Lesereihenfolge (Werte bzw. NULL-Werte).
+    Jeder Abschnitt ist ein Bereich auf dem Index (field, id); ein OR über
+    beide würde SQLite zu einem vollständigen Index-Scan zwingen.
+    """
+    isnull = Q(**{f"{field}__isnull": True})
+    notnull = Q(**{f"{field}__isnull": False})
+
+    if position is None:
+        if field == "pk":
+            return [Q()]
+        return [notnull, isnull] if descending else [isnull, notnull]
+
+    value, pk = position
+    if field == "pk":
+        return [Q(pk__lt=pk) if descending else Q(pk__gt=pk)]
+
+    if descending:
+        if value is None:
+            return [isnull & Q(pk__lt=pk)]
+        return [
+            Q(**{f"{field}__lte": value}) & ~Q(**{field: value, "pk__gte": pk}),
+            isnull,
+        ]
+
+    if value is None:
+        return [isnull & Q(pk__gt=pk), notnull]
+    return [Q(**{f"{field}__gte": value}) & ~Q(**{field: value, "pk__lte": pk})]
+
+
+def _plan(queryset, order_by, after, before):
+    """
+    Gemeinsamer Teil von keyset_page und akeyset_page: sortiertes QuerySet,
+    Sortierfeld, Cursor-Position, Leserichtung und die Abschnitte, die
+    nacheinander gelesen werden.
+    """
+    descending = order_by.startswith("-")
+    field = order_by.lstrip("-")
+    if field == "id":
+        field = "pk"
+
+    position = decode_cursor(before)
+    backwards = position is not None
+    if not backwards:
+        position = decode_cursor(after)
+
+    # rückwärts blättern = in umgekehrter Sortierung vorwärts lesen
+    scan_descending = descending != backwards
+    qs = queryset.order_by(*_ordering(field, scan_descending))
+    segments = [qs.filter(condition) for condition in _segments(field, scan_descending, position)]
+    return field, position, backwards, segments
+
+
+def _page(rows, field, position, backwards, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    def cursor(obj):
+        return encode_cursor(getattr(obj, field), obj.pk)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards:
+            next_cursor = cursor(rows[-1])
+            prev_cursor = cursor(rows[0]) if has_more else None
+        else:
+            next_cursor = cursor(rows[-1]) if has_more else None
+            prev_cursor = cursor(rows[0]) if position is not None else None
+    return rows, next_cursor, prev_cursor
+
+
+def keyset_page(queryset, order_by, after=None, before=None, page_size=50):
+    """
+    Eine Seite einer nach order_by (z. B. "name" oder "-result_Q_h")
+    sortierten Liste per Keyset-Paginierung: Statt OFFSET wird ab dem
+    Cursor (Sortierwert, pk) der letzten bzw. ersten gezeigten Zeile
+    weitergelesen, jede Seite kostet damit gleich viel.
+
+    Rückgabe: (Objekte, Cursor für "weiter", Cursor für "zurück");
+    ein Cursor ist None, wenn es in diese Richtung nicht weitergeht.
+    """
+    field, position, backwards, segments = _plan(queryset, order_by, after, before)
+    rows = []
+    for segment in segments:
+        rows += segment[: page_size + 1 - len(rows)]
+        if len(rows) > page_size:
+            break
+    return _page(rows, field, position, backwards, page_size)
+
+
+async def akeyset_page(queryset, order_by, after=None, before=None, page_size=50):
+    """
+    Wie keyset_page, liest aber über das asynchrone ORM (für async Views).
+    """
+    field, position, backwards, segments = _plan(queryset, order_by, after, before)
+    rows = []
+    for segment in segments:
+        rows += [obj async for obj in segment[: page_size + 1 - len(rows)]]
+        if len(rows) > page_size:
+            break
+    return _page(rows, field, position, backwards, page_size)
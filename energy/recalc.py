@@ -0,0 +1,159 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import connection, transaction
+
+from .calc import (
+    CALC_VERSION,
+    INPUT_FIELDS,
+    OPTIONAL_FIELDS,
+    WRITABLE_RESULT_KEYS,
+    calc_heating_demand_batch,
+    input_fingerprint,
+    optional_arrays,
+    rows_to_arrays,
+)
+from .metrics import record_calc
+from .models import Building
+from .stats import rebuild as rebuild_stats
+
+
+# zurückgeschriebene Spalten: Ergebnisse (ohne die von der Datenbank
+# berechneten) plus Herkunft (Eingabe-Hash, Formelversion)
+WRITE_FIELDS = (
+    *(f"result_{key}" for key in WRITABLE_RESULT_KEYS),
+    "input_fingerprint",
+    "calc_version",
+)
+
+
+def _split(row):
+    # (pk, Eingaben..., optionale Felder...) -> (Eingaben, optionale Felder)
+    return row[1:1 + len(INPUT_FIELDS)], row[1 + len(INPUT_FIELDS):]
+
+
+def iter_input_chunks(queryset, chunk_size, stale_only=False):
+    """
+    Liest (pk, Eingabefelder..., optionale Felder...) blockweise über einen Server-seitigen
+    Iterator und liefert Listen mit höchstens chunk_size Zeilen.
+
+    Mit stale_only werden nur Zeilen geliefert, deren Ergebnisse veraltet
+    sind: andere Formelversion oder Eingaben, die nicht mehr zum
+    gespeicherten Hash passen (z. B. nach QuerySet.update oder SQL). Der
+    Hash-Vergleich läuft in Python, weil sich der Hash nicht in SQL bilden lässt.
+    """
+    fields = ("pk", *INPUT_FIELDS, *OPTIONAL_FIELDS)
+    if stale_only:
+        fields += ("calc_version", "input_fingerprint")
+    rows = (
+        queryset.order_by("pk")
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+    width = 1 + len(INPUT_FIELDS) + len(OPTIONAL_FIELDS)
+    chunk = []
+    for row in rows:
+        if stale_only:
+            version, fingerprint = row[width:]
+            row = row[:width]
+            if version == CALC_VERSION and fingerprint == input_fingerprint(*_split(row)):
+                continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def calc_chunk(chunk):
+    """
+    Berechnet einen Block (pk, Eingaben..., optionale Felder...) vektorisiert.
+    Läuft auch in Worker-Prozessen, daher nur einfache Typen als Rückgabe;
+    die Rechenzeit geht mit zurück und wird im Hauptprozess erfasst.
+    """
+    pks = [row[0] for row in chunk]
+    inputs, optional = zip(*(_split(row) for row in chunk))
+    start = time.perf_counter()
+    result = calc_heating_demand_batch({**rows_to_arrays(inputs), **optional_arrays(optional)})
+    elapsed = time.perf_counter() - start
+    columns = [result[key].tolist() for key in WRITABLE_RESULT_KEYS]
+    columns.append([input_fingerprint(values, extra) for values, extra in zip(inputs, optional)])
+    columns.append([CALC_VERSION] * len(chunk))
+    return pks, columns, elapsed
+
+
+def write_chunk(pks, columns):
+    """
+    Schreibt berechnete Spalten (Reihenfolge wie WRITE_FIELDS) blockweise zurück.
+
+    Ein parametrisiertes UPDATE pro Zeile über executemany() in einer
+    Transaktion. QuerySet.bulk_update() baut für jedes Feld einen CASE-Ausdruck
+    über alle Zeilen des Blocks auf und schafft damit nur wenige hundert
+    Zeilen/s; executemany() liegt um Größenordnungen darüber.
+    """
+    qn = connection.ops.quote_name
+    sql = "UPDATE {} SET {} WHERE {} = %s".format(
+        qn(Building._meta.db_table),
+        ", ".join(f"{qn(Building._meta.get_field(field).column)} = %s" for field in WRITE_FIELDS),
+        qn(Building._meta.pk.column),
+    )
+    params = [(*values, pk) for pk, values in zip(pks, zip(*columns))]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+    return len(params)
+
+
+def recalculate(queryset=None, chunk_size=2000, workers=1, progress=None, stale_only=False):
+    """
+    Berechnet die Ergebnisse aller Gebäude im QuerySet neu und schreibt sie
+    blockweise zurück. Mit workers > 1 wird in einem Prozess-Pool gerechnet,
+    die Datenbankzugriffe bleiben im Hauptprozess. Mit stale_only werden
+    nur Gebäude mit veralteten Ergebnissen berechnet (siehe iter_input_chunks).
+
+    progress(done, elapsed_seconds) wird nach jedem geschriebenen Block
+    aufgerufen; eine Ausnahme daraus bricht nach diesem Block ab.
+    Rückgabe: Anzahl neu berechneter Gebäude.
+    """
+    if queryset is None:
+        queryset = Building.objects.all()
+
+    start = time.perf_counter()
+    done = 0
+
+    def finish(pks, columns, calc_seconds):
+        nonlocal done
+        record_calc("batch", len(pks), calc_seconds)
+        done += write_chunk(pks, columns)
+        if progress is not None:
+            progress(done, time.perf_counter() - start)
+
+    chunks = iter_input_chunks(queryset, chunk_size, stale_only=stale_only)
+
+    try:
+        if workers <= 1:
+            for chunk in chunks:
+                finish(*calc_chunk(chunk))
+        else:
+            _calc_in_pool(chunks, workers, finish)
+    finally:
+        # Ergebnisse wurden per SQL geschrieben -> Portfolio-Statistik neu
+        # aufbauen, auch wenn vorzeitig abgebrochen wurde
+        if done:
+            rebuild_stats()
+    return done
+
+
+def _calc_in_pool(chunks, workers, finish):
+    # höchstens zwei Blöcke pro Worker gleichzeitig unterwegs -> Speicher bleibt begrenzt
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(calc_chunk, chunk))
+            if len(pending) >= max_pending:
+                finish(*pending.pop(0).result())
+        for future in pending:
+            finish(*future.result())
@@ -0,0 +1,343 @@
+import math
+
+import numpy as np
+
+from .calc import calc_heating_demand_batch, input_values, optional_arrays, optional_values, rows_to_arrays
+from .metrics import observe_calc
+from .models import Building
+from .timing import timed
+
+
+# Sanierungsoptimierung: aus einem Katalog von Maßnahmengruppen (je Gruppe
+# höchstens eine Maßnahme, z. B. eine Dämmstärke der Außenwand) werden die
+# kostenoptimalen Kombinationen gesucht. Alle Maßnahmen werden zunächst
+# einzeln gerechnet; Maßnahmen, die in ihrer Gruppe teurer und nicht besser
+# als eine andere (oder als „keine Maßnahme“) sind, fallen heraus. Die
+# übrigen Kombinationen laufen blockweise durch die Batch-Berechnung,
+# übrig bleibt die Pareto-Front Kosten gegen Heizwärmebedarf.
+#
+# Das Aussortieren ist exakt, weil sich die Wirkungen der Felder aus
+# RETROFIT_FIELDS zwischen den Gruppen addieren (Q_h ist in jedem dieser
+# Felder linear, die Begrenzung auf 0 ist monoton; der PV-Eigenverbrauch
+# hängt nur von pv_roof_share ab).
+
+RETROFIT_FIELDS = (
+    "u_wall",
+    "u_roof",
+    "u_floor",
+    "u_window",
+    "g_n",
+    "g_e",
+    "g_s",
+    "g_w",
+    "air_change_rate",
+    "pv_roof_share",
+)
+
+# Bezugsgrößen der Kosten: je m² Bauteilfläche des Ausgangsgebäudes, je m²
+# zusätzlicher PV-Fläche oder pauschal
+COST_UNITS = {
+    "wall": "€/m² opake Wandfläche",
+    "roof": "€/m² Dachfläche",
+    "floor": "€/m² Grundfläche",
+    "window": "€/m² Fensterfläche",
+    "pv": "€/m² zusätzliche PV-Fläche",
+    "flat": "€ pauschal",
+}
+_UNIT_AREAS = {"wall": "opaque_wall_area", "roof": "roof_area", "floor": "floor_area", "window": "window_area"}
+
+# Zielgröße: Heizwärmebedarf oder Heizwärmebedarf abzüglich
+# PV-Eigenverbrauch (grobe Bilanz, Wärme und Strom gleich gewichtet)
+OBJECTIVES = {
+    "Q_h": "Heizwärmebedarf",
+    "net": "Heizwärmebedarf abzüglich PV-Eigenverbrauch",
+}
+
+# Maßnahmengruppen: (Name, Kosteneinheit, Maßnahmen), Maßnahme:
+# (Bezeichnung, neue Eingabewerte, Kosten). Orientierungswerte, keine Angebote.
+_GLAZING_2 = {"u_window": 1.1, "g_n": 0.6, "g_e": 0.6, "g_s": 0.6, "g_w": 0.6}
+_GLAZING_3 = {"u_window": 0.8, "g_n": 0.5, "g_e": 0.5, "g_s": 0.5, "g_w": 0.5}
+DEFAULT_CATALOGUE = (
+    ("Außenwand", "wall", (
+        ("WDVS 12 cm", {"u_wall": 0.24}, 140.0),
+        ("WDVS 20 cm", {"u_wall": 0.16}, 180.0),
+        ("Innendämmung 6 cm", {"u_wall": 0.45}, 90.0),
+    )),
+    ("Dach", "roof", (
+        ("Zwischensparrendämmung", {"u_roof": 0.20}, 120.0),
+        ("Zwischen- und Aufsparrendämmung", {"u_roof": 0.14}, 190.0),
+    )),
+    ("Boden", "floor", (
+        ("Kellerdeckendämmung 10 cm", {"u_floor": 0.30}, 45.0),
+        ("Kellerdeckendämmung 16 cm", {"u_floor": 0.22}, 65.0),
+    )),
+    ("Fenster", "window", (
+        ("2-fach-Wärmeschutzverglasung", _GLAZING_2, 450.0),
+        ("3-fach-Wärmeschutzverglasung", _GLAZING_3, 600.0),
+    )),
+    ("Luftdichtheit und Lüftung", "flat", (
+        ("Luftdichtheit verbessern", {"air_change_rate": 0.5}, 4000.0),
+        ("Lüftungsanlage mit Wärmerückgewinnung", {"air_change_rate": 0.25}, 12000.0),
+    )),
+    ("Photovoltaik", "pv", (
+        ("PV auf 50 % der Dachfläche", {"pv_roof_share": 50.0}, 250.0),
+        ("PV auf 80 % der Dachfläche", {"pv_roof_share": 80.0}, 250.0),
+    )),
+)
+
+MAX_COMBINATIONS = 5_000_000
+CHUNK_SIZE = 65536
+
+
+class RetrofitError(ValueError):
+    """
+    Ungültiger Maßnahmenkatalog oder ungültige Zielgröße.
+    """
+
+
+def parse_catalogue(data):
+    """
+    Maßnahmenkatalog aus JSON-Daten: Liste von Gruppen
+    {"name", "unit", "measures": [{"name", "values", "cost"}]}.
+    Rückgabe im Format von DEFAULT_CATALOGUE; prüft Felder, Einheiten und
+    Zahlenwerte und wirft sonst RetrofitError.
+    """
+    if not isinstance(data, list) or not data:
+        raise RetrofitError("Der Katalog muss eine nicht leere Liste von Gruppen sein.")
+
+    def number(value, what):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise RetrofitError(f"{what}: keine endliche Zahl.")
+        return float(value)
+
+    catalogue = []
+    for i, group in enumerate(data, start=1):
+        if not isinstance(group, dict) or not isinstance(group.get("measures"), list):
+            raise RetrofitError(f"Gruppe {i}: erwartet ein Objekt mit \"measures\" (Liste).")
+        name = str(group.get("name") or f"Gruppe {i}")
+        unit = group.get("unit", "flat")
+        if unit not in COST_UNITS:
+            raise RetrofitError(f"{name}: unbekannte Kosteneinheit {unit!r}, erlaubt: {', '.join(COST_UNITS)}.")
+
+        measures = []
+        for j, measure in enumerate(group["measures"], start=1):
+            if not isinstance(measure, dict) or not isinstance(measure.get("values"), dict):
+                raise RetrofitError(f"{name}, Maßnahme {j}: erwartet ein Objekt mit \"values\".")
+            label = str(measure.get("name") or f"Maßnahme {j}")
+            values = {
+                field: number(value, f"{name}, {label}, {field}")
+                for field, value in measure["values"].items()
+            }
+            cost = number(measure.get("cost", 0), f"{name}, {label}, Kosten")
+            measures.append((label, values, cost))
+        catalogue.append((name, unit, tuple(measures)))
+
+    catalogue = tuple(catalogue)
+    _check_catalogue(catalogue)
+    return catalogue
+
+
+def _check_catalogue(catalogue):
+    owner = {}
+    for name, unit, measures in catalogue:
+        if not measures:
+            raise RetrofitError(f"{name}: keine Maßnahmen.")
+        for label, values, cost in measures:
+            if not values:
+                raise RetrofitError(f"{name}, {label}: keine Eingabewerte.")
+            if cost < 0:
+                raise RetrofitError(f"{name}, {label}: negative Kosten.")
+            for field, value in values.items():
+                if field not in RETROFIT_FIELDS:
+                    raise RetrofitError(
+                        f"{name}, {label}: {field!r} ist keine Sanierungsgröße "
+                        f"(erlaubt: {', '.join(RETROFIT_FIELDS)})."
+                    )
+                if value < 0:
+                    raise RetrofitError(f"{name}, {label}: {field} darf nicht negativ sein.")
+                if owner.setdefault(field, name) != name:
+                    raise RetrofitError(f"{field} kommt in den Gruppen {owner[field]} und {name} vor.")
+
+
+def pareto_front(costs, objective):
+    """
+    Indizes der Pareto-optimalen Punkte (niedrige Kosten, niedrige
+    Zielgröße), nach Kosten aufsteigend. Bei Gleichstand bleibt der erste.
+    """
+    order = np.lexsort((objective, costs))
+    best = np.minimum.accumulate(objective[order])
+    before = np.concatenate(([np.inf], best[:-1]))
+    return order[objective[order] < before]
+
+
+class Retrofit:
+    """
+    Optimierung für ein Gebäude: beim Anlegen werden die Einzelmaßnahmen
+    gerechnet und aussortiert, solve() rechnet alle übrigen Kombinationen und liefert die
+    Pareto-Front. Alle übrigen Eingaben, Klimastandort und PV-Einstellungen
+    stammen aus dem Gebäude; es werden keine Datenbankzeilen angelegt.
+    """
+
+    def __init__(self, building: Building, catalogue=DEFAULT_CATALOGUE, objective="Q_h"):
+        if objective not in OBJECTIVES:
+            raise RetrofitError(f"Unbekannte Zielgröße {objective!r}, erlaubt: {', '.join(OBJECTIVES)}.")
+        _check_catalogue(catalogue)
+        self.building = building
+        self.catalogue = catalogue
+        self.objective = objective
+        self._base = rows_to_arrays([input_values(building)])
+        self._optional = optional_arrays([optional_values(building)])
+        self._build()
+
+    def _calc(self, columns, n):
+        arrays = {name: np.broadcast_to(column, n) for name, column in self._base.items()}
+        arrays.update({name: np.broadcast_to(column, n) for name, column in self._optional.items()})
+        arrays.update(columns)
+        with timed("calc"), observe_calc("retrofit", n):
+            return calc_heating_demand_batch(arrays)
+
+    def _objective(self, result):
+        if self.objective == "net":
+            return result["Q_h"] - result["Q_PV_on"]
+        return result["Q_h"]
+
+    def _build(self):
+        # Ausgangsgebäude (Zeile 0) und jede Maßnahme für sich in einer Rechnung
+        measures = [values for _, _, group in self.catalogue for _, values, _ in group]
+        n = len(measures) + 1
+        columns = {}
+        for i, values in enumerate(measures, start=1):
+            for field, value in values.items():
+                column = columns.setdefault(field, np.repeat(self._base[field], n))
+                column[i] = value
+        single = self._calc(columns, n)
+        self.base = {key: float(values[0]) for key, values in single.items()}
+        effect = self._objective(single)
+
+        # je Gruppe: Option 0 = keine Maßnahme, dann die nicht dominierten Maßnahmen
+        self.groups = []
+        self.combinations = 1
+        first = 1
+        for name, unit, group in self.catalogue:
+            rows = list(range(first, first + len(group)))
+            first += len(group)
+            costs = np.array([0.0] + [self._cost(unit, values, cost) for _, values, cost in group])
+            keep = np.sort(pareto_front(costs, effect[[0, *rows]]))
+            if keep[0] != 0:
+                # „keine Maßnahme“ bleibt immer wählbar (kostet nichts)
+                keep = np.concatenate(([0], keep))
+            fields = sorted({field for _, values, _ in group for field in values})
+            options = [None] + [group[k - 1] for k in keep[1:]]
+            self.groups.append({
+                "name": name,
+                "labels": [label for label, _, _ in options[1:]],
+                "costs": costs[keep],
+                "columns": {
+                    field: np.array([self.base_input(field)] + [
+                        values.get(field, self.base_input(field)) for _, values, _ in options[1:]
+                    ])
+                    for field in fields
+                },
+            })
+            self.combinations *= len(group) + 1
+
+        self.shape = tuple(len(group["costs"]) for group in self.groups)
+        self.size = math.prod(self.shape)
+        if self.size > MAX_COMBINATIONS:
+            raise RetrofitError(
+                f"{self.size:,} Kombinationen nach dem Aussortieren, höchstens {MAX_COMBINATIONS:,} möglich."
+            )
+
+    def base_input(self, field):
+        return float(self._base[field][0])
+
+    @property
+    def reference_area(self):
+        # Bezugsfläche für die flächenbezogenen Werte wie in energy.stats
+        return self.base["floor_area"] * self.base_input("storeys")
+
+    def _cost(self, unit, values, cost):
+        if unit == "flat":
+            return cost
+        if unit == "pv":
+            added = max(values.get("pv_roof_share", 0.0) - self.base_input("pv_roof_share"), 0.0)
+            return cost * self.base["roof_area"] * added / 100.0
+        return cost * self.base[_UNIT_AREAS[unit]]
+
+    def _chunk(self, start, stop):
+        index = np.unravel_index(np.arange(start, stop), self.shape)
+        costs = np.zeros(stop - start)
+        columns = {}
+        for group, i in zip(self.groups, index):
+            costs += group["costs"][i]
+            for field, values in group["columns"].items():
+                columns[field] = values[i]
+        result = self._calc(columns, stop - start)
+        return index, costs, result
+
+    def solve(self, target=None, chunk_size=CHUNK_SIZE):
+        """
+        Pareto-Front als Liste von Dicts, nach Kosten aufsteigend, dazu die
+        günstigste Kombination, die target [kWh/m²a, Zielgröße je m²
+        Bezugsfläche = Grundfläche × Geschosse wie in der Portfolio-Statistik]
+        erreicht (None, wenn keine oder kein Ziel).
+        """
+        candidates = []
+        for start in range(0, self.size, chunk_size):
+            stop = min(start + chunk_size, self.size)
+            index, costs, result = self._chunk(start, stop)
+            objective = self._objective(result)
+            front = pareto_front(costs, objective)
+            candidates.append((
+                start + front, costs[front], objective[front], result["Q_h"][front], result["Q_PV_on"][front],
+            ))
+
+        points, costs, objective, q_h, pv_on = (np.concatenate(column) for column in zip(*candidates))
+        front = pareto_front(costs, objective)
+        index = np.unravel_index(points[front], self.shape)
+        reference_area = self.reference_area
+
+        entries = []
+        for k, j in enumerate(front):
+            measures = [
+                (group["name"], group["labels"][i[k] - 1])
+                for group, i in zip(self.groups, index) if i[k]
+            ]
+            entries.append({
+                "cost": float(costs[j]),
+                "objective": float(objective[j]),
+                "specific": float(objective[j]) / reference_area if reference_area else None,
+                "Q_h": float(q_h[j]),
+                "Q_PV_on": float(pv_on[j]),
+                "measures": measures,
+            })
+
+        cheapest = None
+        if target is not None:
+            cheapest = next(
+                (entry for entry in entries if entry["specific"] is not None and entry["specific"] <= target),
+                None,
+            )
+        return entries, cheapest
+
+
+def optimize(building: Building, catalogue=DEFAULT_CATALOGUE, objective="Q_h", target=None):
+    """
+    Kurzform: Pareto-Front und günstigste Kombination für target als Dict
+    samt Ausgangswerten und Zahl der (gerechneten) Kombinationen.
+    """
+    retrofit = Retrofit(building, catalogue, objective)
+    front, cheapest = retrofit.solve(target)
+    return {
+        "objective": objective,
+        "base": {
+            "Q_h": retrofit.base["Q_h"],
+            "Q_PV_on": retrofit.base["Q_PV_on"],
+            "floor_area": retrofit.base["floor_area"],
+            "reference_area": retrofit.reference_area,
+        },
+        "combinations": retrofit.combinations,
+        "evaluated": retrofit.size,
+        "front": front,
+        "cheapest": cheapest,
+    }
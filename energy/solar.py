@@ -0,0 +1,169 @@
+import os
+
+import numpy as np
+
+from .climate import ClimateError, climate_store, report_missing
+
+
+# Einstrahlung auf geneigte Flächen je Standort, einmal vektorisiert aus den
+# stündlichen Wetterdaten (energy.climate) berechnet und als kleine Tabelle
+# (Zeitraum × Neigung × Ausrichtung) neben den Wetterdaten gespeichert.
+# Die Gebäudeberechnung liest daraus nur noch vier Werte je Standort.
+
+# Orientierungswerte ohne Standort [kWh/m²·a] (Nord, Ost, Süd, West) –
+# Näherungen, nicht normgerecht; bisherige feste Werte von calc_heating_demand
+DEFAULT_SOL_K = (150.0, 300.0, 500.0, 300.0)
+
+# Achsen der Tabelle: Neigung gegen die Horizontale und Ausrichtung
+# (Azimut von Nord im Uhrzeigersinn), jeweils in Grad
+TILTS = (0, 15, 30, 45, 60, 75, 90)
+AZIMUTHS = tuple(range(0, 360, 15))
+PERIODS = ("year", "heating")
+
+# Fassaden des Gebäudemodells: senkrecht nach Nord, Ost, Süd, West
+FACADE_AZIMUTHS = (0, 90, 180, 270)
+
+GROUND_REFLECTANCE = 0.2
+
+# Heizzeit = Tage mit Tagesmittel unter der Heizgrenze (wie bei G20/15)
+HEATING_LIMIT = 15.0
+
+# Dateiname mit Version: bei Änderungen an Achsen oder Modell hochzählen,
+# vorhandene Tabellen werden dann neu berechnet
+TABLE_FILE = "solar_v1.npy"
+
+
+def sun_vectors(latitude, longitude, timezone, hours=8760):
+    """
+    Einheitsvektoren (Ost, Nord, oben) zur Sonne für die Mitte jeder Stunde
+    eines Jahres ohne 29. Februar, Ortszeit = Normalzeit der Zeitzone.
+    Sonnenstand nach Spencer (Deklination, Zeitgleichung).
+    """
+    hour = np.arange(hours)
+    day = hour // 24
+    b = 2 * np.pi * day / 365
+
+    declination = (
+        0.006918 - 0.399912 * np.cos(b) + 0.070257 * np.sin(b)
+        - 0.006758 * np.cos(2 * b) + 0.000907 * np.sin(2 * b)
+        - 0.002697 * np.cos(3 * b) + 0.00148 * np.sin(3 * b)
+    )
+    equation_of_time = 229.18 * (
+        0.000075 + 0.001868 * np.cos(b) - 0.032077 * np.sin(b)
+        - 0.014615 * np.cos(2 * b) - 0.04089 * np.sin(2 * b)
+    )  # min
+
+    solar_time = hour % 24 + 0.5 + (4 * (longitude - 15 * timezone) + equation_of_time) / 60
+    hour_angle = np.radians(15 * (solar_time - 12))
+    lat = np.radians(latitude)
+
+    return np.column_stack((
+        -np.cos(declination) * np.sin(hour_angle),
+        np.sin(declination) * np.cos(lat) - np.cos(declination) * np.cos(hour_angle) * np.sin(lat),
+        np.sin(declination) * np.sin(lat) + np.cos(declination) * np.cos(hour_angle) * np.cos(lat),
+    ))
+
+
+def surface_normals(tilts=TILTS, azimuths=AZIMUTHS):
+    """
+    Flächennormalen (Ost, Nord, oben) für alle Kombinationen, Form (3, Neigungen × Ausrichtungen).
+    """
+    beta, gamma = np.meshgrid(np.radians(tilts), np.radians(azimuths), indexing="ij")
+    return np.stack((
+        np.sin(beta) * np.sin(gamma),
+        np.sin(beta) * np.cos(gamma),
+        np.cos(beta),
+    )).reshape(3, -1)
+
+
+def build_table(dataset):
+    """
+    Einstrahlungssummen [kWh/m²] für PERIODS × TILTS × AZIMUTHS: Direktstrahlung
+    über den Einfallswinkel, Diffusstrahlung isotrop, Bodenreflexion mit
+    GROUND_REFLECTANCE. Alle Stunden und Flächen in einer Matrixoperation.
+    """
+    meta = dataset.meta
+    sun = sun_vectors(meta["latitude"], meta["longitude"], meta["timezone"])
+    normals = surface_normals()
+
+    dni = np.asarray(dataset["dni"], dtype=np.float64)
+    dhi = np.asarray(dataset["dhi"], dtype=np.float64)
+    ghi = np.asarray(dataset["ghi"], dtype=np.float64)
+
+    cos_incidence = np.clip(sun @ normals, 0.0, None)
+    cos_incidence[sun[:, 2] <= 0] = 0.0
+    cos_tilt = normals[2]
+    irradiance = (
+        dni[:, None] * cos_incidence
+        + dhi[:, None] * (1 + cos_tilt) / 2
+        + ghi[:, None] * GROUND_REFLECTANCE * (1 - cos_tilt) / 2
+    )  # Wh/m² je Stunde und Fläche
+
+    heating = np.repeat(dataset.daily_mean_temperature() < HEATING_LIMIT, 24)
+    table = np.stack((irradiance.sum(axis=0), irradiance[heating].sum(axis=0))) / 1000.0
+    return table.reshape(len(PERIODS), len(TILTS), len(AZIMUTHS))
+
+
+def _load_or_build(dataset):
+    """
+    Liest die gespeicherte Tabelle des Standorts oder berechnet und speichert sie.
+    """
+    path = os.path.join(dataset.path, TABLE_FILE)
+    try:
+        return np.load(path)
+    except FileNotFoundError:
+        pass
+    table = build_table(dataset)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, table)
+    os.replace(tmp, path)
+    return table
+
+
+def irradiation_table(location_id):
+    """
+    Tabelle PERIODS × TILTS × AZIMUTHS [kWh/m²] eines Standorts (aus dem Speicher).
+    """
+    return climate_store.derived(location_id, ("solar", TABLE_FILE), _load_or_build)
+
+
+def irradiation(location_id, tilt, azimuth, period="year"):
+    """
+    Einstrahlungssumme [kWh/m²] auf eine Fläche; Zwischenwerte linear
+    zwischen den Stützstellen der Tabelle.
+    """
+    table = irradiation_table(location_id)[PERIODS.index(period)]
+    azimuth = azimuth % 360
+    by_tilt = np.array([np.interp(azimuth, (*AZIMUTHS, 360), (*row, row[0])) for row in table])
+    return float(np.interp(tilt, TILTS, by_tilt))
+
+
+def sol_k(location_id):
+    """
+    Einstrahlung in der Heizzeit auf die vier Fassaden (Nord, Ost, Süd, West)
+    [kWh/m²·a] als Tupel; ohne Standort DEFAULT_SOL_K, ebenso (mit
+    Warnung im Log), wenn die Wetterdaten des Standorts fehlen.
+    """
+    if not location_id:
+        return DEFAULT_SOL_K
+
+    def facades(dataset):
+        table = irradiation_table(location_id)[PERIODS.index("heating"), TILTS.index(90)]
+        return tuple(float(table[AZIMUTHS.index(azimuth)]) for azimuth in FACADE_AZIMUTHS)
+
+    try:
+        return climate_store.derived(location_id, ("sol_k", TABLE_FILE), facades)
+    except ClimateError as exc:
+        report_missing(location_id, exc)
+        return DEFAULT_SOL_K
+
+
+def sol_k_columns(locations):
+    """
+    Orientierungswerte für viele Gebäude: Array der Form (n, 4), je
+    Standort nur ein Nachschlagen.
+    """
+    unique, inverse = np.unique(np.asarray(locations, dtype=str), return_inverse=True)
+    values = np.array([sol_k(location) for location in unique], dtype=np.float64).reshape(-1, 4)
+    return values[inverse.reshape(-1)]
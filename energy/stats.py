@@ -0,0 +1,189 @@
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q, Sum
+
+from .models import STATS_FIELDS, Building, PortfolioStats
+
+
+# Klassen des flächenbezogenen Heizwärmebedarfs [kWh/m²a], Obergrenze exklusiv
+EFFICIENCY_CLASSES = (
+    ("A+", 30),
+    ("A", 50),
+    ("B", 75),
+    ("C", 100),
+    ("D", 130),
+    ("E", 160),
+    ("F", 200),
+    ("G", 250),
+    ("H", None),
+)
+
+SUM_FIELDS = ("sum_Q_h", "sum_reference_area", "sum_Q_PV_total", "sum_Q_PV_on", "sum_Q_PV_off")
+
+
+def efficiency_class(specific_demand):
+    if specific_demand is None:
+        return None
+    for label, upper in EFFICIENCY_CLASSES:
+        if upper is None or specific_demand < upper:
+            return label
+
+
+def stats_values(building):
+    return {name: getattr(building, name) for name in STATS_FIELDS}
+
+
+def _contribution(values):
+    """
+    Beitrag eines Gebäudes (dict mit STATS_FIELDS) zu den Kennzahlen.
+    """
+    delta = {
+        "building_count": 1,
+        "calculated_count": 0,
+        "sum_Q_h": 0.0,
+        "sum_reference_area": 0.0,
+        "sum_Q_PV_total": values["result_Q_PV_total"] or 0.0,
+        "sum_Q_PV_on": values["result_Q_PV_on"] or 0.0,
+        "sum_Q_PV_off": values["result_Q_PV_off"] or 0.0,
+        "class_counts": {},
+    }
+    q_h = values["result_Q_h"]
+    if q_h is not None:
+        area = (values["result_floor_area"] or 0.0) * (values["storeys"] or 0)
+        delta["calculated_count"] = 1
+        delta["sum_Q_h"] = q_h
+        delta["sum_reference_area"] = area
+        if area > 0:
+            delta["class_counts"] = {efficiency_class(q_h / area): 1}
+    return delta
+
+
+def _combine(a, b, sign=1):
+    result = dict(a)
+    for key in ("building_count", "calculated_count", *SUM_FIELDS):
+        result[key] = a[key] + sign * b[key]
+    counts = dict(a["class_counts"])
+    for label, n in b["class_counts"].items():
+        counts[label] = counts.get(label, 0) + sign * n
+    result["class_counts"] = counts
+    return result
+
+
+def _empty():
+    return {
+        "building_count": 0,
+        "calculated_count": 0,
+        **{key: 0.0 for key in SUM_FIELDS},
+        "class_counts": {},
+    }
+
+
+def get_stats():
+    """
+    Liefert die Statistik-Zeile; fehlt sie noch, wird sie einmalig aufgebaut.
+    """
+    stats = PortfolioStats.objects.filter(pk=1).first()
+    if stats is None:
+        stats = rebuild()
+    return stats
+
+
+def apply_delta(delta):
+    with transaction.atomic():
+        stats = PortfolioStats.objects.select_for_update().filter(pk=1).first()
+        if stats is None:
+            # noch nicht aufgebaut: get_stats() baut beim ersten Lesen aus dem
+            # dann aktuellen Datenbestand auf
+            return
+        for key in ("building_count", "calculated_count", *SUM_FIELDS):
+            setattr(stats, key, getattr(stats, key) + delta[key])
+        counts = dict(stats.class_counts)
+        for label, n in delta["class_counts"].items():
+            counts[label] = counts.get(label, 0) + n
+        stats.class_counts = {label: n for label, n in counts.items() if n}
+        stats.save()
+
+
+def record_change(old_values, new_values):
+    """
+    Führt die Statistik nach Anlegen (old=None), Ändern oder Löschen
+    (new=None) eines Gebäudes nach.
+    """
+    delta = _empty()
+    if new_values is not None:
+        delta = _combine(delta, _contribution(new_values))
+    if old_values is not None:
+        delta = _combine(delta, _contribution(old_values), sign=-1)
+    apply_delta(delta)
+
+
+def record_created(buildings):
+    """
+    Nachführen nach bulk_create (ohne save()-Aufruf je Gebäude).
+    """
+    delta = _empty()
+    for building in buildings:
+        delta = _combine(delta, _contribution(stats_values(building)))
+    apply_delta(delta)
+
+
+def aggregate(queryset):
+    """
+    Kennzahlen eines QuerySets in einer einzigen Aggregat-Abfrage.
+    """
+    specific = ExpressionWrapper(
+        F("result_Q_h") / (F("result_floor_area") * F("storeys")),
+        output_field=FloatField(),
+    )
+    calculated = Q(result_Q_h__isnull=False)
+    with_area = calculated & Q(result_floor_area__gt=0, storeys__gt=0)
+
+    class_exprs = {}
+    lower = None
+    for label, upper in EFFICIENCY_CLASSES:
+        condition = with_area
+        if lower is not None:
+            condition &= Q(specific__gte=lower)
+        if upper is not None:
+            condition &= Q(specific__lt=upper)
+        class_exprs[f"class_{label}"] = Count("pk", filter=condition)
+        lower = upper
+
+    values = queryset.annotate(specific=specific).aggregate(
+        building_count=Count("pk"),
+        calculated_count=Count("pk", filter=calculated),
+        sum_Q_h=Sum("result_Q_h"),
+        sum_reference_area=Sum(
+            ExpressionWrapper(F("result_floor_area") * F("storeys"), output_field=FloatField()),
+            filter=calculated,
+        ),
+        sum_Q_PV_total=Sum("result_Q_PV_total"),
+        sum_Q_PV_on=Sum("result_Q_PV_on"),
+        sum_Q_PV_off=Sum("result_Q_PV_off"),
+        **class_exprs,
+    )
+
+    delta = {
+        "building_count": values["building_count"],
+        "calculated_count": values["calculated_count"],
+        **{key: values[key] or 0.0 for key in SUM_FIELDS},
+        "class_counts": {},
+    }
+    for label, _ in EFFICIENCY_CLASSES:
+        n = values[f"class_{label}"]
+        if n:
+            delta["class_counts"][label] = n
+    return delta
+
+
+def record_queryset_delete(queryset):
+    delta = aggregate(queryset)
+    apply_delta(_combine(_empty(), delta, sign=-1))
+
+
+def rebuild():
+    """
+    Baut die Statistik vollständig aus der Gebäudetabelle neu auf.
+    """
+    values = aggregate(Building.objects.all())
+    stats, _ = PortfolioStats.objects.update_or_create(pk=1, defaults=values)
+    return stats
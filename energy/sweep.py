@@ -0,0 +1,190 @@
+import csv
+import math
+import re
+from io import StringIO
+
+import numpy as np
+
+from .calc import (
+    INPUT_FIELDS,
+    calc_heating_demand_batch,
+    input_values,
+    optional_arrays,
+    optional_values,
+    rows_to_arrays,
+)
+from .metrics import observe_calc
+from .models import Building
+from .timing import timed
+
+
+# Parameterstudie: ein Basisgebäude, einzelne Eingabefelder über Wertebereiche
+# variiert, ausgewertet wird das kartesische Produkt aller Bereiche. Das Gitter
+# wird nie vollständig angelegt: jeder Block bestimmt seine Gitterpunkte aus
+# dem laufenden Index (np.unravel_index) und rechnet sie mit der
+# Batch-Berechnung, ohne Datenbankzeilen.
+
+MAX_AXES = 3
+MAX_POINTS = 5_000_000
+MAX_AXIS_VALUES = 1000
+CHUNK_SIZE = 65536
+
+# Ergebnisgrößen der Tabelle (CSV) in dieser Reihenfolge
+SWEEP_RESULT_KEYS = ("Q_h", "Q_T", "Q_V", "Q_I", "Q_S", "Q_PV_total", "Q_PV_on", "Q_PV_off")
+
+
+class SweepError(ValueError):
+    """
+    Ungültige Achsen oder Wertebereiche.
+    """
+
+
+def parse_values(text):
+    """
+    Werte einer Achse aus einer Eingabe wie "0.2:0.4:0.05" (Start, Ende
+    einschließlich, Schrittweite) oder "0.2; 0.3; 0.45" (Liste). Dezimal-
+    komma ist zulässig, solange die Liste mit ";" getrennt ist.
+    """
+    text = (text or "").strip()
+    if not text:
+        raise SweepError("Keine Werte angegeben.")
+
+    def number(part):
+        try:
+            value = float(part.strip().replace(",", "."))
+        except ValueError:
+            raise SweepError(f"Keine Zahl: {part.strip()!r}")
+        if not math.isfinite(value):
+            raise SweepError(f"Keine endliche Zahl: {part.strip()!r}")
+        return value
+
+    if ":" in text:
+        parts = text.split(":")
+        if len(parts) != 3:
+            raise SweepError("Bereich als Start:Ende:Schrittweite angeben.")
+        start, stop, step = (number(part) for part in parts)
+        if step <= 0:
+            raise SweepError("Die Schrittweite muss größer als 0 sein.")
+        if stop < start:
+            raise SweepError("Das Ende muss mindestens so groß wie der Start sein.")
+        count = math.floor((stop - start) / step + 1e-9) + 1
+        if count > MAX_AXIS_VALUES:
+            raise SweepError(f"{count} Werte je Achse, höchstens {MAX_AXIS_VALUES} möglich.")
+        # Start + i * Schrittweite statt fortlaufender Summe, damit 0.1-Schritte exakt bleiben
+        return np.round(start + step * np.arange(count), 12)
+
+    values = [number(part) for part in re.split(";" if ";" in text else ",", text) if part.strip()]
+    if len(values) > MAX_AXIS_VALUES:
+        raise SweepError(f"{len(values)} Werte je Achse, höchstens {MAX_AXIS_VALUES} möglich.")
+    return np.array(values, dtype=np.float64)
+
+
+class Sweep:
+    """
+    Parameterstudie über ein Basisgebäude. axes ist eine Liste von
+    (Feldname aus INPUT_FIELDS, Werte); alle übrigen Eingaben samt
+    Klimastandort und PV-Einstellungen stammen aus dem Basisgebäude.
+    Gitterpunkt i entspricht np.unravel_index(i, shape), die letzte Achse
+    läuft am schnellsten.
+    """
+
+    def __init__(self, building: Building, axes):
+        if not axes:
+            raise SweepError("Mindestens eine Achse angeben.")
+        if len(axes) > MAX_AXES:
+            raise SweepError(f"Höchstens {MAX_AXES} Achsen möglich.")
+        names = [name for name, _ in axes]
+        for name in names:
+            if name not in INPUT_FIELDS:
+                raise SweepError(f"{name!r} ist kein Eingabefeld der Berechnung.")
+        if len(set(names)) != len(names):
+            raise SweepError("Jedes Feld darf nur einmal variiert werden.")
+
+        self.building = building
+        self.axes = [(name, np.asarray(values, dtype=np.float64)) for name, values in axes]
+        self.shape = tuple(len(values) for _, values in self.axes)
+        self.size = math.prod(self.shape)
+        if self.size == 0:
+            raise SweepError("Eine Achse hat keine Werte.")
+        if self.size > MAX_POINTS:
+            raise SweepError(f"{self.size:,} Gitterpunkte, höchstens {MAX_POINTS:,} möglich.")
+
+        self._base = rows_to_arrays([input_values(building)])
+        self._optional = optional_arrays([optional_values(building)])
+
+    @property
+    def field_names(self):
+        return [name for name, _ in self.axes]
+
+    def chunk(self, start, stop):
+        """
+        Gitterpunkte start..stop-1: (Achsenwerte je Feld, Ergebnisse je
+        Schlüssel aus RESULT_KEYS), jeweils als Arrays.
+        """
+        n = stop - start
+        index = np.unravel_index(np.arange(start, stop), self.shape)
+        points = {name: values[i] for (name, values), i in zip(self.axes, index)}
+
+        arrays = {name: np.broadcast_to(column, n) for name, column in self._base.items()}
+        arrays.update({name: np.broadcast_to(column, n) for name, column in self._optional.items()})
+        arrays.update(points)
+
+        with timed("calc"), observe_calc("sweep", n):
+            result = calc_heating_demand_batch(arrays)
+        return points, result
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        for start in range(0, self.size, chunk_size):
+            stop = min(start + chunk_size, self.size)
+            yield start, *self.chunk(start, stop)
+
+    def evaluate(self, keys=("Q_h",), chunk_size=CHUNK_SIZE):
+        """
+        Ergebnisse als Arrays der Form shape, je Schlüssel eines.
+        """
+        grids = {key: np.empty(self.size) for key in keys}
+        for start, _, result in self.iter_chunks(chunk_size):
+            for key in keys:
+                grids[key][start:start + len(result[key])] = result[key]
+        return {key: grid.reshape(self.shape) for key, grid in grids.items()}
+
+    def iter_csv(self, keys=SWEEP_RESULT_KEYS, chunk_size=CHUNK_SIZE):
+        """
+        Ergebnistabelle als CSV (Trennzeichen ";"), eine Zeile je
+        Gitterpunkt, als Folge von Text-Blöcken (ein Block je Rechenblock).
+        """
+        buffer = StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        writer.writerow([*self.field_names, *keys])
+        for _, points, result in self.iter_chunks(chunk_size):
+            columns = [points[name].tolist() for name in self.field_names]
+            columns += [np.round(result[key], 3).tolist() for key in keys]
+            writer.writerows(zip(*columns))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+def chart_data(sweep, grid, max_series=12):
+    """
+    Diagrammdaten für Q_h über die Achsen: x = Achse 1, je Wert von Achse 2
+    eine Kurve (höchstens max_series, gleichmäßig ausgewählt), über weitere
+    Achsen gemittelt.
+    """
+    if grid.ndim > 2:
+        grid = grid.mean(axis=tuple(range(2, grid.ndim)))
+    (x_name, x_values), *rest = sweep.axes
+    chart = {"x_field": x_name, "labels": [f"{value:g}" for value in x_values.tolist()], "datasets": []}
+
+    if grid.ndim == 1:
+        chart["datasets"].append({"label": "Q_h", "data": np.round(grid, 1).tolist()})
+        return chart
+
+    series_name, series_values = rest[0]
+    picks = np.unique(np.linspace(0, len(series_values) - 1, min(max_series, len(series_values))).round())
+    for j in picks.astype(int):
+        chart["datasets"].append({
+            "label": f"{series_name} = {series_values[j]:g}",
+            "data": np.round(grid[:, j], 1).tolist(),
+        })
+    return chart
@@ -0,0 +1,228 @@
+import time
+
+import numpy as np
+from django.db import connection, transaction
+
+from .calc import (
+    CALC_VERSION,
+    INPUT_FIELDS,
+    OPTIONAL_FIELDS,
+    WRITABLE_RESULT_KEYS,
+    calc_heating_demand_batch,
+    input_fingerprint,
+)
+from .metrics import observe_calc
+from .models import Building
+from .stats import rebuild as rebuild_stats
+
+
+# Verteilungen je Eingabefeld. Arten:
+#   uniform(low, high), normal(mean, sd, low, high) – auf [low, high] begrenzt,
+#   integers(low, high) – beide Grenzen eingeschlossen,
+#   choice(values, weights), same_as(field) – Wert eines anderen Felds übernehmen
+# "persons" wird aus Fläche, Geschossen und Personendichte abgeleitet.
+DEFAULT_DISTRIBUTIONS = {
+    "length_ns": {"dist": "uniform", "low": 8, "high": 40},
+    "width_ow": {"dist": "uniform", "low": 8, "high": 25},
+    "storeys": {"dist": "integers", "low": 1, "high": 6},
+    "room_height": {"dist": "normal", "mean": 2.7, "sd": 0.15, "low": 2.4, "high": 3.5},
+
+    "u_wall": {"dist": "normal", "mean": 0.8, "sd": 0.4, "low": 0.15, "high": 2.0},
+    "u_roof": {"dist": "normal", "mean": 0.6, "sd": 0.3, "low": 0.12, "high": 1.5},
+    "u_floor": {"dist": "normal", "mean": 0.7, "sd": 0.3, "low": 0.2, "high": 1.5},
+    "u_window": {"dist": "normal", "mean": 1.8, "sd": 0.7, "low": 0.7, "high": 3.5},
+
+    "window_share_n": {"dist": "uniform", "low": 10, "high": 35},
+    "window_share_e": {"dist": "uniform", "low": 15, "high": 45},
+    "window_share_s": {"dist": "uniform", "low": 20, "high": 60},
+    "window_share_w": {"dist": "uniform", "low": 15, "high": 45},
+
+    # ein Verglasungstyp je Gebäude
+    "g_n": {"dist": "choice", "values": [0.5, 0.6, 0.75], "weights": [0.4, 0.45, 0.15]},
+    "g_e": {"dist": "same_as", "field": "g_n"},
+    "g_s": {"dist": "same_as", "field": "g_n"},
+    "g_w": {"dist": "same_as", "field": "g_n"},
+
+    "person_density": {"dist": "normal", "mean": 30, "sd": 8, "low": 15, "high": 60},
+    "air_change_rate": {"dist": "uniform", "low": 0.3, "high": 0.8},
+    "degree_days": {"dist": "normal", "mean": 3300, "sd": 400, "low": 2000, "high": 5000},
+
+    "pv_roof_share": {"dist": "choice", "values": [0, 30, 50, 70], "weights": [0.4, 0.2, 0.25, 0.15]},
+    "pv_specific_yield": {"dist": "normal", "mean": 180, "sd": 20, "low": 120, "high": 240},
+    "pv_self_consumption_share": {"dist": "uniform", "low": 25, "high": 75},
+
+    "setpoint_temp": {"dist": "normal", "mean": 20, "sd": 0.7, "low": 18, "high": 23},
+}
+
+
+class DistributionError(ValueError):
+    """
+    Ungültige Verteilungsangabe.
+    """
+
+
+def _draw(rng, spec, n, columns):
+    kind = spec.get("dist")
+    if kind == "same_as":
+        return columns[spec["field"]]
+    try:
+        if kind == "uniform":
+            return rng.uniform(spec["low"], spec["high"], n)
+        if kind == "normal":
+            values = rng.normal(spec["mean"], spec["sd"], n)
+            return np.clip(values, spec.get("low", -np.inf), spec.get("high", np.inf))
+        if kind == "integers":
+            return rng.integers(spec["low"], spec["high"], n, endpoint=True)
+        if kind == "choice":
+            weights = spec.get("weights")
+            if weights is not None:
+                weights = np.asarray(weights, dtype=np.float64)
+                weights = weights / weights.sum()
+            return rng.choice(np.asarray(spec["values"]), n, p=weights)
+    except KeyError as exc:
+        raise DistributionError(f"Verteilung {kind!r}: Angabe {exc} fehlt.")
+    except (TypeError, ValueError) as exc:
+        raise DistributionError(f"Verteilung {kind!r}: {exc}")
+    raise DistributionError(f"Unbekannte Verteilung: {kind!r}")
+
+
+def _draw_order(specs):
+    """
+    Prüft die Angaben und liefert die Felder in Ziehungsreihenfolge: zuerst
+    alle gezogenen Felder, dann "same_as" jeweils nach dem Feld, auf das
+    es verweist (auch über mehrere Stufen).
+    """
+    for name, spec in specs.items():
+        if not isinstance(spec, dict):
+            raise DistributionError(f"{name}: Verteilung muss ein Objekt sein, z. B. {{\"dist\": ...}}.")
+        if spec.get("dist") == "same_as":
+            target = spec.get("field")
+            if target not in specs:
+                raise DistributionError(f"{name}: same_as verweist auf unbekanntes Feld {target!r}.")
+
+    order = [name for name, spec in specs.items() if spec.get("dist") != "same_as"]
+    placed = set(order)
+    for name in specs:
+        chain = []
+        while name not in placed:
+            if name in chain:
+                raise DistributionError(f"Zirkulärer same_as-Verweis: {' -> '.join(chain + [name])}")
+            chain.append(name)
+            name = specs[name]["field"]
+        order += reversed(chain)
+        placed.update(chain)
+    return order
+
+
+def draw_columns(n, rng, distributions=None):
+    """
+    Zieht n Gebäude als Dict von NumPy-Spalten (Eingabefelder samt
+    person_density und setpoint_temp).
+    """
+    specs = dict(DEFAULT_DISTRIBUTIONS)
+    specs.update(distributions or {})
+
+    columns = {}
+    for name in _draw_order(specs):
+        columns[name] = _draw(rng, specs[name], n, columns)
+
+    # ganzzahlige Felder, auch wenn eine stetige Verteilung angegeben wurde
+    columns["storeys"] = np.maximum(1, np.rint(columns["storeys"])).astype(np.int64)
+
+    # Personen aus Nutzfläche und Personendichte, mindestens eine
+    area = columns["length_ns"] * columns["width_ow"] * columns["storeys"]
+    columns["persons"] = np.maximum(1, np.rint(area / columns["person_density"])).astype(np.int64)
+    return columns
+
+
+def check_distributions(distributions):
+    """
+    Prüft Verteilungsangaben vorab mit einer Probeziehung, damit Fehler
+    auffallen, bevor etwas geschrieben oder gelöscht wird.
+    """
+    if not isinstance(distributions, dict):
+        raise DistributionError("Erwartet wird ein JSON-Objekt {Feld: Verteilung}.")
+    draw_columns(1, np.random.default_rng(0), distributions)
+
+
+# geschriebene Spalten: Name, Eingaben, Ergebnisse (ohne die von der Datenbank
+# berechneten) und Herkunft der Ergebnisse; die optionalen Felder (ohne
+# Klimastandort, fester PV-Eigenverbrauchsanteil) mit den Modell-Standardwerten
+INPUT_COLUMNS = (*INPUT_FIELDS, "person_density", "setpoint_temp")
+OPTIONAL_DEFAULTS = tuple(Building._meta.get_field(name).get_default() for name in OPTIONAL_FIELDS)
+INSERT_FIELDS = (
+    "name",
+    *OPTIONAL_FIELDS,
+    *INPUT_COLUMNS,
+    *(f"result_{key}" for key in WRITABLE_RESULT_KEYS),
+    "input_fingerprint",
+    "calc_version",
+)
+
+
+def _insert_sql():
+    qn = connection.ops.quote_name
+    columns = [qn(Building._meta.get_field(name).column) for name in INSERT_FIELDS]
+    return "INSERT INTO {} ({}) VALUES ({})".format(
+        qn(Building._meta.db_table),
+        ", ".join(columns),
+        ", ".join(["%s"] * len(columns)),
+    )
+
+
+def _rows(columns, start, prefix):
+    """
+    Zeilen für INSERT_FIELDS: Eingaben, Batch-Ergebnisse, Eingabe-Hash und Formelversion.
+    """
+    n = len(columns["length_ns"])
+    with observe_calc("batch", n):
+        result = calc_heating_demand_batch({name: columns[name].astype(np.float64) for name in INPUT_FIELDS})
+
+    names = [f"{prefix} {start + i + 1}" for i in range(n)]
+    inputs = list(zip(*(columns[name].tolist() for name in INPUT_FIELDS)))
+    extra = [columns[name].tolist() for name in INPUT_COLUMNS[len(INPUT_FIELDS):]]
+    results = [result[key].tolist() for key in WRITABLE_RESULT_KEYS]
+    fingerprints = [input_fingerprint(values) for values in inputs]
+
+    return [
+        (name, *OPTIONAL_DEFAULTS, *values, *rest)
+        for name, values, *rest in zip(
+            names, inputs, *extra, *results, fingerprints, [CALC_VERSION] * n
+        )
+    ]
+
+
+def generate(count, seed=1, distributions=None, chunk_size=5000, prefix="Gebäude", start=0,
+             progress=None):
+    """
+    Legt count plausible, bereits berechnete Gebäude blockweise an.
+
+    Eingefügt wird per executemany() statt bulk_create(): Django teilt
+    bulk_create unter SQLite in Anweisungen mit höchstens 999 Parametern
+    (hier gut 20 Zeilen) und bereitet jeden Wert einzeln auf, das begrenzt
+    auf wenige tausend Zeilen/s. Die Spalten sind hier ohnehin schon fertig.
+
+    Gleicher seed, gleiche Verteilungen und gleiche chunk_size ergeben
+    dieselben Gebäude: jeder Block zieht aus einem eigenen, aus (seed,
+    Position des Blocks) abgeleiteten Zufallsstrom. progress(created,
+    elapsed_seconds) wird nach jedem Block aufgerufen.
+    Rückgabe: Anzahl angelegter Gebäude.
+    """
+    started = time.perf_counter()
+    sql = _insert_sql()
+    created = 0
+    while created < count:
+        n = min(chunk_size, count - created)
+        offset = start + created
+        rng = np.random.default_rng([seed, offset])
+        rows = _rows(draw_columns(n, rng, distributions), offset, prefix)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        created += n
+        if progress is not None:
+            progress(created, time.perf_counter() - started)
+
+    # eine Aggregat-Abfrage statt Nachführen je Block
+    if created:
+        rebuild_stats()
+    return created
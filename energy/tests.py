@@ -1,3 +1,1359 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import re
+import tempfile
+import zlib
+from io import BytesIO, StringIO
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from openpyxl import Workbook, load_workbook
+from asgiref.sync import sync_to_async
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import jobs, metrics, uncertainty
+from .api import _result_line
+from .cache import CalcCache
+from .calc import (
+    CALC_VERSION,
+    INPUT_FIELDS,
+    OPTIONAL_FIELDS,
+    RESULT_KEYS,
+    apply_result,
+    calc_heating_demand,
+    calc_heating_demand_batch,
+    input_values,
+    is_current,
+    optional_arrays,
+    optional_values,
+    rows_to_arrays,
+)
+from .climate import HOURS, ClimateError, ClimateStore, import_epw, read_epw
+from .exports import CSV_HEADER, EXPORT_FIELDS, XLSX_CONTENT_TYPE, XLSX_HEADER, iter_csv, iter_export_rows, write_pdf
+from .hourly import HOURLY_INPUT_FIELDS, POSITIVE_FIELDS, calc_heating_demand_hourly
+from .importer import import_buildings, iter_csv_records, iter_records
+from .models import Building, Job, PortfolioStats
+from .pagination import akeyset_page, keyset_page
+from .recalc import recalculate
+from .retrofit import optimize
+from .stats import SUM_FIELDS, aggregate, get_stats, rebuild
+from .sweep import MAX_AXIS_VALUES, MAX_POINTS, Sweep, SweepError, chart_data, parse_values
+from .synthetic import DistributionError, draw_columns
+
+
+def make_building(**values):
+    """
+    Ungespeichertes Gebäude mit den Standardwerten des Formulars.
+    """
+    fields = {
+        "name": "Testgebäude",
+        "length_ns": 20.0,
+        "width_ow": 12.0,
+        "storeys": 3,
+        "room_height": 2.7,
+        "u_wall": 0.8,
+        "u_roof": 0.6,
+        "u_floor": 0.7,
+        "u_window": 1.8,
+        "persons": 24,
+        "setpoint_temp": 20.0,
+    }
+    fields.update(values)
+    return Building(**fields)
+
+
+def random_buildings(n, seed=1):
+    """
+    n zufällige Gebäude, darunter solche mit so hohen inneren Gewinnen,
+    dass Q_h auf 0 begrenzt wird.
+    """
+    rng = np.random.default_rng(seed)
+    buildings = []
+    for i in range(n):
+        buildings.append(make_building(
+            length_ns=float(rng.uniform(5, 60)),
+            width_ow=float(rng.uniform(5, 30)),
+            storeys=int(rng.integers(1, 8)),
+            room_height=float(rng.uniform(2.4, 3.5)),
+            u_wall=float(rng.uniform(0.1, 2.0)),
+            u_roof=float(rng.uniform(0.1, 1.5)),
+            u_floor=float(rng.uniform(0.1, 1.5)),
+            u_window=float(rng.uniform(0.6, 3.5)),
+            window_share_n=float(rng.uniform(0, 80)),
+            window_share_e=float(rng.uniform(0, 80)),
+            window_share_s=float(rng.uniform(0, 80)),
+            window_share_w=float(rng.uniform(0, 80)),
+            g_n=float(rng.uniform(0.3, 0.8)),
+            g_e=float(rng.uniform(0.3, 0.8)),
+            g_s=float(rng.uniform(0.3, 0.8)),
+            g_w=float(rng.uniform(0.3, 0.8)),
+            # jedes dritte Gebäude stark belegt: Gewinne übersteigen die Verluste
+            persons=int(rng.integers(1, 50)) * (200 if i % 3 == 0 else 1),
+            air_change_rate=float(rng.uniform(0.2, 1.5)),
+            degree_days=float(rng.uniform(1500, 5000)),
+            pv_roof_share=float(rng.uniform(0, 100)),
+            pv_specific_yield=float(rng.uniform(100, 250)),
+            pv_self_consumption_share=float(rng.uniform(0, 100)),
+        ))
+    return buildings
+
+
+def synthetic_epw(cold_days=100, gaps=()):
+    """
+    EPW-Text eines Schaltjahres: cold_days Tage mit 0 °C, danach 18 °C,
+    am 29. Februar 50 °C (muss verworfen werden). Globalstrahlung = Stunde × 10,
+    an den Stundenindizes aus gaps (nach dem Verwerfen) als Fehlwert 9999.
+    """
+    lines = ["LOCATION,Teststadt,BY,DEU,TRY,123450,48.10,11.60,1.0,520.0"]
+    lines += [f"HEADER{i}" for i in range(1, 8)]
+    day, index = date(2024, 1, 1), 0
+    while day.year == 2024:
+        leap_day = (day.month, day.day) == (2, 29)
+        for hour in range(1, 25):
+            row = ["0"] * 35
+            row[:5] = [str(day.year), str(day.month), str(day.day), str(hour), "60"]
+            if leap_day:
+                row[6] = "50.0"
+            else:
+                row[6] = "0.0" if index // 24 < cold_days else "18.0"
+            row[13] = "9999" if not leap_day and index in gaps else str(hour * 10)
+            lines.append(",".join(row))
+            index += not leap_day
+        day += timedelta(days=1)
+    return "\n".join(lines) + "\n"
+
+
+class BatchCalcTests(SimpleTestCase):
+    """
+    calc_heating_demand_batch muss bitgenau dieselben Ergebnisse liefern
+    wie die Einzelberechnung.
+    """
+
+    def test_batch_matches_scalar(self):
+        buildings = random_buildings(300)
+        batch = calc_heating_demand_batch(rows_to_arrays([input_values(b) for b in buildings]))
+
+        for i, building in enumerate(buildings):
+            scalar = calc_heating_demand(building)
+            for key in RESULT_KEYS:
+                self.assertEqual(scalar[key], batch[key][i], f"Gebäude {i}, {key}")
+
+    def test_q_h_clamped_at_zero(self):
+        buildings = random_buildings(300)
+        batch = calc_heating_demand_batch(rows_to_arrays([input_values(b) for b in buildings]))
+
+        clamped = batch["Q_h"] == 0.0
+        self.assertTrue(clamped.any(), "Testdaten ohne begrenztes Q_h")
+        self.assertTrue((batch["Q_h"] >= 0).all())
+        # begrenzt genau dort, wo die Bilanz negativ ist
+        balance = batch["Q_V"] + batch["Q_T"] - batch["Q_I"] - batch["Q_S"]
+        np.testing.assert_array_equal(clamped, balance <= 0)
+        for i in np.flatnonzero(clamped):
+            self.assertEqual(calc_heating_demand(buildings[i])["Q_h"], 0.0)
+
+    def test_empty_batch(self):
+        result = calc_heating_demand_batch(rows_to_arrays([], INPUT_FIELDS))
+        for key in RESULT_KEYS:
+            self.assertEqual(len(result[key]), 0)
+
+
+class CalcApiTests(SimpleTestCase):
+    """
+    /api/calc/: je Eingabe eine NDJSON-Zeile, fehlerhafte Eingaben als
+    Fehlerzeile statt als Abbruch der ganzen Anfrage.
+    """
+
+    async def post(self, body, content_type="application/x-ndjson"):
+        response = await self.async_client.post(reverse("api_calc"), body, content_type=content_type)
+        self.assertEqual(response.status_code, 200)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        # jede Zeile muss striktes JSON sein (kein NaN/Infinity)
+        return [
+            json.loads(line, parse_constant=lambda name: self.fail(f"{name} in Antwort"))
+            for line in content.decode().splitlines()
+        ]
+
+    async def test_error_lines(self):
+        valid = {"id": "ok", **dict(zip(INPUT_FIELDS, input_values(make_building())))}
+        body = "\n".join([
+            json.dumps(valid),
+            "{kein json",
+            "[1, 2]",
+            json.dumps({**valid, "id": 7, "u_wall": "abc"}),
+            json.dumps({**valid, "id": "nan", "u_wall": float("nan")}),
+            json.dumps({**valid, "id": "inf", "degree_days": float("inf")}),
+        ])
+        lines = await self.post(body)
+
+        self.assertEqual([line["index"] for line in lines], list(range(6)))
+        self.assertEqual(lines[0]["id"], "ok")
+        self.assertEqual(lines[0]["result"], calc_heating_demand(make_building()))
+        self.assertTrue(lines[1]["errors"]["__all__"][0].startswith("Ungültiges JSON:"))
+        self.assertEqual(lines[2]["errors"], {"__all__": ["Erwartet wird ein JSON-Objekt."]})
+        self.assertEqual(lines[3]["id"], 7)
+        self.assertEqual(list(lines[3]["errors"]), ["u_wall"])
+        self.assertEqual(lines[4]["id"], "nan")
+        self.assertEqual(lines[4]["errors"], {"u_wall": ["Muss eine endliche Zahl sein."]})
+        self.assertEqual(lines[5]["errors"], {"degree_days": ["Muss eine endliche Zahl sein."]})
+
+    async def test_integer_fields(self):
+        valid = dict(zip(INPUT_FIELDS, input_values(make_building())))
+        body = "\n".join(json.dumps({**valid, **values}) for values in (
+            {"storeys": 3.0},
+            {"storeys": 3.5},
+            {"persons": True},
+            {"u_wall": False},
+            {"persons": "24"},
+        ))
+        lines = await self.post(body)
+        self.assertEqual(lines[0]["result"], calc_heating_demand(make_building()))
+        self.assertEqual(lines[1]["errors"], {"storeys": ["Muss eine ganze Zahl sein."]})
+        self.assertEqual(lines[2]["errors"], {"persons": ["Erwartet wird eine Zahl, kein Wahrheitswert."]})
+        self.assertEqual(lines[3]["errors"], {"u_wall": ["Erwartet wird eine Zahl, kein Wahrheitswert."]})
+        self.assertEqual(lines[4]["result"], calc_heating_demand(make_building()))
+
+    async def test_json_array(self):
+        valid = dict(zip(INPUT_FIELDS, input_values(make_building())))
+        lines = await self.post(json.dumps([valid, {}]), content_type="application/json")
+        self.assertEqual(len(lines), 2)
+        self.assertIn("result", lines[0])
+        # Pflichtfelder ohne Standardwert
+        self.assertIn("length_ns", lines[1]["errors"])
+        self.assertNotIn("air_change_rate", lines[1]["errors"])
+
+    async def test_invalid_body(self):
+        response = await self.async_client.post(
+            reverse("api_calc"), "{kein json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(json.loads(response.content)["error"].startswith("Ungültiges JSON:"))
+
+    def test_non_finite_result_id(self):
+        line = json.loads(_result_line(0, {"id": float("nan")}, result={"Q_h": float("inf")}))
+        self.assertEqual(line, {"index": 0, "errors": {"__all__": ["Berechnung ergibt keinen endlichen Wert."]}})
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Vorwärts und rückwärts blättern muss jede Zeile genau einmal liefern,
+    auch bei gleichen Sortierwerten und NULL-Werten.
+    """
+
+    # Gleichstände und NULL-Werte (noch nicht berechnete Gebäude)
+    Q_H = [500.0, None, 200.0, 500.0, None, 100.0, 500.0, 200.0, None, 300.0, 500.0, 100.0, None]
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, q_h in enumerate(cls.Q_H):
+            building = make_building(name=f"Gebäude {i % 4}")
+            building.result_Q_h = q_h
+            building.save()
+
+    def expected(self, order_by):
+        field = order_by.lstrip("-")
+        descending = order_by.startswith("-")
+        rows = [(getattr(b, field), b.pk) for b in Building.objects.all()]
+        values = [pk for value, pk in sorted(row for row in rows if row[0] is not None)]
+        nulls = sorted(pk for value, pk in rows if value is None)
+        if descending:
+            values.reverse()
+            nulls.reverse()
+        # NULL aufsteigend vorne, absteigend hinten
+        return values + nulls if descending else nulls + values
+
+    def pages_forward(self, order_by, page_size):
+        pages, after = [], None
+        while True:
+            rows, next_cursor, prev_cursor = keyset_page(
+                Building.objects.all(), order_by, after=after, page_size=page_size
+            )
+            self.assertEqual(prev_cursor is None, after is None)
+            pages.append([b.pk for b in rows])
+            if next_cursor is None:
+                return pages, prev_cursor
+            after = next_cursor
+
+    def test_forward_and_backward(self):
+        for order_by in ("result_Q_h", "-result_Q_h", "name", "-name", "-id"):
+            for page_size in (1, 4, 5, len(self.Q_H)):
+                with self.subTest(order_by=order_by, page_size=page_size):
+                    pages, before = self.pages_forward(order_by, page_size)
+                    self.assertEqual(sum(pages, []), self.expected(order_by.replace("id", "pk")))
+                    self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+
+                    # von der letzten Seite zurück bis zum Anfang
+                    back = []
+                    while before is not None:
+                        rows, next_cursor, before = keyset_page(
+                            Building.objects.all(), order_by, before=before, page_size=page_size
+                        )
+                        self.assertIsNotNone(next_cursor)
+                        back.insert(0, [b.pk for b in rows])
+                    self.assertEqual(back, pages[:-1])
+
+    def test_invalid_cursor_starts_at_first_page(self):
+        rows, _, prev_cursor = keyset_page(Building.objects.all(), "result_Q_h", after="###", page_size=3)
+        self.assertEqual([b.pk for b in rows], self.expected("result_Q_h")[:3])
+        self.assertIsNone(prev_cursor)
+
+    async def test_async_matches_sync(self):
+        after = None
+        while True:
+            sync_page = await sync_to_async(keyset_page)(
+                Building.objects.all(), "-result_Q_h", after=after, page_size=4
+            )
+            async_page = await akeyset_page(Building.objects.all(), "-result_Q_h", after=after, page_size=4)
+            self.assertEqual(async_page[1:], sync_page[1:])
+            self.assertEqual([b.pk for b in async_page[0]], [b.pk for b in sync_page[0]])
+            after = sync_page[1]
+            if after is None:
+                break
+
+
+class PortfolioStatsTests(TestCase):
+    """
+    Die inkrementell nachgeführte Statistik muss nach jeder Änderung mit
+    einem vollständigen Neuaufbau übereinstimmen.
+    """
+
+    def setUp(self):
+        get_stats()
+
+    def assertStatsCurrent(self):
+        stats = PortfolioStats.objects.get(pk=1)
+        expected = aggregate(Building.objects.all())
+        self.assertEqual(stats.building_count, expected["building_count"])
+        self.assertEqual(stats.calculated_count, expected["calculated_count"])
+        for key in SUM_FIELDS:
+            self.assertAlmostEqual(getattr(stats, key), expected[key], places=6, msg=key)
+        self.assertEqual(stats.class_counts, expected["class_counts"])
+
+    def create(self, calculated=True, **values):
+        building = make_building(**values)
+        if calculated:
+            apply_result(building, calc_heating_demand(building))
+        building.save()
+        return building
+
+    def test_create_and_recalculate(self):
+        for building in random_buildings(20):
+            if building.persons % 2:
+                apply_result(building, calc_heating_demand(building))
+            building.save()
+        self.assertStatsCurrent()
+
+        for building in Building.objects.filter(result_Q_h__isnull=True):
+            apply_result(building, calc_heating_demand(building))
+            building.save()
+        self.assertStatsCurrent()
+
+    def test_geometry_change_without_recalculation(self):
+        # result_floor_area ist ein GeneratedField: ändert sich mit der
+        # Geometrie, auch wenn das Ergebnis nicht neu berechnet wird
+        building = self.create()
+        building.length_ns = 30.0
+        building.save()
+        self.assertStatsCurrent()
+
+        building.storeys = 1
+        building.save()
+        self.assertStatsCurrent()
+
+    def test_update_fields(self):
+        building = self.create()
+        building.length_ns = 35.0
+        building.name = "Umbenannt"
+        building.save(update_fields=["name"])
+        self.assertStatsCurrent()
+        building.save(update_fields=["length_ns"])
+        self.assertStatsCurrent()
+
+    def test_building_reads(self):
+        get_stats()
+
+        def building_selects(action):
+            with CaptureQueriesContext(connection) as queries:
+                action()
+            return [q["sql"] for q in queries if q["sql"].startswith("SELECT") and '"energy_building"' in q["sql"]]
+
+        building = make_building()
+        apply_result(building, calc_heating_demand(building))
+        # Anlegen: Statistik aus den zurückgelieferten Werten, Ändern und
+        # Löschen: je eine Abfrage der bisherigen Werte
+        self.assertEqual(building_selects(building.save), [])
+        building.width_ow = 14.0
+        self.assertEqual(len(building_selects(building.save)), 1)
+        self.assertStatsCurrent()
+        self.assertEqual(len(building_selects(building.delete)), 1)
+        self.assertStatsCurrent()
+
+    def test_delete(self):
+        buildings = [self.create(length_ns=10.0 + i) for i in range(5)]
+        self.create(calculated=False)
+
+        # Objekt mit veralteten Werten im Speicher löschen
+        stale = Building.objects.get(pk=buildings[0].pk)
+        buildings[0].length_ns = 40.0
+        buildings[0].save()
+        stale.delete()
+        self.assertStatsCurrent()
+
+        Building.objects.filter(pk__in=[b.pk for b in buildings[1:3]]).delete()
+        self.assertStatsCurrent()
+
+        Building.objects.all().delete()
+        self.assertStatsCurrent()
+        self.assertEqual(PortfolioStats.objects.get(pk=1).class_counts, {})
+
+    def test_import_and_recalculate(self):
+        records = [
+            (i, {"name": f"Import {i}", "setpoint_temp": 20.0, **dict(zip(INPUT_FIELDS, input_values(b)))})
+            for i, b in enumerate(random_buildings(10, seed=2))
+        ]
+        report = import_buildings(records, batch_size=4)
+        self.assertEqual(report.created, 10)
+        self.assertStatsCurrent()
+
+        Building.objects.update(width_ow=F("width_ow") * 2)
+        recalculate(stale_only=True)
+        self.assertStatsCurrent()
+
+    def test_rebuild(self):
+        self.create()
+        PortfolioStats.objects.filter(pk=1).update(building_count=99, class_counts={"A": 5})
+        rebuild()
+        self.assertStatsCurrent()
+
+
+class JobQueueTests(TestCase):
+    """
+    Warteschlange der Hintergrundjobs: Übernahme, Abbruch, verwaiste Jobs.
+    """
+
+    def test_claim_in_order(self):
+        first = jobs.submit(Job.KIND_RECALCULATE)
+        second = jobs.submit(Job.KIND_RECALCULATE)
+
+        claimed = jobs.claim_next()
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual(claimed.status, Job.STATUS_RUNNING)
+        self.assertIsNotNone(claimed.started_at)
+        self.assertIsNotNone(claimed.heartbeat_at)
+        # ein laufender Job wird nicht noch einmal übernommen
+        self.assertEqual(jobs.claim_next().pk, second.pk)
+        self.assertIsNone(jobs.claim_next())
+
+    def test_release(self):
+        jobs.submit(Job.KIND_RECALCULATE)
+        job = jobs.claim_next()
+        jobs.release(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertIsNone(job.started_at)
+        self.assertEqual(jobs.claim_next().pk, job.pk)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            jobs.submit("unbekannt")
+
+    def test_cancel_queued(self):
+        job = jobs.submit(Job.KIND_RECALCULATE)
+        jobs.cancel(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_CANCELLED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(jobs.claim_next())
+
+    def test_cancel_running(self):
+        make_building().save()
+        job = jobs.submit(Job.KIND_RECALCULATE)
+        job = jobs.claim_next()
+        jobs.cancel(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_RUNNING)
+        self.assertTrue(job.cancel_requested)
+
+        # der Worker bricht beim nächsten Fortschritts-Update ab
+        job = jobs.run_job(job)
+        self.assertEqual(job.status, Job.STATUS_CANCELLED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_run_recalculate(self):
+        for building in random_buildings(3):
+            building.save()
+        job = jobs.submit(Job.KIND_RECALCULATE)
+        job = jobs.run_job(jobs.claim_next())
+        self.assertEqual(job.status, Job.STATUS_DONE, job.message)
+        self.assertEqual((job.progress_done, job.progress_total), (3, 3))
+        self.assertFalse(Building.objects.filter(result_Q_h__isnull=True).exists())
+
+    def test_fail_stale(self):
+        jobs.submit(Job.KIND_RECALCULATE)
+        jobs.submit(Job.KIND_RECALCULATE)
+        stale, alive = jobs.claim_next(), jobs.claim_next()
+        Job.objects.filter(pk=stale.pk).update(
+            heartbeat_at=timezone.now() - jobs.STALE_AFTER - timedelta(seconds=1)
+        )
+        queued = jobs.submit(Job.KIND_RECALCULATE)
+
+        self.assertEqual(jobs.fail_stale(), 1)
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {
+            stale.pk: Job.STATUS_FAILED,
+            alive.pk: Job.STATUS_RUNNING,
+            queued.pk: Job.STATUS_QUEUED,
+        })
+
+
+class StaleResultsTests(TestCase):
+    """
+    Erkennung veralteter Ergebnisse (Formelversion, Eingabe-Hash) und
+    "manage.py recalculate_buildings --stale".
+    """
+
+    def setUp(self):
+        self.buildings = []
+        for building in random_buildings(6, seed=3):
+            apply_result(building, calc_heating_demand(building))
+            building.save()
+            self.buildings.append(building)
+        self.uncalculated = make_building()
+        self.uncalculated.save()
+
+    def test_is_current(self):
+        building = self.buildings[0]
+        self.assertTrue(is_current(building))
+        self.assertFalse(is_current(self.uncalculated))
+
+        building.u_window += 0.1
+        self.assertFalse(is_current(building))
+        apply_result(building, calc_heating_demand(building))
+        self.assertTrue(is_current(building))
+
+        building.calc_version = CALC_VERSION - 1
+        self.assertFalse(is_current(building))
+
+    def test_calc_outdated(self):
+        Building.objects.filter(pk=self.buildings[0].pk).update(calc_version=CALC_VERSION - 1)
+        # geänderte Eingaben bei gleicher Version erkennt nur der Hash-Vergleich
+        Building.objects.filter(pk=self.buildings[1].pk).update(u_wall=F("u_wall") + 0.1)
+        outdated = set(Building.objects.calc_outdated().values_list("pk", flat=True))
+        self.assertEqual(outdated, {self.buildings[0].pk, self.uncalculated.pk})
+
+    def test_recalculate_stale_command(self):
+        changed = [self.buildings[1].pk, self.buildings[4].pk]
+        Building.objects.filter(pk__in=changed).update(width_ow=F("width_ow") + 1)
+        Building.objects.filter(pk=self.buildings[2].pk).update(calc_version=CALC_VERSION - 1)
+        untouched = Building.objects.get(pk=self.buildings[0].pk)
+
+        out = StringIO()
+        call_command("recalculate_buildings", "--stale", "--chunk-size=2", stdout=out)
+        self.assertIn("4 von 7 Gebäuden waren veraltet", out.getvalue())
+
+        for building in Building.objects.all():
+            self.assertTrue(is_current(building), building.pk)
+            self.assertEqual(building.result_Q_h, calc_heating_demand(building)["Q_h"])
+        self.assertEqual(Building.objects.get(pk=untouched.pk).result_Q_h, untouched.result_Q_h)
+
+        out = StringIO()
+        call_command("recalculate_buildings", "--stale", stdout=out)
+        self.assertIn("0 von 7 Gebäuden waren veraltet", out.getvalue())
+
+
+class DistributionTests(SimpleTestCase):
+    """
+    Verteilungsangaben für generate_buildings: same_as-Ketten und
+    verständliche Fehler bei ungültigen Angaben.
+    """
+
+    def draw(self, distributions):
+        return draw_columns(50, np.random.default_rng(1), distributions)
+
+    def test_defaults_reproducible(self):
+        a, b = self.draw(None), self.draw(None)
+        for name in a:
+            np.testing.assert_array_equal(a[name], b[name])
+        np.testing.assert_array_equal(a["g_w"], a["g_n"])
+
+    def test_same_as_chain(self):
+        columns = self.draw({
+            "g_w": {"dist": "same_as", "field": "g_s"},
+            "g_s": {"dist": "same_as", "field": "g_e"},
+            "g_e": {"dist": "same_as", "field": "g_n"},
+        })
+        for name in ("g_e", "g_s", "g_w"):
+            np.testing.assert_array_equal(columns[name], columns["g_n"])
+
+    def test_invalid_specs(self):
+        cases = {
+            "Zirkulärer same_as-Verweis": {
+                "g_n": {"dist": "same_as", "field": "g_w"},
+                "g_w": {"dist": "same_as", "field": "g_n"},
+            },
+            "unbekanntes Feld": {"g_n": {"dist": "same_as", "field": "g_x"}},
+            "muss ein Objekt sein": {"u_wall": 0.5},
+            "Angabe 'high' fehlt": {"u_wall": {"dist": "uniform", "low": 0.2}},
+            "Unbekannte Verteilung": {"u_wall": {"dist": "beta"}},
+        }
+        for message, distributions in cases.items():
+            with self.subTest(message), self.assertRaisesMessage(DistributionError, message):
+                self.draw(distributions)
+
+    def test_command_rejects_before_replace(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"u_wall": [0.2, 0.8]}, f)
+        self.addCleanup(os.unlink, f.name)
+        # --replace würde löschen; der Fehler muss vorher kommen (ohne DB-Zugriff)
+        with self.assertRaisesMessage(CommandError, "u_wall: Verteilung muss ein Objekt sein"):
+            call_command("generate_buildings", "10", "--replace", "--distributions", f.name, stdout=StringIO())
+
+
+class StreamingExportTests(TestCase):
+    """
+    Gestreamte CSV-Exporte: unter ASGI als async Iterator (sonst puffert
+    Django die ganze Antwort), unter WSGI unverändert synchron.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for building in random_buildings(30, seed=4):
+            apply_result(building, calc_heating_demand(building))
+            building.save()
+        cls.building = building
+
+    def urls(self):
+        return [
+            reverse("building_export_csv"),
+            reverse("building_sweep_csv", args=[self.building.pk])
+            + "?field_1=u_wall&values_1=0.1:2:0.01&field_2=u_window&values_2=0.8:3:0.2",
+        ]
+
+    def wsgi_content(self, url):
+        response = self.client.get(url)
+        self.assertFalse(response.is_async)
+        return b"".join(response.streaming_content)
+
+    async def test_asgi_matches_wsgi(self):
+        for url in self.urls():
+            with self.subTest(url):
+                expected = await sync_to_async(self.wsgi_content)(url)
+
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.is_async)
+                content = b"".join([chunk async for chunk in response.streaming_content])
+                self.assertEqual(content, expected)
+
+
+class HourlyCalcTests(SimpleTestCase):
+    """
+    Stundenverfahren: gleiche Bilanzanteile wie das Jahresverfahren und
+    Prüfung der Geometrie.
+    """
+
+    def arrays(self, buildings):
+        return rows_to_arrays(
+            [[getattr(b, name) for name in HOURLY_INPUT_FIELDS] for b in buildings], HOURLY_INPUT_FIELDS
+        )
+
+    def test_balance_matches_annual(self):
+        arrays = self.arrays(random_buildings(40, seed=5))
+        annual = calc_heating_demand_batch(arrays)
+        hourly = calc_heating_demand_hourly(arrays, block_size=16)
+        for key in ("Q_T", "Q_V", "Q_I"):
+            np.testing.assert_allclose(hourly[key], annual[key], rtol=1e-9, err_msg=key)
+        self.assertTrue((hourly["Q_S"] <= annual["Q_S"] + 1e-6).all())
+        self.assertTrue(np.isfinite(hourly["Q_h"]).all())
+        self.assertTrue((hourly["Q_h"] >= 0).all())
+
+    def test_non_positive_geometry(self):
+        for name in POSITIVE_FIELDS:
+            with self.subTest(name):
+                arrays = self.arrays([make_building(), make_building(**{name: 0})])
+                with self.assertRaisesMessage(ValueError, name):
+                    calc_heating_demand_hourly(arrays)
+
+    async def test_api_geometry_error_line(self):
+        valid = dict(zip(HOURLY_INPUT_FIELDS, [getattr(make_building(), f) for f in HOURLY_INPUT_FIELDS]))
+        body = "\n".join(json.dumps(record) for record in [valid, {**valid, "storeys": 0}, valid])
+        response = await self.async_client.post(
+            reverse("api_calc") + "?engine=hourly", body, content_type="application/x-ndjson"
+        )
+        lines = [json.loads(line) for line in b"".join([c async for c in response.streaming_content]).splitlines()]
+        self.assertEqual(lines[1]["errors"], {"storeys": ["Muss größer als 0 sein."]})
+        self.assertEqual(lines[0]["result"], lines[2]["result"])
+
+
+class CalcApiOptionalFieldsTests(SimpleTestCase):
+    """
+    Optionale Angaben (Klimastandort, stündliche PV) gehen wie beim
+    gespeicherten Gebäude in die API-Berechnung ein.
+    """
+
+    async def post(self, records, engine="annual"):
+        response = await self.async_client.post(
+            reverse("api_calc") + f"?engine={engine}", json.dumps(records), content_type="application/json"
+        )
+        return [json.loads(line) for line in b"".join([c async for c in response.streaming_content]).splitlines()]
+
+    def record(self, building):
+        return {name: getattr(building, name) for name in (*HOURLY_INPUT_FIELDS, *OPTIONAL_FIELDS)}
+
+    async def test_hourly_pv(self):
+        building = make_building(pv_mode=Building.PV_MODE_HOURLY, electricity_demand=3000.0, battery_capacity=5.0)
+        share = make_building()
+        lines = await self.post([self.record(building), self.record(share)])
+        self.assertEqual(lines[0]["result"], calc_heating_demand(building))
+        self.assertEqual(lines[1]["result"], calc_heating_demand(share))
+        self.assertNotEqual(lines[0]["result"]["Q_PV_on"], lines[1]["result"]["Q_PV_on"])
+
+        # das Stundenverfahren übernimmt die PV-Bilanz des Jahresverfahrens
+        hourly = await self.post([self.record(building)], engine="hourly")
+        self.assertEqual(hourly[0]["result"]["Q_PV_on"], lines[0]["result"]["Q_PV_on"])
+
+    async def test_invalid_optional_fields(self):
+        record = self.record(make_building())
+        lines = await self.post([
+            {**record, "climate_location": "nirgendwo"},
+            {**record, "pv_mode": "stündlich"},
+            {**record, "battery_capacity": "viel"},
+            {**record, "battery_capacity": -5},
+            {**record, "electricity_demand": -0.5},
+            {**record, "electricity_demand": "-1"},
+        ])
+        self.assertEqual(lines[0]["errors"], {"climate_location": ["Unbekannter Klimastandort 'nirgendwo'."]})
+        self.assertEqual(list(lines[1]["errors"]), ["pv_mode"])
+        self.assertEqual(list(lines[2]["errors"]), ["battery_capacity"])
+        self.assertEqual(list(lines[3]["errors"]), ["battery_capacity"])
+        self.assertEqual(list(lines[4]["errors"]), ["electricity_demand"])
+        self.assertEqual(list(lines[5]["errors"]), ["electricity_demand"])
+
+    def test_negative_pv_fields_rejected_by_model(self):
+        with self.assertRaises(ValidationError) as cm:
+            make_building(electricity_demand=-1.0, battery_capacity=-2.0).full_clean()
+        self.assertEqual(set(cm.exception.message_dict), {"electricity_demand", "battery_capacity"})
+
+
+class RetrofitTests(SimpleTestCase):
+    """
+    Sanierungsoptimierung: flächenbezogene Werte je m² Bezugsfläche
+    (Grundfläche × Geschosse) wie in der Portfolio-Statistik.
+    """
+
+    def test_specific_per_reference_area(self):
+        building = make_building(storeys=4)
+        result = optimize(building)
+        base = result["base"]
+        self.assertEqual(base["reference_area"], base["floor_area"] * 4)
+
+        entries = result["front"]
+        self.assertEqual(entries[0]["measures"], [])
+        self.assertAlmostEqual(entries[0]["specific"], base["Q_h"] / base["reference_area"])
+        for entry in entries:
+            self.assertAlmostEqual(entry["specific"], entry["objective"] / base["reference_area"])
+
+    def test_target_uses_reference_area(self):
+        building = make_building(storeys=4)
+        entries = optimize(building)["front"]
+        # Ziel zwischen zwei Punkten der Front: günstigste Kombination darunter
+        target = (entries[1]["specific"] + entries[2]["specific"]) / 2
+        cheapest = optimize(building, target=target)["cheapest"]
+        self.assertEqual(cheapest, entries[2])
+        self.assertLessEqual(cheapest["specific"], target)
+
+
+class ClimateFallbackTests(TestCase):
+    """
+    Gespeicherter Klimastandort ohne Wetterdaten: Berechnung mit den
+    Standardwerten und Hinweis auf der Detailseite statt Fehler 500.
+    """
+
+    def test_missing_location(self):
+        building = make_building(climate_location="abgebaut", pv_mode=Building.PV_MODE_HOURLY)
+        with self.assertLogs("energy.climate", "WARNING"):
+            result = calc_heating_demand(building)
+        self.assertEqual(result, calc_heating_demand(make_building(pv_mode=Building.PV_MODE_HOURLY)))
+
+        building.save()
+        response = self.client.get(reverse("building_detail", args=[building.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "keine Wetterdaten vorhanden")
+
+
+class ClimateStoreTests(SimpleTestCase):
+    """
+    Caches des Wetterdatenspeichers: Neuimport durch einen anderen Prozess
+    (hier eine zweite Instanz auf demselben Verzeichnis), begrenztes LRU.
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def write(self, store, location_id, temperature):
+        store.write(location_id, {"city": location_id}, {"temp_air": np.full(HOURS, temperature)})
+
+    def test_reimport_in_other_process(self):
+        reader, writer = ClimateStore(self.root), ClimateStore(self.root)
+        self.write(writer, "ort", 5.0)
+        first = reader.derived("ort", ("first",), lambda dataset: float(dataset["temp_air"][0]))
+        self.assertEqual(first, 5.0)
+
+        self.write(writer, "ort", 8.0)
+        self.assertEqual(reader.derived("ort", ("first",), lambda dataset: float(dataset["temp_air"][0])), 8.0)
+        self.assertEqual(float(reader.open("ort")["temp_air"][0]), 8.0)
+
+    def test_derived_bounded(self):
+        store = ClimateStore(self.root, max_open=1, max_derived=2)
+        for name in ("a", "b", "c"):
+            self.write(store, name, 1.0)
+            store.degree_days(name)
+        self.assertEqual(len(store._open), 1)
+        self.assertEqual([key[0] for key in store._derived], ["b", "c"])
+
+
+class EpwImportTests(SimpleTestCase):
+    """
+    EPW-Umwandlung und Wetterdatenspeicher an einer synthetischen Datei.
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.store = ClimateStore(os.path.join(self.root, "store"))
+
+    def test_read_epw(self):
+        meta, columns = read_epw(StringIO(synthetic_epw(gaps=(100, 101))))
+        self.assertEqual(meta["wmo"], "123450")
+        self.assertEqual(meta["latitude"], 48.1)
+        # 29. Februar verworfen: 8760 Stunden, kein 50-°C-Wert
+        self.assertEqual(len(columns["temp_air"]), HOURS)
+        self.assertEqual(columns["temp_air"].max(), 18.0)
+        # Stunden 100/101 (5./6. Stunde des 5. Tags) aus den Nachbarn interpoliert
+        np.testing.assert_allclose(columns["ghi"][99:103], [40.0, 50.0, 60.0, 70.0])
+
+    def test_read_epw_invalid(self):
+        with self.assertRaises(ClimateError):
+            read_epw(StringIO("kein EPW\n"))
+        truncated = "\n".join(synthetic_epw().splitlines()[:-24])
+        with self.assertRaisesMessage(ClimateError, "8736 Datenzeilen"):
+            read_epw(StringIO(truncated))
+
+    def test_write_open_forget(self):
+        path = os.path.join(self.root, "muenchen.epw")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(synthetic_epw())
+        location_id, meta = import_epw(path, store=self.store)
+        self.assertEqual(location_id, "123450")
+        self.assertEqual(self.store.locations()["123450"]["file"], "muenchen.epw")
+
+        dataset = self.store.open(location_id)
+        self.assertIs(self.store.open(location_id), dataset)
+        self.assertEqual(dataset["temp_air"].dtype, np.float32)
+        self.assertEqual(len(dataset.daily_mean_temperature()), 365)
+
+        self.store.degree_days(location_id)
+        self.store.forget(location_id)
+        self.assertEqual(len(self.store._open), 0)
+        self.assertEqual(len(self.store._derived), 0)
+        self.assertIsNot(self.store.open(location_id), dataset)
+
+        with self.assertRaises(ClimateError):
+            self.store.open("fehlt")
+
+    def test_degree_days(self):
+        _, columns = read_epw(StringIO(synthetic_epw(cold_days=100)))
+        self.store.write("ort", {}, columns)
+        # G20/15: nur die 100 kalten Tage zählen, je 20 K
+        self.assertEqual(self.store.degree_days("ort"), 2000.0)
+        # ohne Heizgrenze auch die 265 Tage mit 18 °C, je 2 K
+        self.assertEqual(self.store.degree_days("ort", heating_limit=None), 2530.0)
+
+
+class UncertaintyTests(SimpleTestCase):
+    """
+    Monte-Carlo-Perzentile je Gebäude.
+    """
+
+    def test_building_cache(self):
+        building = make_building(u_wall=0.73)
+        first = uncertainty.building_percentiles(building, samples=500, seed=3)
+        key = next(reversed(uncertainty._building_cache))
+        self.assertEqual(key[2:], (500, 3))
+        size = len(uncertainty._building_cache)
+        self.assertEqual(uncertainty.building_percentiles(building, samples=500, seed=3), first)
+        self.assertEqual(len(uncertainty._building_cache), size)
+
+        # anderer Seed bzw. andere Eingaben: eigener Eintrag
+        uncertainty.building_percentiles(building, samples=500, seed=4)
+        building.u_wall = 0.74
+        uncertainty.building_percentiles(building, samples=500, seed=3)
+        self.assertEqual(len(uncertainty._building_cache), size + 2)
+
+    def test_yield_rounded_for_hourly_pv_only(self):
+        draws = uncertainty._draws(200, 1)
+        base = {name: np.array([getattr(make_building(), name)] * 2, dtype=np.float64) for name in INPUT_FIELDS}
+        base["pv_hourly"] = np.array([0.0, 1.0])
+        yields = uncertainty._sampled_inputs(base, draws)["pv_specific_yield"].reshape(2, -1)
+        self.assertFalse(np.array_equal(yields[0], np.round(yields[0])))
+        np.testing.assert_array_equal(yields[1], np.round(yields[1]))
+
+    def test_reproducible(self):
+        rows = [input_values(building) for building in random_buildings(5)]
+        optional = [optional_values(building) for building in random_buildings(5)]
+        first = uncertainty.percentiles(rows, optional, samples=2000, seed=7)
+        second = uncertainty.percentiles(rows, optional, samples=2000, seed=7)
+        for key in uncertainty.UNCERTAINTY_KEYS:
+            np.testing.assert_array_equal(first[key], second[key])
+        other = uncertainty.percentiles(rows, optional, samples=2000, seed=8)
+        self.assertFalse(np.array_equal(first["Q_h"], other["Q_h"]))
+
+    def test_median_close_to_deterministic(self):
+        # nur Gebäude mit Heizwärmebedarf (bei Q_h = 0 liegt der Median darüber)
+        buildings = [b for b in random_buildings(9) if calc_heating_demand(b)["Q_h"] > 0]
+        self.assertGreaterEqual(len(buildings), 3)
+        for building in buildings:
+            q_h = calc_heating_demand(building)["Q_h"]
+            stats = uncertainty.building_percentiles(building, samples=20000, seed=11)["Q_h"]
+            self.assertLessEqual(stats["p10"], stats["p50"])
+            self.assertLessEqual(stats["p50"], stats["p90"])
+            self.assertAlmostEqual(stats["p50"] / q_h, 1.0, delta=0.05)
+
+
+class BuildingAdminTests(TestCase):
+    """
+    Die Admin-Maske führt alle Eingabefelder des Gebäudes.
+    """
+
+    def test_fieldsets_cover_inputs(self):
+        model_admin = site._registry[Building]
+        listed = {name for _, options in model_admin.fieldsets for name in options["fields"]}
+        editable = {field.name for field in Building._meta.get_fields() if getattr(field, "editable", False) and not field.auto_created}
+        self.assertEqual(editable - listed, set())
+
+    def test_change_page(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.org", "geheim"))
+        building = make_building(climate_location="ort", battery_capacity=5.0)
+        building.save()
+        response = self.client.get(reverse("admin:energy_building_change", args=[building.pk]))
+        self.assertContains(response, 'name="battery_capacity"')
+        self.assertContains(response, 'name="climate_location"')
+
+
+class SweepTests(SimpleTestCase):
+    """
+    Parameterstudie: Gitter, Eingabe der Wertebereiche, Grenzen, Diagramm.
+    """
+
+    def test_matches_batch(self):
+        building = make_building(pv_mode=Building.PV_MODE_HOURLY)
+        u_wall, persons = [0.3, 0.6, 0.9], [10.0, 40.0]
+        sweep = Sweep(building, [("u_wall", u_wall), ("persons", persons)])
+        grid = sweep.evaluate(keys=("Q_h", "Q_PV_on"), chunk_size=4)
+        self.assertEqual(grid["Q_h"].shape, (3, 2))
+
+        rows, optional = [], []
+        for u in u_wall:
+            for p in persons:
+                point = make_building(pv_mode=Building.PV_MODE_HOURLY, u_wall=u, persons=p)
+                rows.append(input_values(point))
+                optional.append(optional_values(point))
+        arrays = rows_to_arrays(rows)
+        arrays.update(optional_arrays(optional))
+        expected = calc_heating_demand_batch(arrays)
+        np.testing.assert_allclose(grid["Q_h"].reshape(-1), expected["Q_h"])
+        np.testing.assert_allclose(grid["Q_PV_on"].reshape(-1), expected["Q_PV_on"])
+
+    def test_parse_values(self):
+        np.testing.assert_array_equal(parse_values("0.2:0.4:0.1"), [0.2, 0.3, 0.4])
+        np.testing.assert_array_equal(parse_values("0,2; 0,35; 1"), [0.2, 0.35, 1.0])
+        np.testing.assert_array_equal(parse_values("1, 2,3"), [1.0, 2.0, 3.0])
+        self.assertEqual(len(parse_values("0:1:0.3")), 4)
+
+    def test_parse_values_errors(self):
+        for text, message in (
+            ("", "Keine Werte"),
+            ("1; x", "Keine Zahl: 'x'"),
+            ("1; inf", "Keine endliche Zahl"),
+            ("1:2", "Start:Ende:Schrittweite"),
+            ("1:2:0", "Schrittweite"),
+            ("2:1:0.5", "Das Ende"),
+            (f"0:{MAX_AXIS_VALUES}:1", f"höchstens {MAX_AXIS_VALUES}"),
+            (";".join(["1"] * (MAX_AXIS_VALUES + 1)), f"höchstens {MAX_AXIS_VALUES}"),
+        ):
+            with self.subTest(text=text[:20]), self.assertRaisesMessage(SweepError, message):
+                parse_values(text)
+
+    def test_axes_and_limits(self):
+        building = make_building()
+        values = np.arange(MAX_AXIS_VALUES, dtype=np.float64)
+        with self.assertRaisesMessage(SweepError, "Gitterpunkte"):
+            Sweep(building, [("u_wall", values), ("u_roof", values), ("u_floor", values[:MAX_POINTS // 10**6 + 1])])
+        self.assertEqual(Sweep(building, [("u_wall", values), ("u_roof", values), ("u_floor", values[:5])]).size, MAX_POINTS)
+        for axes, message in (
+            ([], "Mindestens eine Achse"),
+            ([("name", [1.0])], "kein Eingabefeld"),
+            ([("u_wall", [1.0]), ("u_wall", [2.0])], "nur einmal"),
+            ([("u_wall", [])], "keine Werte"),
+        ):
+            with self.subTest(message=message), self.assertRaisesMessage(SweepError, message):
+                Sweep(building, axes)
+
+    def test_chart_data(self):
+        building = make_building()
+        sweep = Sweep(building, [("u_wall", [0.2, 0.4]), ("u_roof", np.linspace(0.1, 2.0, 20)), ("u_floor", [0.3, 0.5])])
+        grid = sweep.evaluate()["Q_h"]
+        chart = chart_data(sweep, grid, max_series=5)
+        self.assertEqual(chart["x_field"], "u_wall")
+        self.assertEqual(chart["labels"], ["0.2", "0.4"])
+        self.assertEqual(len(chart["datasets"]), 5)
+        self.assertEqual(chart["datasets"][0]["label"], "u_roof = 0.1")
+        self.assertEqual(chart["datasets"][-1]["label"], "u_roof = 2")
+        # dritte Achse gemittelt
+        self.assertEqual(chart["datasets"][0]["data"], np.round(grid[:, 0].mean(axis=1), 1).tolist())
+
+        single = Sweep(building, [("u_wall", [0.2, 0.4])])
+        chart = chart_data(single, single.evaluate()["Q_h"])
+        self.assertEqual([dataset["label"] for dataset in chart["datasets"]], ["Q_h"])
+
+
+def pdf_pages(data):
+    """
+    Entpackte Inhaltsströme (eine je Seite) einer mit reportlab erzeugten PDF.
+    """
+    pages = []
+    for match in re.finditer(rb"/ASCII85Decode /FlateDecode \][^>]*>>\s*stream\r?\n(.*?)~>\s*endstream", data, re.S):
+        pages.append(zlib.decompress(base64.a85decode(match.group(1))).decode("latin-1"))
+    return pages
+
+
+class ExportTests(TestCase):
+    """
+    Gebäudeliste-Exporte (CSV, XLSX, PDF): Kopfzeile, eine Zeile je Gebäude.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for building in random_buildings(30, seed=5):
+            apply_result(building, calc_heating_demand(building))
+            building.save()
+        # noch nicht berechnet: leere Ergebniszellen
+        make_building(name="Ohne Ergebnis").save()
+        cls.count = 31
+
+    def test_csv(self):
+        response = self.client.get(reverse("building_export_csv"))
+        self.assertEqual(response["Content-Type"], "text/csv")
+        content = b"".join(response.streaming_content).decode("utf-8")
+        rows = list(csv.reader(StringIO(content), delimiter=";"))
+        self.assertEqual(rows[0], CSV_HEADER)
+        self.assertEqual(len(rows), self.count + 1)
+
+        # fehlende Werte und 0 als leere Zelle
+        expected = [
+            [str(pk), name, *(repr(value) if value else "" for value in values)]
+            for pk, name, *values in Building.objects.order_by("id").values_list(*EXPORT_FIELDS)
+        ]
+        self.assertEqual(rows[1:], expected)
+        # Grundfläche rechnet die Datenbank, die übrigen Ergebnisse fehlen noch
+        self.assertEqual(rows[-1][1:], ["Ohne Ergebnis", "240.0"] + [""] * (len(CSV_HEADER) - 3))
+
+    def test_csv_chunks(self):
+        chunks = list(iter_csv(iter_export_rows(), rows_per_chunk=10))
+        # Kopfzeile, dann Blöcke zu höchstens 10 Zeilen
+        self.assertEqual([chunk.count("\n") for chunk in chunks], [1, 10, 10, 10, 1])
+
+    def test_xlsx(self):
+        response = self.client.get(reverse("building_export_xlsx"))
+        self.assertEqual(response["Content-Type"], XLSX_CONTENT_TYPE)
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)), read_only=True)
+        sheet = workbook["Gebäude"]
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), XLSX_HEADER)
+        self.assertTrue(all(cell.font.b for cell in next(sheet.iter_rows(max_row=1))))
+        self.assertEqual(len(rows), self.count + 1)
+        first = Building.objects.order_by("id").values_list(*EXPORT_FIELDS).first()
+        self.assertEqual(rows[1][:3], first[:3])
+        workbook.close()
+
+    def test_pdf(self):
+        response = self.client.get(reverse("building_export_pdf"))
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        data = b"".join(response.streaming_content)
+        self.assertTrue(data.startswith(b"%PDF"))
+        pages = pdf_pages(data)
+        self.assertEqual(len(pages), 1)
+        self.assertIn(f"(Anzahl Geb\\344ude: {self.count}) Tj", pages[0])
+        # je Zeile ein Hintergrundrechteck, dazu eines für die Kopfzeile
+        self.assertEqual(pages[0].count(" re f*"), self.count + 1)
+
+    def test_pdf_pages(self):
+        output = BytesIO()
+        write_pdf(output, ((i, f"Haus {i}", 100.0, 2000.0, None, 0.0) for i in range(200)), count=200)
+        pages = pdf_pages(output.getvalue())
+        self.assertEqual(len(pages), len(re.findall(rb"/Type /Page\b", output.getvalue())))
+        self.assertGreater(len(pages), 1)
+        # Kopfzeile auf jeder Seite, alle Zeilen genau einmal
+        self.assertTrue(all(page.count("(Q_h [kWh/a]) Tj") == 1 for page in pages))
+        names = [name for page in pages for name in re.findall(r"\((Haus \d+)\) Tj", page)]
+        self.assertEqual(names, [f"Haus {i}" for i in range(200)])
+        # feste Zeilenhöhe: alle Folgeseiten gleich voll
+        counts = [page.count(" re f*") - 1 for page in pages]
+        self.assertEqual(len(set(counts[1:-1])), 1)
+
+
+class CalcCacheTests(SimpleTestCase):
+    """
+    Ergebnis-Cache für calc_heating_demand: Treffer, LRU-Verdrängung,
+    Formelversion, gemeinsame Stufe.
+    """
+
+    def test_hits_and_copies(self):
+        cache = CalcCache(maxsize=8)
+        building = make_building()
+        result = cache.calc(building)
+        self.assertEqual(result, calc_heating_demand(building))
+        result["Q_h"] = -1.0
+        # gleiche Eingaben unter anderem Namen: Treffer, unveränderte Kopie
+        self.assertEqual(cache.calc(make_building(name="Reihenhaus")), calc_heating_demand(building))
+        info = cache.info()
+        self.assertEqual((info["hits"], info["misses"], info["size"]), (1, 1, 1))
+        self.assertEqual(info["hit_rate"], 0.5)
+
+        # Klimastandort und stündliche PV gehören zum Schlüssel
+        cache.calc(make_building(pv_mode=Building.PV_MODE_HOURLY))
+        self.assertEqual(cache.info()["misses"], 2)
+
+    def test_eviction(self):
+        cache = CalcCache(maxsize=2)
+        first, second, third = (make_building(u_wall=u) for u in (0.3, 0.4, 0.5))
+        cache.calc(first)
+        cache.calc(second)
+        cache.calc(first)
+        cache.calc(third)   # verdrängt second (am längsten unbenutzt)
+        self.assertEqual(cache.info()["size"], 2)
+        cache.calc(first)
+        self.assertEqual(cache.info()["hits"], 2)
+        cache.calc(second)
+        self.assertEqual(cache.info()["misses"], 4)
+
+        cache.clear()
+        self.assertEqual(cache.info()["size"], 0)
+        self.assertEqual(CalcCache(maxsize=0).calc(first), calc_heating_demand(first))
+
+    def test_version_change(self):
+        cache = CalcCache(maxsize=8)
+        building = make_building()
+        cache.calc(building)
+        with mock.patch("energy.cache.CALC_VERSION", CALC_VERSION + 1):
+            cache.calc(building)
+        self.assertEqual(cache.info()["misses"], 2)
+
+    def test_shared_tier(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        building = make_building()
+        CalcCache(alias="default").calc(building)
+        other = CalcCache(alias="default")
+        self.assertEqual(other.calc(building), calc_heating_demand(building))
+        info = other.info()
+        self.assertEqual((info["shared_hits"], info["misses"], info["size"]), (1, 0, 1))
+
+
+class ImporterTests(TestCase):
+    """
+    Gebäudeimport aus CSV/XLSX: Trennzeichen, Spaltenköpfe, Fehlerbericht.
+    """
+
+    COLUMNS = ("name", "length_ns", "width_ow", "storeys", "room_height", "u_wall", "u_roof", "u_floor", "u_window", "setpoint_temp")
+    ROWS = (
+        ("Haus A", "20,5", "12", "3", "2,7", "0,8", "0,6", "0,7", "1,8", "20"),
+        ("Haus B", "15", "10", "2", "2,5", "0,3", "0,2", "0,3", "1,1", "21"),
+    )
+
+    def csv_file(self, delimiter, header=COLUMNS, rows=ROWS):
+        lines = [delimiter.join(header)] + [delimiter.join(row) for row in rows]
+        return BytesIO(("\ufeff" + "\n".join(lines) + "\n").encode("utf-8"))
+
+    def test_sniff_semicolon(self):
+        # Kopfzeile mit Feldbeschriftungen, Dezimalkomma, BOM
+        header = ("Name", "Länge Nord/Süd [m]", *self.COLUMNS[2:])
+        records = list(iter_csv_records(self.csv_file(";", header)))
+        self.assertEqual([number for number, _ in records], [2, 3])
+        self.assertEqual(records[0][1]["name"], "Haus A")
+        self.assertEqual(records[0][1]["length_ns"], "20.5")
+        self.assertEqual(records[0][1]["room_height"], "2.7")
+
+    def test_sniff_comma(self):
+        rows = [tuple(value.replace(",", ".") for value in row) for row in self.ROWS]
+        records = list(iter_csv_records(self.csv_file(",", rows=rows)))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[1][1]["u_wall"], "0.3")
+        self.assertEqual(set(records[1][1]), set(self.COLUMNS))
+
+    def test_sniff_fallback(self):
+        # eine einzige Spalte: kein Trennzeichen erkennbar, ";" angenommen
+        records = list(iter_csv_records(BytesIO(b"name\nHaus A\n\nHaus B\n")))
+        self.assertEqual(records, [(2, {"name": "Haus A"}), (4, {"name": "Haus B"})])
+
+    def test_import_with_errors(self):
+        rows = self.ROWS + (("Haus C", "x", *self.ROWS[0][2:]),)
+        report = import_buildings(iter_records(self.csv_file(";", rows=rows), "gebaeude.csv"), batch_size=2)
+        self.assertEqual((report.created, report.failed, report.rows), (2, 1, 3))
+        self.assertEqual(report.errors[0][0], 4)
+        self.assertEqual(list(report.errors[0][1]), ["length_ns"])
+
+        output = StringIO()
+        report.write_errors_csv(output)
+        self.assertEqual(output.getvalue().splitlines()[0], "Zeile;Feld;Fehler")
+
+        building = Building.objects.get(name="Haus A")
+        self.assertEqual(building.length_ns, 20.5)
+        self.assertEqual(building.result_Q_h, calc_heating_demand(building)["Q_h"])
+        self.assertTrue(is_current(building))
+
+    def test_xlsx(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(self.COLUMNS)
+        sheet.append(("Haus X", 20.0, 12.0, 3, 2.7, 0.8, 0.6, 0.7, 1.8, 20.0))
+        sheet.append(())
+        sheet.append(("Haus Y", 10.0, 8.0, 1, 2.5, 0.4, 0.3, 0.4, 1.3, 19.0))
+        output = BytesIO()
+        workbook.save(output)
+        output.seek(0)
+
+        records = list(iter_records(output, "Gebäude.XLSX"))
+        self.assertEqual([number for number, _ in records], [2, 4])
+        self.assertEqual(records[1][1]["storeys"], 1)
+        self.assertEqual(import_buildings(records).created, 2)
+
+
+SERVER_TIMING = re.compile(
+    r'^db;dur=[\d.]+;desc="(\d+) queries", calc;dur=[\d.]+, render;dur=[\d.]+, export;dur=[\d.]+, total;dur=[\d.]+$'
+)
+
+
+@override_settings(ENERGY_PROFILING={"SAMPLE_RATE": 1.0, "HEADER": True})
+class ProfilingTests(TestCase):
+    """
+    Request-Profiling: Server-Timing-Header und Logzeile je gemessenem Request.
+    """
+
+    def test_server_timing(self):
+        make_building().save()
+        with self.assertLogs("energy.profiling", "INFO") as logs:
+            response = self.client.get(reverse("building_list"))
+        match = SERVER_TIMING.match(response["Server-Timing"])
+        self.assertIsNotNone(match, response["Server-Timing"])
+        profile = logs.records[0].profile
+        self.assertEqual((profile["view"], profile["status"]), ("building_list", 200))
+        self.assertEqual(profile["queries"], int(match.group(1)))
+        self.assertGreater(profile["queries"], 0)
+
+    def test_streaming_logged_at_end(self):
+        make_building().save()
+        with self.assertLogs("energy.profiling", "INFO") as logs:
+            response = self.client.get(reverse("building_export_csv"))
+            self.assertIn("Server-Timing", response)
+            b"".join(response.streaming_content)
+        self.assertEqual(len(logs.records), 1)
+        self.assertGreater(logs.records[0].profile["export_ms"], 0)
+
+    async def test_async_view(self):
+        with self.assertLogs("energy.profiling", "INFO") as logs:
+            response = await self.async_client.get(reverse("building_list"))
+        self.assertRegex(response["Server-Timing"], SERVER_TIMING)
+        self.assertEqual(logs.records[0].profile["status"], 200)
+
+    @override_settings(ENERGY_PROFILING={"SAMPLE_RATE": 0.0})
+    def test_not_sampled(self):
+        with self.assertNoLogs("energy.profiling"):
+            response = self.client.get(reverse("building_list"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class MetricsTests(TestCase):
+    """
+    Kennzahlen im Prometheus-Format: Zähler, Histogramm, Middleware, /metrics/.
+    """
+
+    def metric(self, cls, name, *args, **kwargs):
+        metric = cls(name, "Test.", *args, **kwargs)
+        self.addCleanup(metrics.REGISTRY.pop, name)
+        return metric
+
+    def request_count(self, view):
+        for name, labels, value in metrics.REQUEST_DURATION.samples():
+            if name.endswith("_count") and labels == [("view", view)]:
+                return value
+        return 0
+
+    def test_counter(self):
+        counter = self.metric(metrics.Counter, "test_items_total", labelnames=("kind",))
+        counter.inc(kind="b")
+        counter.inc(2, kind="a")
+        counter.inc(kind="a")
+        self.assertEqual(counter.render(), "\n".join([
+            "# HELP test_items_total Test.",
+            "# TYPE test_items_total counter",
+            'test_items_total{kind="a"} 3',
+            'test_items_total{kind="b"} 1',
+        ]))
+        with self.assertRaises(ValueError):
+            counter.inc(other="a")
+        with self.assertRaises(ValueError):
+            metrics.Counter("test_items_total", "Doppelt.")
+
+    def test_histogram(self):
+        histogram = self.metric(metrics.Histogram, "test_seconds", buckets=(1, 0.1))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.render().splitlines()[2:], [
+            # Obergrenze einschließlich, kumuliert
+            'test_seconds_bucket{le="0.1"} 2',
+            'test_seconds_bucket{le="1"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            "test_seconds_sum 3.65",
+            "test_seconds_count 4",
+        ])
+
+    def test_label_escaping(self):
+        counter = self.metric(metrics.Counter, "test_escape_total", labelnames=("path",))
+        counter.inc(path='a"b\\c\nd')
+        self.assertIn('test_escape_total{path="a\\"b\\\\c\\nd"} 1', counter.render())
+
+    def test_middleware(self):
+        before = self.request_count("building_list"), self.request_count("<unresolved>")
+        self.client.get(reverse("building_list"))
+        self.client.get("/gibt-es-nicht/")
+        self.assertEqual(self.request_count("building_list"), before[0] + 1)
+        self.assertEqual(self.request_count("<unresolved>"), before[1] + 1)
+
+    def test_view(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        content = response.content.decode()
+        self.assertIn("# TYPE energy_request_duration_seconds histogram", content)
+        self.assertIn("# TYPE energy_calc_cache_hits_total counter", content)
+
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="10.1.2.3").status_code, 403)
+        with override_settings(ENERGY_METRICS={"ALLOWED_IPS": ["10.1.2.3"]}):
+            self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="10.1.2.3").status_code, 200)
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
@@ -0,0 +1,72 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class Timings:
+    """
+    Zeitanteile eines Requests je Kategorie (db, calc, render, export) in
+    Sekunden und die Anzahl der SQL-Abfragen. Verschachtelte Abschnitte
+    werden in beiden Kategorien gezählt (z. B. DB-Zugriffe während eines Exports).
+    """
+
+    __slots__ = ("durations", "queries")
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.queries = 0
+
+    def add(self, category, seconds):
+        self.durations[category] += seconds
+
+
+# aktive Messung des laufenden Requests; None = keine Messung (kein Overhead)
+_current = ContextVar("energy_timings", default=None)
+
+
+def activate(timings):
+    """
+    Setzt timings als aktive Messung; Rückgabe: Token für deactivate().
+    """
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed(category):
+    """
+    Rechnet die Laufzeit des with-Blocks der Kategorie zu, sofern für den
+    laufenden Request gemessen wird; sonst nur ein ContextVar-Zugriff.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(category, time.perf_counter() - start)
+
+
+def timed_iter(category, iterable):
+    """
+    Wie timed(), aber für Generatoren (z. B. gestreamte Exporte): gezählt
+    wird die Zeit in jedem einzelnen next(), nicht die Wartezeit dazwischen.
+    """
+    iterator = iter(iterable)
+    while True:
+        with timed(category):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
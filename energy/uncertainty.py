@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from .calc import (
+    CALC_VERSION,
+    INPUT_FIELDS,
+    calc_heating_demand_batch,
+    input_fingerprint,
+    input_values,
+    optional_arrays,
+    optional_values,
+)
+from .metrics import observe_calc
+from .models import Building
+from .timing import timed
+
+
+# Unsicherheitsanalyse (Monte Carlo): unsichere Eingaben eines Gebäudes
+# werden um ihren Eingabewert gestreut, jede Stichprobe mit der
+# Batch-Berechnung gerechnet und die Ergebnisse als Perzentile angegeben.
+# Die Zufallszahlen hängen nur von Seed und Stichprobenzahl ab; alle Gebäude
+# sehen dieselben Ziehungen, die Ergebnisse sind damit reproduzierbar und
+# untereinander vergleichbar.
+
+# Verteilungen: (Felder, Art, Streuung, Grenzen). "lognormal": Median =
+# Eingabewert, Streuung = Standardabweichung des Logarithmus (≈ relative
+# Streuung); "normal": absolute Standardabweichung, auf die Grenzen
+# beschnitten. Felder einer Zeile teilen sich eine Zufallszahl (g-Werte
+# einer Verglasung). Orientierungswerte, keine Normwerte.
+DISTRIBUTIONS = (
+    (("u_wall",), "lognormal", 0.10, None),
+    (("u_roof",), "lognormal", 0.10, None),
+    (("u_floor",), "lognormal", 0.15, None),
+    (("u_window",), "lognormal", 0.10, None),
+    (("g_n", "g_e", "g_s", "g_w"), "normal", 0.05, (0.0, 1.0)),
+    (("air_change_rate",), "lognormal", 0.25, None),
+    (("degree_days",), "lognormal", 0.08, None),
+    (("pv_specific_yield",), "lognormal", 0.08, None),
+    (("pv_self_consumption_share",), "normal", 5.0, (0.0, 100.0)),
+)
+
+# Spezifischer PV-Ertrag bei stündlicher PV-Rechnung (pv_hourly) auf ganze
+# kWh/m²·a gerundet: ändert die Perzentile nicht merklich, begrenzt aber die
+# Zahl verschiedener PV-Erträge je Gebäude und damit die Batterierechnungen
+# (gleiche Eingaben rechnet pv.self_consumption nur einmal). Beim festen
+# Eigenverbrauchsanteil bleibt der Ertrag ungerundet.
+YIELD_STEP = 1.0
+
+PERCENTILES = (10, 50, 90)
+UNCERTAINTY_KEYS = ("Q_h", "Q_PV_on", "Q_PV_off")
+
+DEFAULT_SAMPLES = 10000
+MAX_SAMPLES = 100000
+DEFAULT_SEED = 42
+
+# Stichproben je Rechenblock (mehrere Gebäude werden zusammen gerechnet)
+CHUNK_POINTS = 262144
+
+# Perzentile einzelner Gebäude (Detailseite) je (Formelversion, Eingabe-Hash,
+# Stichproben, Seed): ein erneuter Aufruf rechnet nicht noch einmal
+# bis zu MAX_SAMPLES Stichproben
+BUILDING_CACHE_SIZE = 256
+_building_cache = OrderedDict()
+_building_cache_lock = threading.Lock()
+
+
+def default_samples():
+    return getattr(settings, "ENERGY_UNCERTAINTY", {}).get("SAMPLES", DEFAULT_SAMPLES)
+
+
+def default_seed():
+    return getattr(settings, "ENERGY_UNCERTAINTY", {}).get("SEED", DEFAULT_SEED)
+
+
+@lru_cache(maxsize=8)
+def _draws(samples, seed):
+    """
+    Standardnormalverteilte Zufallszahlen, Form (len(DISTRIBUTIONS), samples).
+    """
+    draws = np.random.default_rng(seed).standard_normal((len(DISTRIBUTIONS), samples))
+    draws.flags.writeable = False
+    return draws
+
+
+def _sampled_inputs(base, draws):
+    """
+    Eingaben aller Stichproben für einen Block von Gebäuden: base ist ein
+    Dict von Spalten (je Gebäude ein Wert), Ergebnis ein Dict von Spalten
+    der Länge Gebäude × Stichproben (Stichproben eines Gebäudes hintereinander).
+    """
+    samples = draws.shape[1]
+    arrays = {name: np.repeat(column, samples) for name, column in base.items()}
+    for z, (fields, kind, spread, bounds) in zip(draws, DISTRIBUTIONS):
+        for name in fields:
+            column = base[name][:, None]
+            if kind == "lognormal":
+                values = column * np.exp(spread * z)
+            else:
+                values = column + spread * z
+            if bounds is not None:
+                values = np.clip(values, *bounds)
+            arrays[name] = values.reshape(-1)
+    hourly = arrays["pv_hourly"].astype(bool)
+    if hourly.any():
+        yields = arrays["pv_specific_yield"]
+        yields[hourly] = np.round(yields[hourly] / YIELD_STEP) * YIELD_STEP
+    return arrays
+
+
+def percentiles(values_rows, optional_rows, samples=None, seed=None, keys=UNCERTAINTY_KEYS):
+    """
+    Perzentile (PERCENTILES) der Ergebnisse für viele Gebäude. values_rows
+    und optional_rows wie input_values bzw. optional_values je Gebäude.
+    Rückgabe: je Schlüssel ein Array der Form (Gebäude, len(PERCENTILES)).
+    """
+    samples = samples or default_samples()
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"Stichprobenzahl muss zwischen 1 und {MAX_SAMPLES} liegen.")
+    draws = _draws(samples, default_seed() if seed is None else seed)
+
+    values = np.asarray(values_rows, dtype=np.float64).reshape(-1, len(INPUT_FIELDS))
+    optional = optional_arrays(optional_rows)
+    count = len(values)
+    result = {key: np.empty((count, len(PERCENTILES))) for key in keys}
+
+    step = max(1, CHUNK_POINTS // samples)
+    for start in range(0, count, step):
+        block = slice(start, start + step)
+        base = {name: values[block, i] for i, name in enumerate(INPUT_FIELDS)}
+        base.update({name: column[block] for name, column in optional.items()})
+        arrays = _sampled_inputs(base, draws)
+        n = len(arrays["u_wall"])
+
+        with timed("calc"), observe_calc("uncertainty", n):
+            calc = calc_heating_demand_batch(arrays)
+        for key in keys:
+            grid = calc[key].reshape(-1, samples)
+            result[key][block] = np.percentile(grid, PERCENTILES, axis=1).T
+    return result
+
+
+def building_percentiles(building: Building, samples=None, seed=None):
+    """
+    Perzentile eines Gebäudes für die Anzeige:
+    {Schlüssel: {"p10": ..., "p50": ..., "p90": ...}}. Ergebnisse werden
+    je Eingabe-Hash, Stichprobenzahl und Seed zwischengespeichert.
+    """
+    samples = samples or default_samples()
+    seed = default_seed() if seed is None else seed
+    values, optional = input_values(building), optional_values(building)
+    key = (CALC_VERSION, input_fingerprint(values, optional), samples, seed)
+    with _building_cache_lock:
+        stats = _building_cache.get(key)
+        if stats is not None:
+            _building_cache.move_to_end(key)
+            return {name: dict(row) for name, row in stats.items()}
+
+    result = percentiles([values], [optional], samples, seed)
+    stats = {
+        name: {f"p{p}": float(value) for p, value in zip(PERCENTILES, row[0])}
+        for name, row in result.items()
+    }
+    with _building_cache_lock:
+        _building_cache[key] = stats
+        while len(_building_cache) > BUILDING_CACHE_SIZE:
+            _building_cache.popitem(last=False)
+    return {name: dict(row) for name, row in stats.items()}
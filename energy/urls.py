@@ -10,9 +10,26 @@ urlpatterns = [
     path("buildings/<int:pk>/edit/", views.building_edit, name="building_edit"),
     path("buildings/<int:pk>/delete/", views.building_delete, name="building_delete"),
     path("buildings/delete_all/", views.building_delete_all, name="building_delete_all"),
+    path("buildings/import/", views.building_import, name="building_import"),
 
     path("buildings/export/csv/", views.building_export_csv, name="building_export_csv"),
     path("buildings/export/xlsx/", views.building_export_xlsx, name="building_export_xlsx"),
     path("buildings/export/pdf/", views.building_export_pdf, name="building_export_pdf"),
     path("buildings/<int:pk>/result/pdf/", views.building_result_pdf, name="building_result_pdf"),
+    path("buildings/<int:pk>/chart-data/", views.building_chart_data, name="building_chart_data"),
+    path("buildings/<int:pk>/sweep/", views.building_sweep, name="building_sweep"),
+    path("buildings/<int:pk>/sweep/csv/", views.building_sweep_csv, name="building_sweep_csv"),
+    path("buildings/<int:pk>/retrofit/", views.building_retrofit, name="building_retrofit"),
+
+    path("api/calc/", views.api_calc, name="api_calc"),
+    path("api/buildings/<int:pk>/retrofit/", views.api_retrofit, name="api_retrofit"),
+
+    path("jobs/", views.job_list, name="job_list"),
+    path("jobs/create/", views.job_create, name="job_create"),
+    path("jobs/<int:pk>/", views.job_detail, name="job_detail"),
+    path("jobs/<int:pk>/status/", views.job_status, name="job_status"),
+    path("jobs/<int:pk>/cancel/", views.job_cancel, name="job_cancel"),
+    path("jobs/<int:pk>/download/", views.job_download, name="job_download"),
+
+    path("metrics/", views.metrics, name="metrics"),
 ]
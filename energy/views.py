@@ -1,13 +1,50 @@
-import csv
+import json
+import tempfile
+import time
 from io import BytesIO
 
-from django.http import HttpResponse
-from django.shortcuts import render, get_object_or_404, redirect
-from .forms import BuildingForm
-from .calc import calc_heating_demand
-from .models import Building
-from openpyxl import Workbook
-from openpyxl.styles import Font
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .api import ENGINES, InputError, aiter_ndjson_results, iter_request_records, run_in_executor
+from .forms import BuildingForm, BuildingImportForm, RetrofitForm, SweepForm
+from .cache import cached_calc_heating_demand
+from .calc import apply_result, is_current
+from .climate import climate_store
+from .exports import (
+    CSV_HEADER,
+    PDF_FIELDS,
+    UNCERTAINTY_HEADER,
+    XLSX_CONTENT_TYPE,
+    XLSX_HEADER,
+    iter_csv,
+    iter_export_rows,
+    iter_uncertainty_rows,
+    write_pdf,
+    write_xlsx,
+)
+from .importer import import_buildings, iter_records
+from .jobs import JOB_HANDLERS, cancel as cancel_job, submit as submit_job
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from .models import Building, Job
+from .pagination import akeyset_page
+from .retrofit import DEFAULT_CATALOGUE, OBJECTIVES, RetrofitError, optimize, parse_catalogue
+from .stats import EFFICIENCY_CLASSES, get_stats
+from .sweep import Sweep, SweepError, chart_data as sweep_chart_data
+from .timing import timed, timed_iter
+from .uncertainty import MAX_SAMPLES, building_percentiles, default_samples, default_seed
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
@@ -21,14 +58,32 @@ from reportlab.graphics.charts.barcharts import VerticalBarChart
 
 
 def dashboard(request):
-    building_count = Building.objects.count()
+    # Kennzahlen aus der laufend nachgeführten Statistik statt Tabellen-Scan
+    stats = get_stats()
     last_building = Building.objects.order_by("-id").first()
+
+    class_total = sum(stats.class_counts.values())
+    efficiency_distribution = [
+        {
+            "label": label,
+            "count": stats.class_counts.get(label, 0),
+            "share": 100.0 * stats.class_counts.get(label, 0) / class_total if class_total else 0.0,
+        }
+        for label, _ in EFFICIENCY_CLASSES
+    ]
+
     return render(
         request,
         "energy/dashboard.html",
         {
-            "building_count": building_count,
+            "building_count": stats.building_count,
             "last_building": last_building,
+            "stats": stats,
+            "mean_Q_h": stats.sum_Q_h / stats.calculated_count if stats.calculated_count else None,
+            "mean_specific_Q_h": (
+                stats.sum_Q_h / stats.sum_reference_area if stats.sum_reference_area else None
+            ),
+            "efficiency_distribution": efficiency_distribution,
         },
     )
 
@@ -39,35 +94,13 @@ def building_create(request):
     if request.method == "POST":
         form = BuildingForm(request.POST)
         if form.is_valid():
-            building = form.save()
+            building = form.save(commit=False)
 
             # Berechnung durchführen
-            result = calc_heating_demand(building)
+            result = cached_calc_heating_demand(building)
 
             # Ergebnisse ins Modell schreiben
-            building.result_Q_T = result["Q_T"]
-            building.result_Q_V = result["Q_V"]
-            building.result_Q_I = result["Q_I"]
-            building.result_Q_S = result["Q_S"]
-            building.result_Q_h = result["Q_h"]
-
-            building.result_H_T = result["H_T"]
-            building.result_H_V = result["H_V"]
-
-            building.result_floor_area = result["floor_area"]
-            building.result_roof_area = result["roof_area"]
-            building.result_opaque_wall_area = result["opaque_wall_area"]
-            building.result_window_area = result["window_area"]
-
-            building.result_Q_S_n = result["Q_S_n"]
-            building.result_Q_S_e = result["Q_S_e"]
-            building.result_Q_S_s = result["Q_S_s"]
-            building.result_Q_S_w = result["Q_S_w"]
-
-            building.result_Q_PV_total = result["Q_PV_total"]
-            building.result_Q_PV_on = result["Q_PV_on"]
-            building.result_Q_PV_off = result["Q_PV_off"]
-
+            apply_result(building, result)
             building.save()
 
             # >>> HIER wird zur Gebäudeliste umgeleitet <<<
@@ -83,7 +116,12 @@ def building_create(request):
     return render(request, "energy/building_form.html", {"form": form, "result": result})
 
 
-def building_list(request):
+# Spalten, die die Gebäudeliste tatsächlich anzeigt
+LIST_FIELDS = ("id", "name", "result_floor_area", "result_Q_h", "result_Q_PV_on", "result_Q_PV_off")
+LIST_PAGE_SIZE = 50
+
+
+async def building_list(request):
     # erlaubte Sortierfelder
     order = request.GET.get("order", "-id")
     allowed_orders = {
@@ -97,10 +135,19 @@ def building_list(request):
     }
     order_by = allowed_orders.get(order, "-id")
 
-    buildings = Building.objects.all().order_by(order_by)
+    # Keyset-Paginierung: jede Seite kostet gleich viel, egal wie weit hinten
+    buildings, next_cursor, prev_cursor = await akeyset_page(
+        Building.objects.only(*LIST_FIELDS),
+        order_by,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+        page_size=LIST_PAGE_SIZE,
+    )
     context = {
         "buildings": buildings,
         "current_order": order,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
     }
     return render(request, "energy/building_list.html", context)
 
@@ -127,34 +174,13 @@ def building_edit(request, pk):
     if request.method == "POST":
         form = BuildingForm(request.POST, instance=building)
         if form.is_valid():
-            building = form.save()
-
-            # Berechnung erneut durchführen
-            result = calc_heating_demand(building)
-
-            building.result_Q_T = result["Q_T"]
-            building.result_Q_V = result["Q_V"]
-            building.result_Q_I = result["Q_I"]
-            building.result_Q_S = result["Q_S"]
-            building.result_Q_h = result["Q_h"]
-
-            building.result_H_T = result["H_T"]
-            building.result_H_V = result["H_V"]
-
-            building.result_floor_area = result["floor_area"]
-            building.result_roof_area = result["roof_area"]
-            building.result_opaque_wall_area = result["opaque_wall_area"]
-            building.result_window_area = result["window_area"]
-
-            building.result_Q_S_n = result["Q_S_n"]
-            building.result_Q_S_e = result["Q_S_e"]
-            building.result_Q_S_s = result["Q_S_s"]
-            building.result_Q_S_w = result["Q_S_w"]
-
-            building.result_Q_PV_total = result["Q_PV_total"]
-            building.result_Q_PV_on = result["Q_PV_on"]
-            building.result_Q_PV_off = result["Q_PV_off"]
+            building = form.save(commit=False)
 
+            # Berechnung nur erneut durchführen, wenn sich Eingaben oder
+            # Formelversion geändert haben (z. B. nicht bei reiner Umbenennung)
+            if not is_current(building):
+                result = cached_calc_heating_demand(building)
+                apply_result(building, result)
             building.save()
 
             return redirect("building_detail", pk=building.pk)
@@ -168,205 +194,131 @@ def building_edit(request, pk):
     )
 
 
-def building_export_csv(request):
+def building_import(request):
     """
-    Export aller Gebäude als CSV.
+    Massenimport von Gebäuden aus CSV/XLSX mit Fehlerbericht je Zeile.
     """
-    buildings = Building.objects.all().order_by("id")
-
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = 'attachment; filename="buildings_export.csv"'
+    report = None
 
-    writer = csv.writer(response, delimiter=";")
-
-    # Kopfzeile
-    writer.writerow([
-        "ID",
-        "Name",
-        "Grundfläche [m²]",
-        "Q_h [kWh/a]",
-        "Q_T [kWh/a]",
-        "Q_V [kWh/a]",
-        "Q_I [kWh/a]",
-        "Q_S [kWh/a]",
-        "PV gesamt [kWh/a]",
-        "PV Eigenverbrauch [kWh/a]",
-        "PV Überschuss [kWh/a]",
-    ])
-
-    # Datenzeilen
-    for b in buildings:
-        writer.writerow([
-            b.id,
-            b.name,
-            b.result_floor_area or "",
-            b.result_Q_h or "",
-            b.result_Q_T or "",
-            b.result_Q_V or "",
-            b.result_Q_I or "",
-            b.result_Q_S or "",
-            b.result_Q_PV_total or "",
-            b.result_Q_PV_on or "",
-            b.result_Q_PV_off or "",
-        ])
-
-    return response
-
-
-def building_export_xlsx(request):
-    """
-    Export aller Gebäude als Excel-Datei (XLSX).
-    """
-    buildings = Building.objects.all().order_by("id")
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Gebäude"
-
-    # Kopfzeile
-    headers = [
-        "ID",
-        "Name",
-        "Grundfläche [m²]",
-        "Q_h [kWh/a]",
-        "Q_T [kWh/a]",
-        "Q_V [kWh/a]",
-        "Q_I [kWh/a]",
-        "Q_S [kWh/a]",
-        "PV gesamt [kWh/a]",
-        "PV Eigenverb [kWh/a]",
-        "PV Überschuss [kWh/a]",
-    ]
-    ws.append(headers)
-
-    # Kopfzeile fett machen
-    bold_font = Font(bold=True)
-    for cell in ws[1]:
-        cell.font = bold_font
-
-    # Datenzeilen
-    for b in buildings:
-        ws.append([
-            b.id,
-            b.name,
-            b.result_floor_area or "",
-            b.result_Q_h or "",
-            b.result_Q_T or "",
-            b.result_Q_V or "",
-            b.result_Q_I or "",
-            b.result_Q_S or "",
-            b.result_Q_PV_total or "",
-            b.result_Q_PV_on or "",
-            b.result_Q_PV_off or "",
-        ])
-
-    # In Memory-Stream schreiben
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    if request.method == "POST":
+        form = BuildingImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            report = import_buildings(
+                iter_records(upload, upload.name),
+                batch_size=form.cleaned_data["batch_size"],
+            )
+    else:
+        form = BuildingImportForm()
 
-    # HTTP-Response
-    response = HttpResponse(
-        output.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    return render(
+        request,
+        "energy/building_import.html",
+        {"form": form, "report": report, "max_errors_shown": 200},
     )
-    response["Content-Disposition"] = 'attachment; filename="buildings_export.xlsx"'
-    return response
 
 
-def building_export_pdf(request):
+def _uncertainty_samples(value):
     """
-    Export aller Gebäude als übersichtliche PDF-Tabelle.
+    Stichprobenzahl der Unsicherheitsanalyse aus einem Request-Parameter,
+    auf 1..MAX_SAMPLES begrenzt; leer oder ungültig: Voreinstellung.
     """
-    buildings = Building.objects.all().order_by("id")
+    try:
+        samples = int(value or default_samples())
+    except ValueError:
+        samples = default_samples()
+    return min(max(samples, 1), MAX_SAMPLES)
 
-    # PDF in Memory erzeugen
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        leftMargin=20 * mm,
-        rightMargin=20 * mm,
-        topMargin=25 * mm,
-        bottomMargin=20 * mm,
-    )
 
-    styles = getSampleStyleSheet()
-    elements = []
+_END = object()
 
-    # Titel
-    elements.append(Paragraph("Gebäude-Export – Energiebilanz", styles["Title"]))
-    elements.append(Spacer(1, 8))
 
-    # kleine Zusammenfassung
-    info_text = f"Anzahl Gebäude: {buildings.count()}"
-    elements.append(Paragraph(info_text, styles["Normal"]))
-    elements.append(Spacer(1, 12))
+async def _aiter_sync(iterable):
+    # jeden Block einzeln im Sync-Thread holen (dort liegt auch die
+    # Datenbankverbindung eines serverseitigen Cursors)
+    iterator = iter(iterable)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(iterator, _END)) is not _END:
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
 
-    # Hilfsfunktion für Zahlenformat
-    def fmt(val, decimals=1):
-        if val is None:
-            return "-"
-        return f"{val:.{decimals}f}"
-
-    # Tabellendaten
-    data = [
-        ["ID", "Name", "Grundfl. [m²]", "Q_h [kWh/a]", "PV on [kWh/a]", "PV off [kWh/a]"]
-    ]
 
-    for b in buildings:
-        data.append([
-            str(b.id),
-            b.name,
-            fmt(b.result_floor_area, 1),
-            fmt(b.result_Q_h, 1),
-            fmt(b.result_Q_PV_on, 1),
-            fmt(b.result_Q_PV_off, 1),
-        ])
+def _streaming_content(request, chunks):
+    """
+    Inhalt für StreamingHttpResponse aus einem synchronen Generator. Unter
+    ASGI liest Django einen synchronen Iterator vollständig in den Speicher,
+    bevor gesendet wird; dort wird er daher als async Iterator Block für
+    Block weitergereicht. Unter WSGI bleibt er unverändert.
+    """
+    if isinstance(request, ASGIRequest):
+        return _aiter_sync(chunks)
+    return chunks
 
-    # Tabelle mit Styling
-    table = Table(data, repeatRows=1, hAlign="LEFT")
 
-    table.setStyle(TableStyle([
-        # Header
-        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e9ecef")),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, 0), 10),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 6),
-        ("TOPPADDING", (0, 0), (-1, 0), 6),
-
-        # Körper
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
-        ("FONTSIZE", (0, 1), (-1, -1), 9),
-        ("BOTTOMPADDING", (0, 1), (-1, -1), 4),
-        ("TOPPADDING", (0, 1), (-1, -1), 4),
+def building_export_csv(request):
+    """
+    Export aller Gebäude als CSV (gestreamt, Speicherbedarf unabhängig von der Anzahl).
+    Mit ?uncertainty=1 (optional &samples=) zusätzlich die Perzentile der
+    Unsicherheitsanalyse je Gebäude.
+    """
+    if request.GET.get("uncertainty"):
+        samples = _uncertainty_samples(request.GET.get("samples"))
+        chunks = iter_csv(iter_uncertainty_rows(samples=samples), header=CSV_HEADER + UNCERTAINTY_HEADER)
+    else:
+        chunks = iter_csv(iter_export_rows())
+    response = StreamingHttpResponse(
+        _streaming_content(request, timed_iter("export", chunks)),
+        content_type="text/csv",
+    )
+    response["Content-Disposition"] = 'attachment; filename="buildings_export.csv"'
+    return response
 
-        # Gitterlinien
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
 
-        # Ausrichtung: ID + Zahlen rechts, Name links
-        ("ALIGN", (0, 1), (0, -1), "RIGHT"),
-        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+def building_export_xlsx(request):
+    """
+    Export aller Gebäude als Excel-Datei (XLSX), ?uncertainty=1 wie beim CSV-Export.
+    Die Datei wird in eine temporäre Datei geschrieben und von dort ausgeliefert.
+    """
+    output = tempfile.TemporaryFile()
+    with timed("export"):
+        if request.GET.get("uncertainty"):
+            samples = _uncertainty_samples(request.GET.get("samples"))
+            write_xlsx(output, iter_uncertainty_rows(samples=samples), header=XLSX_HEADER + UNCERTAINTY_HEADER)
+        else:
+            write_xlsx(output, iter_export_rows())
+    output.seek(0)
 
-        # wechselnde Zeilenfarben im Body
-        ("ROWBACKGROUNDS", (0, 1), (-1, -1),
-         [colors.white, colors.HexColor("#f8f9fa")]),
-    ]))
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename="buildings_export.xlsx",
+        content_type=XLSX_CONTENT_TYPE,
+    )
 
-    elements.append(table)
 
-    # PDF aufbauen
-    doc.build(elements)
+def building_export_pdf(request):
+    """
+    Export aller Gebäude als übersichtliche PDF-Tabelle.
+    """
+    output = tempfile.TemporaryFile()
+    with timed("export"):
+        write_pdf(
+            output,
+            iter_export_rows(fields=PDF_FIELDS),
+            count=Building.objects.count(),
+        )
+    output.seek(0)
 
-    # Response zurückgeben
-    buffer.seek(0)
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type="application/pdf"
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename="buildings_export.pdf",
+        content_type="application/pdf",
     )
-    response["Content-Disposition"] = 'attachment; filename=\"buildings_export.pdf\"'
-    return response
 
 
 def building_result_pdf(request, pk):
@@ -469,7 +421,8 @@ def building_result_pdf(request, pk):
     elements.append(drawing)
 
     # PDF bauen
-    doc.build(elements)
+    with timed("export"):
+        doc.build(elements)
 
     buffer.seek(0)
     response = HttpResponse(
@@ -482,10 +435,312 @@ def building_result_pdf(request, pk):
     return response
 
 
-def building_detail(request, pk):
+async def building_detail(request, pk):
     """
     Detailansicht eines Gebäudes mit gespeichertem Ergebnis.
     (Template verwenden wir später, wenn du soweit bist.)
     """
+    building = await aget_object_or_404(Building, pk=pk)
+
+    # Unsicherheitsanalyse, Stichprobenzahl per ?samples= wählbar
+    samples = _uncertainty_samples(request.GET.get("samples"))
+    stats = await run_in_executor(building_percentiles, building, samples)
+
+    return render(request, "energy/building_detail.html", {
+        "building": building,
+        # gespeicherter Standort ohne Wetterdaten: gerechnet wird mit Standardwerten
+        "climate_missing": bool(building.climate_location) and not climate_store.exists(building.climate_location),
+        "uncertainty_rows": [
+            ("Q<sub>h</sub>", stats["Q_h"]),
+            ("PV Eigenverbrauch", stats["Q_PV_on"]),
+            ("PV Überschuss", stats["Q_PV_off"]),
+        ],
+        "uncertainty_samples": samples,
+        "uncertainty_seed": default_seed(),
+    })
+
+
+def _sweep_from_request(request, building):
+    """
+    SweepForm aus den GET-Parametern und daraus die Parameterstudie
+    (None, solange das Formular nicht gültig ist).
+    """
+    form = SweepForm(request.GET or None)
+    sweep = None
+    if form.is_valid():
+        try:
+            sweep = Sweep(building, form.cleaned_data["axes"])
+        except SweepError as exc:
+            form.add_error(None, str(exc))
+    return form, sweep
+
+
+def building_sweep(request, pk):
+    """
+    Parameterstudie: Q_h eines Gebäudes über bis zu drei variierte
+    Eingabefelder, gerechnet ohne Datenbankzeilen (energy.sweep).
+    """
+    building = get_object_or_404(Building, pk=pk)
+    form, sweep = _sweep_from_request(request, building)
+
+    context = {"building": building, "form": form, "sweep": sweep}
+    if sweep is not None:
+        start = time.perf_counter()
+        q_h = sweep.evaluate(("Q_h",))["Q_h"]
+        context.update({
+            "elapsed": time.perf_counter() - start,
+            "chart": sweep_chart_data(sweep, q_h),
+            "q_h_min": q_h.min(),
+            "q_h_max": q_h.max(),
+            "query": request.GET.urlencode(),
+        })
+    return render(request, "energy/building_sweep.html", context)
+
+
+def building_sweep_csv(request, pk):
+    """
+    Ergebnistabelle der Parameterstudie als CSV, blockweise gerechnet und gestreamt.
+    """
+    building = get_object_or_404(Building, pk=pk)
+    form, sweep = _sweep_from_request(request, building)
+    if sweep is None:
+        return HttpResponse(
+            "Ungültige Parameterstudie: " + "; ".join(
+                " ".join(messages) for messages in form.errors.values()
+            ),
+            status=400,
+            content_type="text/plain; charset=utf-8",
+        )
+
+    response = StreamingHttpResponse(
+        _streaming_content(request, timed_iter("export", sweep.iter_csv())),
+        content_type="text/csv",
+    )
+    response["Content-Disposition"] = f'attachment; filename="parameterstudie_{building.pk}.csv"'
+    return response
+
+
+def building_retrofit(request, pk):
+    """
+    Sanierungsoptimierung mit dem Standardkatalog (energy.retrofit):
+    Pareto-Front Kosten gegen Zielgröße und günstigste Kombination für
+    einen Zielwert.
+    """
     building = get_object_or_404(Building, pk=pk)
-    return render(request, "energy/building_detail.html", {"building": building})
+    form = RetrofitForm(request.GET or None)
+    objective, target = "Q_h", None
+    if form.is_valid():
+        objective, target = form.cleaned_data["objective"], form.cleaned_data["target"]
+
+    start = time.perf_counter()
+    result = optimize(building, DEFAULT_CATALOGUE, objective, target)
+    elapsed = time.perf_counter() - start
+
+    chart = {
+        "front": [
+            {"x": round(entry["cost"]), "y": round(entry["specific"], 1)}
+            for entry in result["front"] if entry["specific"] is not None
+        ],
+        "cheapest": None,
+    }
+    if result["cheapest"]:
+        chart["cheapest"] = {"x": round(result["cheapest"]["cost"]), "y": round(result["cheapest"]["specific"], 1)}
+
+    return render(request, "energy/building_retrofit.html", {
+        "building": building,
+        "form": form,
+        "result": result,
+        "target": target,
+        "objective_label": OBJECTIVES[objective],
+        "catalogue": DEFAULT_CATALOGUE,
+        "elapsed": elapsed,
+        "chart": chart,
+    })
+
+
+# Diagrammdaten der Detailansicht: Energieflüsse, solare Gewinne je
+# Orientierung, PV-Nutzung (Beschriftung, Ergebnisfeld)
+CHART_SERIES = {
+    "energy": (
+        ("Q_T (Verluste)", "result_Q_T"),
+        ("Q_V (Verluste)", "result_Q_V"),
+        ("Q_I (Gewinne)", "result_Q_I"),
+        ("Q_S (Gewinne)", "result_Q_S"),
+        ("Q_h (Bedarf)", "result_Q_h"),
+    ),
+    "solar": (
+        ("Nord", "result_Q_S_n"),
+        ("Ost", "result_Q_S_e"),
+        ("Süd", "result_Q_S_s"),
+        ("West", "result_Q_S_w"),
+    ),
+    "pv": (
+        ("PV Eigenverbrauch", "result_Q_PV_on"),
+        ("PV Überschuss", "result_Q_PV_off"),
+    ),
+}
+
+
+async def building_chart_data(request, pk):
+    """
+    Daten der Diagramme eines Gebäudes als JSON (kWh/a, fehlende Werte als null).
+    """
+    fields = [field for series in CHART_SERIES.values() for _, field in series]
+    values = await Building.objects.filter(pk=pk).values(*fields).afirst()
+    if values is None:
+        raise Http404("Gebäude nicht gefunden.")
+    return JsonResponse({
+        name: {
+            "labels": [label for label, _ in series],
+            "data": [values[field] for _, field in series],
+        }
+        for name, series in CHART_SERIES.items()
+    })
+
+
+@csrf_exempt
+@require_POST
+async def api_calc(request):
+    """
+    Zustandslose Berechnung ohne Datenbank: nimmt die Eingabefelder als
+    JSON-Array oder NDJSON entgegen und streamt die Ergebnisse als NDJSON
+    (eine Zeile je Eingabe, in Eingabereihenfolge). Optional wie im
+    Formular: "climate_location" (importierter Standort), "pv_mode",
+    "electricity_demand" und "battery_capacity".
+
+    Parsen und Berechnen laufen im Thread-Pool; unter ASGI bedient ein
+    Worker so viele langsame Clients gleichzeitig.
+
+    ?engine=hourly rechnet stündlich (energy.hourly, zusätzlich mit
+    "setpoint_temp"), Standard ist das Jahresverfahren (annual). Beide
+    liefern dieselben Q_T, Q_V und Q_I; Q_S und Q_h des Stundenverfahrens
+    berücksichtigen nur die Stunden unter Soll bzw. die Speicherwirkung und
+    liegen daher unter bzw. meist über dem Jahresverfahren.
+    """
+    engine = request.GET.get("engine", "annual")
+    if engine not in ENGINES:
+        return JsonResponse(
+            {"error": f"Unbekanntes Verfahren {engine!r}, erlaubt: {', '.join(ENGINES)}."},
+            status=400,
+        )
+    try:
+        records = await run_in_executor(iter_request_records, request)
+    except InputError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return StreamingHttpResponse(
+        aiter_ndjson_results(records, engine=engine),
+        content_type="application/x-ndjson",
+    )
+
+
+@csrf_exempt
+@require_POST
+def api_retrofit(request, pk):
+    """
+    Sanierungsoptimierung als JSON: {"catalogue": [...], "objective": "Q_h"
+    oder "net", "target": kWh/m²a}, alle Angaben optional (Katalogformat
+    siehe energy.retrofit.parse_catalogue). Antwort wie optimize().
+    """
+    building = get_object_or_404(Building, pk=pk)
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError as exc:
+        return JsonResponse({"error": f"Ungültiges JSON: {exc}"}, status=400)
+    try:
+        if not isinstance(data, dict):
+            raise RetrofitError("Erwartet wird ein JSON-Objekt.")
+        catalogue = parse_catalogue(data["catalogue"]) if "catalogue" in data else DEFAULT_CATALOGUE
+        target = data.get("target")
+        if target is not None and (isinstance(target, bool) or not isinstance(target, (int, float))):
+            raise RetrofitError("target muss eine Zahl sein.")
+        result = optimize(building, catalogue, str(data.get("objective", "Q_h")), target)
+    except RetrofitError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse(result)
+
+
+# --- Hintergrundjobs (Exporte, Neuberechnung), abgearbeitet von "manage.py run_jobs" ---
+
+def _job_state(job):
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "kind_display": job.get_kind_display(),
+        "status": job.status,
+        "status_display": job.get_status_display(),
+        "progress_done": job.progress_done,
+        "progress_total": job.progress_total,
+        "progress_percent": job.progress_percent,
+        "cancel_requested": job.cancel_requested,
+        "finished": job.is_finished,
+        "message": job.message if job.status != Job.STATUS_FAILED else "Fehler bei der Ausführung.",
+        "download_url": (
+            reverse("job_download", args=[job.pk])
+            if job.status == Job.STATUS_DONE and job.result_file
+            else None
+        ),
+    }
+
+
+def job_list(request):
+    """
+    Übersicht der letzten Hintergrundjobs.
+    """
+    jobs = Job.objects.order_by("-id")[:50]
+    return render(request, "energy/job_list.html", {"jobs": jobs})
+
+
+@require_POST
+def job_create(request):
+    """
+    Legt einen Job der gewünschten Art an und leitet auf seine Statusseite.
+    """
+    kind = request.POST.get("kind")
+    if kind not in JOB_HANDLERS:
+        return HttpResponse("Unbekannte Job-Art.", status=400)
+    params = {}
+    if kind == Job.KIND_RECALCULATE and request.POST.get("stale"):
+        params["stale"] = True
+    if kind in (Job.KIND_EXPORT_CSV, Job.KIND_EXPORT_XLSX) and request.POST.get("uncertainty"):
+        params["uncertainty"] = _uncertainty_samples(request.POST.get("samples"))
+    job = submit_job(kind, **params)
+    return redirect("job_detail", pk=job.pk)
+
+
+def job_detail(request, pk):
+    """
+    Statusseite eines Jobs; der Fortschritt wird per job_status abgefragt.
+    """
+    job = get_object_or_404(Job, pk=pk)
+    return render(request, "energy/job_detail.html", {"job": job, "state": _job_state(job)})
+
+
+def job_status(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return JsonResponse(_job_state(job))
+
+
+@require_POST
+def job_cancel(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    cancel_job(job)
+    return redirect("job_detail", pk=job.pk)
+
+
+def job_download(request, pk):
+    job = get_object_or_404(Job, pk=pk, status=Job.STATUS_DONE)
+    if not job.result_file:
+        raise Http404("Zu diesem Job gibt es keine Datei.")
+    return FileResponse(job.result_file.open("rb"), as_attachment=True, filename=job.result_name)
+
+
+def metrics(request):
+    """
+    Kennzahlen des Prozesses im Prometheus-Textformat, nur für die Adressen
+    aus ENERGY_METRICS["ALLOWED_IPS"].
+    """
+    allowed = getattr(settings, "ENERGY_METRICS", {}).get("ALLOWED_IPS", ["127.0.0.1", "::1"])
+    if request.META.get("REMOTE_ADDR") not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
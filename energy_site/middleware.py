@@ -0,0 +1,227 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from energy.metrics import REQUEST_DURATION
+from energy.timing import Timings, activate, deactivate
+
+
+logger = logging.getLogger("energy.profiling")
+
+# Reihenfolge im Server-Timing-Header und in der Logzeile
+CATEGORIES = ("db", "calc", "render", "export")
+
+
+class ProfilingMiddleware:
+    """
+    Misst für eine Stichprobe der Requests (ENERGY_PROFILING["SAMPLE_RATE"])
+    die Zeitanteile für Datenbank, Berechnung, Template-Rendering und Export
+    sowie die Anzahl der SQL-Abfragen. Ausgabe als Server-Timing-Header
+    (sichtbar in den Browser-Entwicklertools) und als Logzeile über den
+    Logger "energy.profiling".
+
+    Nicht gezogene Requests kosten nur einen Zufallswert; die Messpunkte
+    (energy.timing.timed) sind ohne aktive Messung nahezu kostenlos.
+
+    Bei gestreamten Antworten (CSV-Export, API) läuft der Großteil der Arbeit
+    erst nach dem View: der Header enthält dann nur den Teil bis zum Start
+    der Übertragung, die Logzeile wird am Ende des Streams mit allen Anteilen
+    geschrieben.
+
+    Läuft synchron (WSGI) und asynchron (ASGI), damit async Views unter
+    ASGI nicht über einen Thread umgeleitet werden.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, "ENERGY_PROFILING", {})
+        self.sample_rate = config.get("SAMPLE_RATE", 0.0)
+        self.header = config.get("HEADER", True)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        timings = Timings()
+        start = time.perf_counter()
+        with self._measuring(timings):
+            response = self.get_response(request)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        # das async ORM fragt in einem eigenen Thread ab, der eigene
+        # Verbindungsobjekte hat -> Zähler dort einhängen
+        timings = Timings()
+        start = time.perf_counter()
+        db = await sync_to_async(self._db_wrappers)(timings)
+        token = activate(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate(token)
+            await sync_to_async(db.close)()
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    def _finish(self, request, response, timings, elapsed):
+        if self.header:
+            response["Server-Timing"] = server_timing(timings, elapsed)
+
+        if not response.streaming:
+            log_request(request, response, timings, elapsed)
+        elif response.is_async:
+            response.streaming_content = self._astream(response.streaming_content, request, response,
+                                                       timings, elapsed)
+        else:
+            response.streaming_content = self._stream(response.streaming_content, request, response,
+                                                      timings, elapsed)
+        return response
+
+    def _db_wrappers(self, timings):
+        """
+        Zählt Dauer und Anzahl der SQL-Abfragen auf allen Datenbank-
+        verbindungen des aktuellen Threads, bis das ExitStack geschlossen wird.
+        """
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timings.add("db", time.perf_counter() - start)
+                timings.queries += 1
+
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        return stack
+
+    def _measuring(self, timings):
+        """
+        Aktiviert die Messung samt SQL-Zählung (synchroner Pfad).
+        """
+        stack = self._db_wrappers(timings)
+        token = activate(timings)
+        stack.callback(deactivate, token)
+        return stack
+
+    def _stream(self, content, request, response, timings, elapsed):
+        iterator = iter(content)
+        try:
+            while True:
+                start = time.perf_counter()
+                with self._measuring(timings):
+                    try:
+                        chunk = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                yield chunk
+        finally:
+            log_request(request, response, timings, elapsed)
+
+    async def _astream(self, content, request, response, timings, elapsed):
+        iterator = aiter(content)
+        db = await sync_to_async(self._db_wrappers)(timings)
+        try:
+            while True:
+                start = time.perf_counter()
+                token = activate(timings)
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    deactivate(token)
+                    elapsed += time.perf_counter() - start
+                yield chunk
+        finally:
+            await sync_to_async(db.close)()
+            log_request(request, response, timings, elapsed)
+
+
+class MetricsMiddleware:
+    """
+    Erfasst die Antwortzeit jedes Requests im Histogramm
+    energy_request_duration_seconds, gruppiert nach URL-Name (energy/urls.py).
+    Nicht auflösbare Pfade (404) landen gemeinsam unter "<unresolved>",
+    damit beliebige URLs keine neuen Zeitreihen erzeugen.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, time.perf_counter() - start)
+        return response
+
+    def _observe(self, request, elapsed):
+        match = getattr(request, "resolver_match", None)
+        REQUEST_DURATION.observe(
+            elapsed,
+            view=(match.url_name or match.view_name) if match else "<unresolved>",
+        )
+
+
+def server_timing(timings, elapsed):
+    parts = []
+    for category in CATEGORIES:
+        metric = f"{category};dur={timings.durations.get(category, 0.0) * 1000:.1f}"
+        if category == "db":
+            metric += f';desc="{timings.queries} queries"'
+        parts.append(metric)
+    parts.append(f"total;dur={elapsed * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def log_request(request, response, timings, elapsed):
+    match = getattr(request, "resolver_match", None)
+    data = {
+        "method": request.method,
+        "path": request.path,
+        "view": match.url_name if match else None,
+        "status": response.status_code,
+        "total_ms": round(elapsed * 1000, 1),
+        **{
+            f"{category}_ms": round(timings.durations.get(category, 0.0) * 1000, 1)
+            for category in CATEGORIES
+        },
+        "queries": timings.queries,
+    }
+    # key=value-Zeile für Menschen und grep, dieselben Werte als "profile"
+    # im LogRecord für strukturierte Handler (z. B. JSON-Formatter)
+    logger.info(" ".join(f"{key}={value}" for key, value in data.items()), extra={"profile": data})
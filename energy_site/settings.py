@@ -29,6 +29,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'energy_site.middleware.MetricsMiddleware',
+    'energy_site.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,7 +44,7 @@ ROOT_URLCONF = 'energy_site.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'energy_site.template_backends.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -110,6 +112,71 @@ STATICFILES_DIRS = [
     BASE_DIR / "energy" / "static",
 ]
 
+# Ablage für Ergebnisdateien der Hintergrundjobs (Exporte); ausgeliefert
+# werden sie über die Download-View, nicht direkt über MEDIA_URL.
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Ergebnis-Cache für calc_heating_demand (energy.cache)
+# MAXSIZE: Einträge im Prozess-LRU, ALIAS: optionaler gemeinsamer Eintrag aus
+# CACHES (z. B. "default" mit Redis/Memcached), TIMEOUT: Lebensdauer dort in s.
+
+ENERGY_CALC_CACHE = {
+    "MAXSIZE": 4096,
+    "ALIAS": None,
+    "TIMEOUT": None,
+}
+
+# Request-Profiling (energy_site.middleware.ProfilingMiddleware)
+# SAMPLE_RATE: Anteil gemessener Requests (0 = aus, 1 = alle; zum Profilieren
+# z. B. 1.0 lokal, 0.01 im Betrieb), HEADER: Server-Timing-Header senden.
+# Die Logzeilen gehen an den Logger "energy.profiling".
+
+ENERGY_PROFILING = {
+    "SAMPLE_RATE": 0.0,
+    "HEADER": True,
+}
+
+# Kennzahlen im Prometheus-Format unter /metrics/ (energy.metrics), nur für
+# diese Client-Adressen abrufbar. Hinter einem Reverse-Proxy ist REMOTE_ADDR
+# die Adresse des Proxys – dann den Pfad dort zusätzlich sperren.
+
+ENERGY_METRICS = {
+    "ALLOWED_IPS": ["127.0.0.1", "::1"],
+}
+
+# Wetterdaten je Standort (energy.climate), angelegt mit "manage.py import_weather".
+# ROOT: Verzeichnis der umgewandelten Dateien, MAX_OPEN: gleichzeitig
+# geöffnete Standorte (LRU), MAX_DERIVED: zwischengespeicherte abgeleitete
+# Werte wie Gradtage und Einstrahlungstabellen (LRU).
+
+ENERGY_CLIMATE = {
+    "ROOT": BASE_DIR / "climate_data",
+    "MAX_OPEN": 16,
+    "MAX_DERIVED": 256,
+}
+
+# Unsicherheitsanalyse (energy.uncertainty): SAMPLES Monte-Carlo-Stichproben
+# je Gebäude (Detailseite und Exporte mit ?uncertainty=1, höchstens 100.000),
+# SEED für reproduzierbare Ergebnisse.
+
+ENERGY_UNCERTAINTY = {
+    "SAMPLES": 10000,
+    "SEED": 42,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "energy.profiling": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
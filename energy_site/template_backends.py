@@ -0,0 +1,33 @@
+from django.template.backends.django import DjangoTemplates
+
+from energy.timing import timed
+
+
+class TimedTemplate:
+    """
+    Hülle um ein Template des Django-Backends, die die Renderzeit der
+    Kategorie "render" zurechnet (siehe energy.timing).
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed("render"):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates mit Messung der Renderzeit für die Profiling-Middleware.
+    Includes und Vererbung laufen innerhalb von render() und sind mitgezählt.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))